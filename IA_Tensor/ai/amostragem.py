@@ -0,0 +1,423 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from core.data_loader import mascaras_de_onehot, obter_mascaras, popcount
+from core.utils import jogos_ja_sorteados, avaliar_qualidade_lote
+
+# --- Amostragem de Jogos em Lote (Gumbel top-k) ---
+# Somar ruído Gumbel ao log dos pesos e ficar com as k maiores chaves de cada linha
+# equivale a sortear k dezenas sem reposição, uma a uma, proporcionalmente aos pesos.
+# Assim o pool inteiro de candidatos sai como uma matriz (N x 25) de uma vez.
+
+# Chave de dezenas com peso zero: perdem para qualquer peso positivo, mas ainda
+# ganham das excluídas (-inf), como no preenchimento de fallback do laço antigo
+_LOG_PESO_NULO = -1e9
+TAMANHO_BLOCO = 1 << 16
+
+def _indices(dezenas):
+    return np.array([n - 1 for n in dezenas if 1 <= n <= 25], dtype=np.int64)
+
+def log_pesos(pesos, fixos=(), excluidos=()):
+    """log dos pesos com as restrições embutidas: fixos = +inf, excluídos = -inf."""
+    pesos = np.asarray(pesos, dtype=np.float64)
+    with np.errstate(divide='ignore'):
+        logs = np.where(pesos > 0, np.log(np.where(pesos > 0, pesos, 1.0)), _LOG_PESO_NULO)
+    logs[_indices(excluidos)] = -np.inf
+    logs[_indices(fixos)] = np.inf
+    return logs
+
+def amostrar_gumbel_topk(pesos, n, k, fixos=(), excluidos=(), rng=None):
+    """
+    Sorteia n jogos de k dezenas sem reposição, proporcional a 'pesos' (25,).
+    Retorna a matriz one-hot uint8 (n x 25). Se sobrarem menos de k dezenas não
+    excluídas, os jogos saem só com as disponíveis.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    logs = log_pesos(pesos, fixos, excluidos)
+    k = min(k, 25)
+    chaves = logs + rng.gumbel(size=(n, 25))
+    escolhidas = np.argpartition(-chaves, k - 1, axis=1)[:, :k]
+    onehot = np.zeros((n, 25), dtype=np.uint8)
+    np.put_along_axis(onehot, escolhidas, 1, axis=1)
+    onehot[:, np.isneginf(logs)] = 0
+    return onehot
+
+def _sortear_por_linha(chaves):
+    """Índice da maior chave de cada linha e se a linha tinha alguma opção válida."""
+    return np.argmax(chaves, axis=1), np.isfinite(chaves.max(axis=1))
+
+def corrigir_jogos(onehot, pesos, df, fixos=(), excluidos=(), rng=None, tentativas=10):
+    """
+    Versão vetorizada da mutação rápida: jogos que já saíram na história ou que
+    fogem da Regra de Ouro (8 a 10 repetidas do último sorteio) trocam uma dezena
+    não fixa, escolhida ao acaso, por outra sorteada pelos pesos; até 'tentativas'.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    onehot = onehot.copy()
+    logs = log_pesos(pesos, (), excluidos)
+    ultima = np.uint32(obter_mascaras(df.tail(1))[0])
+    mascara_fixos = np.zeros(25, dtype=bool)
+    mascara_fixos[_indices(fixos)] = True
+
+    # Só as linhas ainda inválidas são reavaliadas a cada rodada
+    linhas = np.arange(len(onehot))
+    for _ in range(tentativas):
+        mascaras = mascaras_de_onehot(onehot[linhas])
+        repetidas = popcount(mascaras & ultima)
+        invalidos = jogos_ja_sorteados(df, mascaras) | (repetidas < 8) | (repetidas > 10)
+        linhas = linhas[invalidos]
+        if linhas.size == 0:
+            break
+        bloco = onehot[linhas].astype(bool)
+
+        # Quem sai: uniforme entre as dezenas escolhidas que não são fixas
+        chaves_saida = np.where(bloco & ~mascara_fixos, rng.random(bloco.shape), -np.inf)
+        sai, pode_sair = _sortear_por_linha(chaves_saida)
+        # Quem entra: pelos pesos, entre as não escolhidas e não excluídas
+        chaves_entrada = np.where(~bloco, logs + rng.gumbel(size=bloco.shape), -np.inf)
+        entra, pode_entrar = _sortear_por_linha(chaves_entrada)
+
+        trocar = pode_sair & pode_entrar
+        linhas, sai, entra = linhas[trocar], sai[trocar], entra[trocar]
+        onehot[linhas, sai] = 0
+        onehot[linhas, entra] = 1
+    return onehot
+
+# --- Amostragem Condicionada (Regra de Ouro por construção) ---
+# Em vez de sortear e consertar, o jogo é montado em duas partições: as dezenas do
+# último sorteio (A) e as demais (B). Cada subconjunto S tem peso proporcional ao
+# produto dos pesos das suas dezenas; as tabelas Z contam esse peso por quantidade
+# de dezenas, de ímpares e soma, e permitem sortear direto entre os jogos válidos:
+# primeiro quantas repetidas (8, 9 ou 10, pelo peso total de cada caso), depois
+# ímpares e soma de cada partição, e por fim as dezenas uma a uma.
+
+SOMA_MAX = 325 # 11 + 12 + ... + 25
+REPETIDAS = (8, 10)
+
+def _tabela_particao(numeros, pesos, c_max):
+    """
+    Z[i, c, o, s] = soma dos produtos dos pesos dos subconjuntos de numeros[i:]
+    com c dezenas, o ímpares e soma s (polinômio simétrico elementar estendido).
+    """
+    m = len(numeros)
+    o_max = sum(n % 2 for n in numeros)
+    Z = np.zeros((m + 1, c_max + 1, o_max + 1, SOMA_MAX + 1))
+    Z[m, 0, 0, 0] = 1.0
+    for i in range(m - 1, -1, -1):
+        n, impar = numeros[i], numeros[i] % 2
+        Z[i] = Z[i + 1]
+        Z[i, 1:, impar:, n:] += pesos[i] * Z[i + 1, :-1, :o_max + 1 - impar, :SOMA_MAX + 1 - n]
+    return Z
+
+def _sortear_particao(Z, numeros, pesos, c, o, s, rng):
+    """Para cada linha, sorteia o subconjunto de numeros com exatamente (c, o, s)."""
+    escolhidos = np.zeros((len(c), len(numeros)), dtype=bool)
+    for i, (n, w) in enumerate(zip(numeros, pesos)):
+        impar = n % 2
+        pode = (c > 0) & (o >= impar) & (s >= n)
+        peso_entrar = np.where(pode, w * Z[i + 1, np.maximum(c - 1, 0), np.maximum(o - impar, 0), np.maximum(s - n, 0)], 0.0)
+        entra = rng.random(len(c)) * Z[i, c, o, s] < peso_entrar
+        escolhidos[:, i] = entra
+        c, o, s = c - entra, o - entra * impar, s - entra * n
+    return escolhidos
+
+def _acumulada(tabela):
+    """
+    Soma acumulada em s de cada linha, com coluna de zeros: acc[o, s+1] = tabela[o, :s+1].sum().
+    Acumular só num eixo mantém cada linha monótona (as diferenças nunca ficam
+    negativas); a inclusão-exclusão de uma acumulada 2D cancelava em ponto flutuante.
+    """
+    acc = np.zeros((tabela.shape[0], tabela.shape[1] + 1))
+    acc[:, 1:] = tabela.cumsum(1)
+    return acc
+
+def _soma_retangulo(acc, o0, o1, s0, s1):
+    """Soma da tabela em [o0, o1] x [s0, s1] (inclusivos, vetorizado, vazio = 0), linha a linha."""
+    s0, s1 = np.maximum(s0, 0), np.minimum(s1, acc.shape[1] - 2)
+    vazio = s0 > s1
+    s0, s1 = np.where(vazio, 0, s0), np.where(vazio, 0, s1)
+    total = 0.0
+    for o in range(acc.shape[0]):
+        dentro = (o0 <= o) & (o <= o1) & ~vazio
+        total = total + np.where(dentro, np.maximum(acc[o, s1 + 1] - acc[o, s0], 0.0), 0.0)
+    return total
+
+def amostrar_condicionado(pesos, n, k, ultima=None, fixos=(), excluidos=(), impares=None, soma=None,
+                          repetidas=REPETIDAS, rng=None):
+    """
+    Sorteia n jogos de k dezenas, todos dentro das restrições: de repetidas[0] a
+    repetidas[1] dezenas de 'ultima' (se informada), fixos sempre presentes,
+    excluídos nunca, e opcionalmente impares=(min, max) e soma=(min, max).
+    P(jogo) é proporcional ao produto dos pesos das dezenas, restrito aos válidos.
+    Retorna a matriz one-hot uint8 (n x 25), ou None se nenhum jogo é possível.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    pesos = np.asarray(pesos, dtype=np.float64)
+    fixos = {d for d in fixos if 1 <= d <= 25}
+    bloqueadas = fixos | {d for d in excluidos if 1 <= d <= 25}
+    ultima = set(ultima) if ultima is not None else set()
+
+    # Peso zero vira um peso ínfimo (só completa o jogo se faltar opção), e a
+    # escala é normalizada para média 1 para os produtos não estourarem
+    livres = [d for d in range(1, 26) if d not in bloqueadas]
+    w = np.maximum(pesos[np.array(livres, dtype=np.int64) - 1], 0.0) if livres else np.zeros(0)
+    w = np.maximum(w, 1e-9 * w.max()) if w.size and w.max() > 0 else np.ones(len(livres))
+    w = w / w.mean() if w.size else w
+    peso = dict(zip(livres, w))
+    A = [d for d in livres if d in ultima]
+    B = [d for d in livres if d not in ultima]
+
+    # Metas descontando os fixos
+    k_livre = k - len(fixos)
+    r_min, r_max = repetidas if ultima else (0, 0)
+    r_min, r_max = r_min - len(fixos & ultima), r_max - len(fixos & ultima)
+    o_min, o_max = impares if impares else (0, 25)
+    o_min, o_max = o_min - sum(d % 2 for d in fixos), o_max - sum(d % 2 for d in fixos)
+    s_min, s_max = soma if soma else (0, SOMA_MAX)
+    s_min, s_max = s_min - sum(fixos), s_max - sum(fixos)
+
+    opcoes_r = [r for r in range(max(r_min, 0, k_livre - len(B)), min(r_max, len(A), k_livre) + 1)]
+    if k_livre < 0 or not opcoes_r:
+        return None
+    ZA = _tabela_particao(A, [peso[d] for d in A], max(opcoes_r))
+    ZB = _tabela_particao(B, [peso[d] for d in B], k_livre - min(opcoes_r))
+
+    # Peso de cada (r, ímpares de A, soma de A): Z_A vezes a massa de B compatível
+    oA, sA = np.meshgrid(np.arange(ZA.shape[2]), np.arange(SOMA_MAX + 1), indexing='ij')
+    acumuladas, conjunto = {}, []
+    for r in opcoes_r:
+        acumuladas[r] = _acumulada(ZB[0, k_livre - r])
+        conjunto.append(ZA[0, r] * _soma_retangulo(acumuladas[r], o_min - oA, o_max - oA, s_min - sA, s_max - sA))
+    conjunto = np.stack(conjunto)
+    total = conjunto.sum()
+    if not total > 0:
+        return None
+    idx = rng.choice(conjunto.size, size=n, p=(conjunto / total).ravel())
+    ir, oa, sa = np.unravel_index(idx, conjunto.shape)
+    r = np.array(opcoes_r)[ir]
+
+    # Ímpares e soma de B: primeiro a linha (o) pela massa no intervalo de soma,
+    # depois a coluna (s) por inversão da acumulada dessa linha
+    ob, sb = np.zeros(n, dtype=np.int64), np.zeros(n, dtype=np.int64)
+    for i, ri in enumerate(opcoes_r):
+        linhas = np.flatnonzero(ir == i)
+        if linhas.size == 0:
+            continue
+        acc = acumuladas[ri]
+        lo_s, hi_s = np.maximum(s_min - sa[linhas], 0), np.minimum(s_max - sa[linhas], SOMA_MAX)
+        o_b = np.arange(acc.shape[0])
+        massa = _soma_retangulo(acc, o_b[None, :], o_b[None, :], lo_s[:, None], hi_s[:, None])
+        massa[(o_b[None, :] < o_min - oa[linhas, None]) | (o_b[None, :] > o_max - oa[linhas, None])] = 0.0
+        acum = massa.cumsum(1)
+        alvo = rng.random(linhas.size) * acum[:, -1]
+        ob[linhas] = np.minimum((acum <= alvo[:, None]).sum(1), len(o_b) - 1)
+
+        for o in np.unique(ob[linhas]):
+            grupo = ob[linhas] == o
+            linha_acc = acc[o, 1:] # acumulada em s da linha escolhida
+            lo, hi = lo_s[grupo], hi_s[grupo]
+            base = np.where(lo > 0, linha_acc[np.maximum(lo - 1, 0)], 0.0)
+            alvo = base + rng.random(lo.size) * (linha_acc[hi] - base)
+            sb[linhas[grupo]] = np.clip(np.searchsorted(linha_acc, alvo, side='right'), lo, hi)
+
+    onehot = np.zeros((n, 25), dtype=np.uint8)
+    onehot[:, np.array(sorted(fixos), dtype=np.int64) - 1] = 1
+    for numeros, Z, c, o, s in ((A, ZA, r, oa, sa), (B, ZB, k_livre - r, ob, sb)):
+        if numeros:
+            onehot[:, np.array(numeros) - 1] = _sortear_particao(Z, numeros, [peso[d] for d in numeros], c, o, s, rng)
+    return onehot
+
+def gerar_candidatos(pesos, n, k, df=None, fixos=(), excluidos=(), rng=None, tamanho_bloco=TAMANHO_BLOCO,
+                     ultima=None, impares=None, soma=None):
+    """
+    Gera o pool em blocos de até 'tamanho_bloco' jogos (matrizes one-hot). Com df
+    (ou 'ultima') os jogos saem do amostrador condicionado, já válidos pela Regra de
+    Ouro e pelas restrições; os raros que repetem um sorteio histórico são sorteados
+    de novo. Se as restrições forem impossíveis, cai no Gumbel top-k + correção.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    tem_historico = df is not None and len(df)
+    if ultima is None and tem_historico:
+        ultima = df['numeros'].iloc[-1]
+    for inicio in range(0, n, tamanho_bloco):
+        tamanho = min(tamanho_bloco, n - inicio)
+        bloco = None
+        if ultima is not None or impares or soma:
+            bloco = amostrar_condicionado(pesos, tamanho, k, ultima, fixos, excluidos, impares, soma, rng=rng)
+        if bloco is None:
+            bloco = amostrar_gumbel_topk(pesos, tamanho, k, fixos, excluidos, rng)
+            if tem_historico:
+                bloco = corrigir_jogos(bloco, pesos, df, fixos, excluidos, rng)
+        elif tem_historico:
+            for _ in range(10):
+                repetidos = np.flatnonzero(jogos_ja_sorteados(df, mascaras_de_onehot(bloco)))
+                if repetidos.size == 0:
+                    break
+                bloco[repetidos] = amostrar_condicionado(pesos, repetidos.size, k, ultima, fixos, excluidos,
+                                                         impares, soma, rng=rng)
+        yield bloco
+
+# --- Top-k em Fluxo ---
+# Os candidatos são pontuados bloco a bloco e só o top-k sobrevive entre blocos: a
+# memória depende de k, não do tamanho do pool, e o top parcial pode ser exibido
+# enquanto a geração continua.
+
+def _selecionar_diversos(mascaras, ordem, k, max_comuns, tamanho_lote=1024):
+    """
+    Guloso na ordem do ranking: um jogo só entra se divide no máximo max_comuns
+    dezenas com cada jogo já aceito. Cada lote é primeiro filtrado, de uma vez,
+    contra os aceitos dos lotes anteriores; o laço fica só com os que sobram.
+    """
+    aceitos = np.zeros(k, dtype=np.uint32)
+    selecionados = []
+    for inicio in range(0, len(ordem), tamanho_lote):
+        lote = ordem[inicio:inicio + tamanho_lote]
+        anteriores = len(selecionados)
+        if anteriores:
+            lote = lote[popcount(mascaras[lote, None] & aceitos[None, :anteriores]).max(1) <= max_comuns]
+        for i in lote:
+            if len(selecionados) > anteriores and popcount(aceitos[anteriores:len(selecionados)] & mascaras[i]).max() > max_comuns:
+                continue
+            aceitos[len(selecionados)] = mascaras[i]
+            selecionados.append(i)
+            if len(selecionados) == k:
+                return np.array(selecionados, dtype=np.int64)
+    return np.array(selecionados, dtype=np.int64)
+
+def _top_k(mascaras, scores, confianca, k, max_comuns=None):
+    """
+    As k melhores linhas (sem jogos repetidos) por score e, no empate, por confiança.
+    Com max_comuns, aplica a seleção diversa de _selecionar_diversos.
+    """
+    mascaras, unicos = np.unique(mascaras, return_index=True)
+    scores, confianca = scores[unicos], confianca[unicos]
+    if max_comuns is None and len(scores) > k:
+        chave = scores.astype(np.float64) * 1e3 + confianca # confiança fica em [0, 100]
+        corte = np.argpartition(-chave, k - 1)[:k]
+        mascaras, scores, confianca = mascaras[corte], scores[corte], confianca[corte]
+    ordem = np.lexsort((-confianca, -scores))
+    if max_comuns is not None:
+        ordem = _selecionar_diversos(mascaras, ordem, k, max_comuns)
+    return mascaras[ordem], scores[ordem], confianca[ordem]
+
+def iterar_top_k(pesos, probabilidades, n, qtd_numeros, k, df=None, fixos=(), excluidos=(), ultima=None,
+                 impares=None, soma=None, max_comuns=None, rng=None, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Gera e pontua 'n' candidatos em blocos guardando só o top-k (memória ~ k + bloco,
+    não ~ n). A cada bloco rende (processados, (mascaras, scores, confianca)) com o
+    top parcial já ordenado; o último rendimento é o resultado final.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    if ultima is None and df is not None and len(df):
+        ultima = df['numeros'].iloc[-1]
+    probabilidades = np.asarray(probabilidades, dtype=np.float64)
+    fator = 20 * 100 / qtd_numeros
+    top = (np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int16), np.zeros(0))
+    processados = 0
+    for bloco in gerar_candidatos(pesos, n, qtd_numeros, df, fixos, excluidos, rng, tamanho_bloco,
+                                  ultima=ultima, impares=impares, soma=soma):
+        scores, _ = avaliar_qualidade_lote(bloco, ultima)
+        confianca = np.minimum(bloco @ probabilidades * fator, 100)
+        novos = (mascaras_de_onehot(bloco), scores, confianca)
+        top = _top_k(*(np.concatenate(par) for par in zip(top, novos)), k, max_comuns)
+        processados += len(bloco)
+        yield processados, top
+
+# --- Simulação em Paralelo (pools muito grandes) ---
+# O pool é fatiado em tarefas independentes, cada uma com seu fluxo de números
+# aleatórios (SeedSequence.spawn) e guardando só o seu top-k local. Os tops das
+# tarefas são juntados no fim; o resultado depende só da semente, não de quantos
+# processos rodaram.
+
+TAMANHO_TAREFA = 1 << 20
+
+def _simular_tarefa(tarefa):
+    """Roda em um processo do pool: consome o iterar_top_k da fatia e devolve o top final."""
+    semente, n, k_top, pesos, probabilidades, qtd_numeros, df, restricoes = tarefa
+    top = (np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int16), np.zeros(0))
+    for _, top in iterar_top_k(pesos, probabilidades, n, qtd_numeros, k_top, df,
+                               rng=np.random.default_rng(semente), **restricoes):
+        pass
+    return top
+
+def simular_paralelo(pesos, probabilidades, n, qtd_numeros, k_top, df=None, fixos=(), excluidos=(), ultima=None,
+                     impares=None, soma=None, processos=None, semente=None, tamanho_tarefa=TAMANHO_TAREFA,
+                     max_comuns=None, ao_progresso=None):
+    """
+    Gera e pontua 'n' candidatos em um ProcessPoolExecutor e devolve os k_top melhores
+    como (mascaras, scores, confianca), já ordenados. semente fixa = resultado reprodutível.
+    ao_progresso(processados, n, top_parcial) é chamado a cada tarefa concluída.
+    """
+    raiz = np.random.SeedSequence(semente)
+    tamanhos = [min(tamanho_tarefa, n - inicio) for inicio in range(0, n, tamanho_tarefa)]
+    restricoes = {'fixos': tuple(fixos), 'excluidos': tuple(excluidos), 'impares': impares, 'soma': soma,
+                  'ultima': sorted(ultima) if ultima is not None else None, 'max_comuns': max_comuns}
+    tarefas = [(filha, tamanho, k_top, pesos, probabilidades, qtd_numeros, df, restricoes)
+               for filha, tamanho in zip(raiz.spawn(len(tamanhos)), tamanhos)]
+
+    def juntar(tops):
+        return _top_k(*(np.concatenate(partes) for partes in zip(*tops)), k_top, max_comuns)
+
+    def coletar(resultados):
+        tops = []
+        for top in resultados:
+            tops.append(top)
+            if ao_progresso:
+                ao_progresso(sum(tamanhos[:len(tops)]), n, juntar(tops))
+        return tops
+
+    processos = min(processos or os.cpu_count() or 1, len(tarefas))
+    if processos <= 1:
+        tops = coletar(_simular_tarefa(t) for t in tarefas)
+    else:
+        with ProcessPoolExecutor(max_workers=processos) as pool:
+            tops = coletar(pool.map(_simular_tarefa, tarefas))
+    if not tops:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.int16), np.zeros(0)
+    return juntar(tops)
+
+def medir_vazao(df, n=1_000_000, k=15, pesos=None, **restricoes):
+    """
+    Vazão do gerar_candidatos (amostragem + checagem contra o histórico).
+    Retorna (jogos gerados, segundos, jogos por segundo).
+    """
+    import time
+    pesos = np.full(25, 1 / 25) if pesos is None else pesos
+    inicio = time.perf_counter()
+    total = sum(len(b) for b in gerar_candidatos(pesos, n, k, df, rng=np.random.default_rng(0), **restricoes))
+    tempo = time.perf_counter() - inicio
+    return total, tempo, total / tempo
+
+def verificar_restricoes(df, sementes=200, n=50, k=15, impares=(7, 9), soma=(190, 205), repetidas=REPETIDAS):
+    """
+    Checagem de regressão do amostrar_condicionado: com as três restrições juntas e
+    pesos Dirichlet por semente, todo jogo deve sair válido. Retorna as sementes que falharam.
+    """
+    from core.utils import calcular_metricas_dna_lote
+    ultima = list(df.iloc[-1]['numeros'])
+    falhas = []
+    for semente in range(sementes):
+        rng = np.random.default_rng(semente)
+        try:
+            onehot = amostrar_condicionado(rng.dirichlet(np.ones(25)) * k, n, k, ultima=ultima, impares=impares,
+                                           soma=soma, repetidas=repetidas, rng=rng)
+        except ValueError:
+            falhas.append(semente)
+            continue
+        if onehot is None:
+            continue
+        m = calcular_metricas_dna_lote(onehot, ultima)
+        validos = ((onehot.sum(1) == k) & (m['impares'] >= impares[0]) & (m['impares'] <= impares[1])
+                   & (m['soma'] >= soma[0]) & (m['soma'] <= soma[1])
+                   & (m['repetentes'] >= repetidas[0]) & (m['repetentes'] <= repetidas[1]))
+        if not validos.all():
+            falhas.append(semente)
+    return falhas
+
+if __name__ == "__main__":
+    from core.data_loader import ler_historico
+    df = ler_historico()
+    falhas = verificar_restricoes(df)
+    print(f"amostrar_condicionado: {len(falhas)} sementes com falha" + (f" ({falhas[:10]})" if falhas else ""))
+    total, tempo, vazao = medir_vazao(df)
+    print(f"{total} jogos em {tempo:.2f}s ({vazao:,.0f} jogos/s)")
@@ -0,0 +1,93 @@
+import os
+import json
+import threading
+import numpy as np
+from core.data_loader import obter_mascaras, versao_dados
+from ai.registro_modelos import DIRETORIO_MODELOS, chave_configuracao
+
+# --- Modelo Bayesiano Online (Beta-Binomial com esquecimento) ---
+# Cada dezena tem uma Beta(alfa, beta) para "sai no próximo sorteio", separada pelo
+# estado da dezena no sorteio anterior (saiu / não saiu). Cada sorteio novo só
+# desconta as contagens antigas (fator de esquecimento) e soma 1 em alfa ou beta:
+# O(25) por sorteio, sem reler a janela. O estado fica em disco entre execuções.
+
+FATOR_ESQUECIMENTO = 0.99 # meia-vida de ~70 observações por célula
+FORCA_PRIORI = 2.0        # priori Beta(15/25, 10/25) x FORCA_PRIORI
+
+_TRAVA = threading.Lock()
+
+def estado_inicial(fator=FATOR_ESQUECIMENTO, condicionar=True):
+    """Estado vazio: contagens (2 x 25) por [não saiu, saiu no anterior] x dezena."""
+    linhas = 2 if condicionar else 1
+    return {
+        'fator': fator, 'condicionar': condicionar,
+        'alfa': np.zeros((linhas, 25)), 'beta': np.zeros((linhas, 25)),
+        'anterior': None, 'n_sorteios': 0, 'versao': None
+    }
+
+def _linhas_condicao(estado):
+    """Linha de cada dezena conforme o sorteio anterior (0 se não condiciona ou não há anterior)."""
+    if not estado['condicionar'] or estado['anterior'] is None:
+        return np.zeros(25, dtype=np.int64)
+    return ((np.uint32(estado['anterior']) >> np.arange(25, dtype=np.uint32)) & 1).astype(np.int64)
+
+def atualizar_estado(estado, mascara):
+    """Incorpora um sorteio (máscara de 25 bits) ao estado, em O(25)."""
+    saiu = ((np.uint32(mascara) >> np.arange(25, dtype=np.uint32)) & 1).astype(np.float64)
+    linhas, colunas = _linhas_condicao(estado), np.arange(25)
+    fator = estado['fator']
+    estado['alfa'][linhas, colunas] = fator * estado['alfa'][linhas, colunas] + saiu
+    estado['beta'][linhas, colunas] = fator * estado['beta'][linhas, colunas] + (1 - saiu)
+    estado['anterior'] = int(mascara)
+    estado['n_sorteios'] += 1
+    return estado
+
+def prever_bayesiano(estado):
+    """Média a posteriori de cada dezena sair no próximo sorteio (índice 0 = dezena 1)."""
+    a0, b0 = FORCA_PRIORI * 15 / 25, FORCA_PRIORI * 10 / 25
+    linhas, colunas = _linhas_condicao(estado), np.arange(25)
+    alfa, beta = estado['alfa'][linhas, colunas], estado['beta'][linhas, colunas]
+    return (alfa + a0) / (alfa + beta + a0 + b0)
+
+# --- Persistência ---
+
+def _caminho_estado(df, fator, condicionar, diretorio):
+    configuracao = chave_configuracao('bayesiano', df, hiperparametros={'fator': fator, 'condicionar': condicionar})
+    return os.path.join(diretorio, f"bayesiano-{configuracao}.json")
+
+def salvar_estado(estado, caminho):
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    dados = dict(estado, alfa=estado['alfa'].tolist(), beta=estado['beta'].tolist())
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w') as f:
+        json.dump(dados, f)
+    os.replace(temporario, caminho)
+
+def carregar_estado(caminho):
+    try:
+        with open(caminho, 'r') as f:
+            dados = json.load(f)
+    except (OSError, ValueError):
+        return None
+    dados['alfa'], dados['beta'] = np.array(dados['alfa']), np.array(dados['beta'])
+    return dados
+
+def obter_modelo_bayesiano(df, fator=FATOR_ESQUECIMENTO, condicionar=True, diretorio=DIRETORIO_MODELOS):
+    """
+    Estado do modelo para df: lido do disco e estendido só com os sorteios que
+    faltam (se df continua os dados do estado salvo); senão, refeito do zero.
+    """
+    mascaras = obter_mascaras(df)
+    caminho = _caminho_estado(df, fator, condicionar, diretorio)
+    with _TRAVA:
+        estado = carregar_estado(caminho)
+        n = estado['n_sorteios'] if estado else 0
+        if estado is None or n > len(mascaras) or versao_dados(mascaras[:n]) != estado['versao']:
+            estado, n = estado_inicial(fator, condicionar), 0
+        if n == len(mascaras):
+            return estado
+        for mascara in mascaras[n:]:
+            atualizar_estado(estado, mascara)
+        estado['versao'] = versao_dados(mascaras)
+        salvar_estado(estado, caminho)
+    return estado
@@ -0,0 +1,258 @@
+"""
+Busca de hiperparâmetros do AIEngine com avaliação walk-forward: para cada sorteio t
+dos últimos n_avaliacao, os modelos só veem os sorteios 0..t-1 e a fusão é pontuada
+no sorteio t. Os trials rodam num pool de processos e cada resultado vai para um
+JSONL assim que termina; rodar de novo retoma a busca pulando os trials já feitos.
+
+    python -m ai.busca_hiperparametros        # 200 trials aleatórios, últimos 300 sorteios
+"""
+import os
+import json
+import time
+import hashlib
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from core.data_loader import extrair_features, frequencias_acumuladas, matriz_onehot, obter_mascaras, obter_derivado
+from core.utils import matriz_atrasos
+from ai.lstm import preparar_dados, ajustar_escala, ultima_janela, treinar_modelo, LSTMNumpy
+from ai.ensemble import preparar_dados_ensemble, treinar_floresta
+from ai.bayesiano import estado_inicial, atualizar_estado, prever_bayesiano
+from ai.engine import PESOS_FUSAO, HIPERPARAMETROS_LSTM, HIPERPARAMETROS_RF, probabilidade_por_atraso, fundir_probabilidades
+
+ARQUIVO_RESULTADOS = "busca_hiperparametros.jsonl"
+N_AVALIACAO = 300
+PASSO_RETREINO = 25 # LSTM/RF são reajustados a cada PASSO_RETREINO sorteios da avaliação
+
+ESPACO_PADRAO = {
+    'pesos_fusao': 'dirichlet', # sorteados no simplex (busca aleatória) ou PESOS_FUSAO (grade)
+    'n_dias': [10, 20, 30, 60],
+    'unidades': [8, 16, 32],
+    'epocas': [3, 5, 10],
+    'janela_treino': [200, 300, 500],
+    'n_estimators': [50, 100, 200],
+    'max_depth': [6, 10, 16],
+    'fator_bayesiano': [0.97, 0.99, 0.995],
+}
+
+# --- Trials ---
+
+def id_trial(params):
+    """Identificador estável do trial (mesmos parâmetros = mesmo id)."""
+    texto = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.blake2b(texto.encode(), digest_size=8).hexdigest()
+
+def _pesos_aleatorios(rng):
+    pesos = np.round(rng.dirichlet(np.ones(len(PESOS_FUSAO))), 2)
+    return dict(zip(PESOS_FUSAO, pesos.tolist()))
+
+def gerar_trials(espaco=None, n=200, semente=0, grade=False):
+    """
+    Lista de dicionários de parâmetros: produto cartesiano do espaço (grade=True,
+    limitado aos n primeiros) ou n sorteios independentes de cada eixo.
+    """
+    espaco = espaco or ESPACO_PADRAO
+    eixos = {k: v for k, v in espaco.items() if k != 'pesos_fusao'}
+    if grade:
+        combinacoes = itertools.islice(itertools.product(*eixos.values()), n)
+        return [dict(zip(eixos, valores), pesos_fusao=dict(PESOS_FUSAO)) for valores in combinacoes]
+
+    rng = np.random.default_rng(semente)
+    trials, vistos = [], set()
+    for _ in range(n * 20):
+        if len(trials) == n:
+            break
+        params = {k: v[rng.integers(len(v))] for k, v in eixos.items()}
+        params = {k: v.item() if hasattr(v, 'item') else v for k, v in params.items()}
+        params['pesos_fusao'] = _pesos_aleatorios(rng) if espaco.get('pesos_fusao') == 'dirichlet' \
+            else dict(espaco.get('pesos_fusao') or PESOS_FUSAO)
+        if id_trial(params) not in vistos:
+            vistos.add(id_trial(params))
+            trials.append(params)
+    return trials
+
+# --- Avaliação Walk-Forward ---
+# Matrizes de features são montadas uma vez por versão dos dados e configuração
+# (n_dias, atrasos...) no cache de derivados e fatiadas por posição; o que é refeito
+# por passo é só o treino.
+
+def _features_lstm(df, n_dias):
+    return obter_derivado(df, f'busca_features_lstm_{n_dias}', lambda _: extrair_features(df, n_dias))
+
+def _features_rf(df, usar_atrasos):
+    def construir(_):
+        # Linha j da matriz prevê o sorteio na posição inicio + j (só vê os anteriores)
+        X, y = preparar_dados_ensemble(df, usar_atrasos=usar_atrasos)
+        return X, y, len(df) - len(X)
+    return obter_derivado(df, f'busca_features_rf_{usar_atrasos}', construir)
+
+def _walk_forward_lstm(df, params, posicoes, passo):
+    df_feat = _features_lstm(df, params['n_dias'])
+    previsoes, modelo, escala = [], None, None
+    for k, t in enumerate(posicoes):
+        # Mesma preparação do AIEngine, com o corte no sorteio t (exclusivo); a escala
+        # só é reajustada junto com o modelo, para a previsão usar a escala do treino
+        fatia = df_feat.iloc[max(0, t - params['janela_treino']):t]
+        retreinar = modelo is None or k % passo == 0
+        if retreinar:
+            escala = ajustar_escala(fatia)
+        entradas, saidas = preparar_dados(fatia, intervalo=params['n_dias'], scaler=escala)
+        if len(entradas) == 0:
+            previsoes.append(np.full(25, 0.6))
+            continue
+        if retreinar:
+            modelo = LSTMNumpy.de_keras(treinar_modelo(entradas, saidas, unidades=params['unidades'],
+                                                       epocas=params['epocas'],
+                                                       batch_size=HIPERPARAMETROS_LSTM['batch_size']))
+        # Janela que termina no sorteio t-1, a mesma informação que o RF vê
+        previsoes.append(modelo.predict(ultima_janela(fatia, params['n_dias'], escala))[0])
+    return np.array(previsoes)
+
+def _walk_forward_rf(df, params, posicoes, passo):
+    X, y, inicio = _features_rf(df, HIPERPARAMETROS_RF['usar_atrasos'])
+    previsoes, modelo = [], None
+    for k, t in enumerate(posicoes):
+        if t - inicio <= 0:
+            previsoes.append(np.full(25, 0.6))
+            continue
+        if modelo is None or k % passo == 0:
+            modelo = treinar_floresta(X[:t - inicio], y[:t - inicio], params['n_estimators'], params['max_depth'], n_jobs=1)
+        previsoes.append(modelo.predict(X[t - inicio][None, :])[0])
+    return np.array(previsoes)
+
+def _walk_forward_bayesiano(df, params, posicoes):
+    mascaras = obter_mascaras(df)
+    estado = estado_inicial(params['fator_bayesiano'])
+    previsoes, visto = [], 0
+    for t in posicoes:
+        for mascara in mascaras[visto:t]:
+            atualizar_estado(estado, mascara)
+        visto = t
+        previsoes.append(prever_bayesiano(estado))
+    return np.array(previsoes)
+
+def avaliar_trial(df, params, n_avaliacao=N_AVALIACAO, passo_retreino=PASSO_RETREINO):
+    """
+    Walk-forward nos últimos n_avaliacao sorteios: probabilidades fundidas com os
+    pesos do trial e métricas no sorteio seguinte (acertos do top-15 e log-loss).
+    Fontes com peso zero não são treinadas.
+    """
+    posicoes = np.arange(max(1, len(df) - n_avaliacao), len(df))
+    pesos = params['pesos_fusao']
+    acumuladas = frequencias_acumuladas(df)
+    fontes = {
+        'frequencia': (acumuladas[posicoes] - acumuladas[np.maximum(posicoes - 10, 0)]) / 10,
+        'atraso': probabilidade_por_atraso(matriz_atrasos(df)[posicoes - 1]),
+    }
+    if pesos.get('bayesiano'):
+        fontes['bayesiano'] = _walk_forward_bayesiano(df, params, posicoes)
+    if pesos.get('rf'):
+        fontes['rf'] = _walk_forward_rf(df, params, posicoes, passo_retreino)
+    if pesos.get('lstm'):
+        fontes['lstm'] = _walk_forward_lstm(df, params, posicoes, passo_retreino)
+    fontes = {nome: prob for nome, prob in fontes.items() if pesos.get(nome)}
+    if not fontes:
+        fontes = {'frequencia': (acumuladas[posicoes] - acumuladas[np.maximum(posicoes - 10, 0)]) / 10}
+        pesos = {'frequencia': 1.0}
+
+    prob = fundir_probabilidades(fontes, pesos)
+    sorteados = matriz_onehot(df)[posicoes].astype(bool)
+    top15 = np.argsort(-prob, axis=1)[:, :15]
+    acertos = np.take_along_axis(sorteados, top15, axis=1).sum(axis=1)
+    # A fusão é uma distribuição sobre 25 dezenas; x15 vira "chance de sair" por dezena
+    p = np.clip(prob * 15, 1e-6, 1 - 1e-6)
+    log_loss = -np.mean(np.where(sorteados, np.log(p), np.log(1 - p)).sum(axis=1))
+    return {
+        'acertos_medio': float(acertos.mean()),
+        'acertos_11_mais': float((acertos >= 11).mean()),
+        'log_loss': float(log_loss),
+        'n_avaliados': int(len(posicoes)),
+    }
+
+# --- Execução em Paralelo + Retomada ---
+
+_DF_WORKER = None
+
+def _iniciar_worker(df):
+    global _DF_WORKER
+    _DF_WORKER = df
+
+def _executar_trial(tarefa):
+    params, n_avaliacao, passo_retreino = tarefa
+    inicio = time.perf_counter()
+    metricas = avaliar_trial(_DF_WORKER, params, n_avaliacao, passo_retreino)
+    return {'id': id_trial(params), 'params': params, 'metricas': metricas,
+            'segundos': round(time.perf_counter() - inicio, 2)}
+
+def ler_resultados(caminho=ARQUIVO_RESULTADOS):
+    """Trials já concluídos (ignora uma última linha cortada por interrupção)."""
+    registros = []
+    try:
+        with open(caminho, 'r') as f:
+            for linha in f:
+                try:
+                    registros.append(json.loads(linha))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return registros
+
+def _anexar_resultado(registro, caminho):
+    with open(caminho, 'a') as f:
+        f.write(json.dumps(registro) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def buscar_hiperparametros(df, trials=None, n_trials=200, caminho=ARQUIVO_RESULTADOS, processos=None,
+                           n_avaliacao=N_AVALIACAO, passo_retreino=PASSO_RETREINO, semente=0, ao_progresso=None):
+    """
+    Avalia os trials (padrão: gerar_trials(n=n_trials)) que ainda não estão em
+    'caminho', em até 'processos' processos. Retorna o DataFrame de todos os
+    resultados (antigos + novos), do melhor acertos_medio para o pior.
+    """
+    trials = trials if trials is not None else gerar_trials(n=n_trials, semente=semente)
+    feitos = {r['id'] for r in ler_resultados(caminho)}
+    pendentes = [t for t in trials if id_trial(t) not in feitos]
+    tarefas = [(params, n_avaliacao, passo_retreino) for params in pendentes]
+
+    processos = min(processos or os.cpu_count() or 1, max(len(tarefas), 1))
+    if processos <= 1:
+        _iniciar_worker(df)
+        for i, tarefa in enumerate(tarefas, 1):
+            _anexar_resultado(_executar_trial(tarefa), caminho)
+            if ao_progresso:
+                ao_progresso(i, len(tarefas))
+    else:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_worker, initargs=(df,)) as pool:
+            futuros = [pool.submit(_executar_trial, tarefa) for tarefa in tarefas]
+            for i, futuro in enumerate(as_completed(futuros), 1):
+                _anexar_resultado(futuro.result(), caminho)
+                if ao_progresso:
+                    ao_progresso(i, len(tarefas))
+    return tabela_resultados(caminho)
+
+def tabela_resultados(caminho=ARQUIVO_RESULTADOS):
+    """Resultados em DataFrame (parâmetros e métricas achatados), melhor primeiro."""
+    registros = ler_resultados(caminho)
+    if not registros:
+        return pd.DataFrame()
+    linhas = [dict(id=r['id'], segundos=r['segundos'], **r['metricas'],
+                   **{k: v for k, v in r['params'].items() if k != 'pesos_fusao'},
+                   **{f"peso_{k}": v for k, v in r['params']['pesos_fusao'].items()}) for r in registros]
+    return pd.DataFrame(linhas).sort_values(['acertos_medio', 'log_loss'], ascending=[False, True]).reset_index(drop=True)
+
+def melhores_parametros(caminho=ARQUIVO_RESULTADOS):
+    """Parâmetros do melhor trial salvo (maior acertos_medio, desempate pelo log-loss), ou None."""
+    registros = ler_resultados(caminho)
+    if not registros:
+        return None
+    return min(registros, key=lambda r: (-r['metricas']['acertos_medio'], r['metricas']['log_loss']))['params']
+
+if __name__ == "__main__":
+    from core.data_loader import ler_historico
+    resultados = buscar_hiperparametros(
+        ler_historico(), ao_progresso=lambda i, total: print(f"trial {i}/{total}", flush=True)
+    )
+    print(resultados.head(10).to_string())
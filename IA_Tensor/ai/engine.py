@@ -1,11 +1,45 @@
 
 import numpy as np
 import pandas as pd
-from collections import Counter
 import os
-from ai.lstm import preparar_dados, treinar_modelo
-from ai.ensemble import treinar_ensemble, prever_ensemble
-from keras.models import load_model
+import threading
+import logging
+from ai.lstm import preparar_dados, ajustar_escala, ultima_janela, treinar_modelo, atualizar_modelo, LSTMNumpy, exportar_pesos
+from ai.ensemble import treinar_ensemble, atualizar_ensemble, prever_ensemble
+from ai.bayesiano import obter_modelo_bayesiano, prever_bayesiano
+from ai.amostragem import gerar_candidatos, iterar_top_k, simular_paralelo
+from core.data_loader import preencher_frequencias, frequencias_janela, matriz_onehot
+from core.utils import atrasos_atuais, avaliar_qualidade_lote
+from ai.registro_modelos import (
+    chave_modelo, chave_configuracao, metadados_modelo, carregar_modelo, registrar_modelo, buscar_modelo_anterior,
+    obter_modelo
+)
+
+# Hiperparâmetros fazem parte da chave do registro de modelos
+HIPERPARAMETROS_LSTM = {'unidades': 16, 'epocas': 5, 'batch_size': 64, 'janela_treino': 300}
+HIPERPARAMETROS_RF = {'n_estimators': 100, 'max_depth': 10, 'usar_atrasos': True, 'janelas': (10,)}
+# Até quantos sorteios novos compensa ajustar o modelo anterior em vez de treinar do zero
+LIMITE_INCREMENTAL = 50
+# Peso de cada fonte na fusão híbrida de calcular_probabilidades
+PESOS_FUSAO = {'lstm': 0.35, 'rf': 0.35, 'bayesiano': 0.10, 'frequencia': 0.10, 'atraso': 0.10}
+# A partir deste pool (e com mais de 100 jogos pedidos) a simulação vai para vários processos
+LIMITE_PARALELO = 2_000_000
+
+def probabilidade_por_atraso(atrasos):
+    """Atrasos (n x 25 ou 25,) -> peso de 'vai sair': 0.02 por sorteio de atraso, teto 0.2."""
+    return np.where(atrasos >= 0, np.minimum(atrasos * 0.02, 0.2), 0.2)
+
+def fundir_probabilidades(fontes, pesos=None):
+    """
+    Fusão Híbrida: média das fontes {nome: probabilidades} ponderada por 'pesos'
+    (padrão PESOS_FUSAO), renormalizada sobre as fontes presentes. Aceita linhas (n x 25).
+    """
+    pesos = PESOS_FUSAO if pesos is None else pesos
+    peso_total = sum(pesos[nome] for nome in fontes)
+    prob_final = sum(pesos[nome] * np.asarray(prob, dtype=np.float64) for nome, prob in fontes.items()) / peso_total
+    soma = prob_final.sum(axis=-1, keepdims=True)
+    # Garantir que não temos soma zero
+    return np.where(soma > 0, prob_final / np.where(soma > 0, soma, 1), 1 / 25)
 
 class AIEngine:
     def __init__(self, df_historico, n_dias=30):
@@ -23,83 +57,109 @@ class AIEngine:
         df['mes'] = df['data'].dt.month
         df['consecutivos'] = df['numeros'].apply(lambda x: sum(1 for i in range(len(x)-1) if x[i]+1 == x[i+1]))
         
-        # Preencher frequências
-        X = np.zeros((len(df), 25))
-        for i, nums in enumerate(df['numeros']):
-            for n in nums:
-                if 1 <= n <= 25:
-                    X[i, n-1] = 1
-        
-        df_bins = pd.DataFrame(X, columns=[f'freq_{i}' for i in range(1, 26)])
-        df_rolling = df_bins.rolling(window=self.n_dias, min_periods=1).sum().shift(1).fillna(0)
+        # Preencher frequências (janelas móveis lidas do índice de contagens acumuladas)
+        return preencher_frequencias(df, self.n_dias)
+
+    # --- Modelos (registro + atualização incremental) ---
+    # Mesmos dados, janela, n_dias e hiperparâmetros: reaproveita o modelo registrado.
+    # Se só chegaram sorteios novos, ajusta o modelo anterior em vez de treinar do zero.
+
+    def _modelo_lstm(self, df_filtrado, entradas, saidas, hiper_lstm, servir_numpy=True):
+        # Pesos já exportados: a previsão roda em NumPy, sem importar o TensorFlow
+        chave_np = chave_modelo('lstm_numpy', df_filtrado, self.n_dias, HIPERPARAMETROS_LSTM)
+        if servir_numpy:
+            modelo_np = carregar_modelo(chave_np, 'npz')
+            if modelo_np is not None:
+                return modelo_np
         
-        for col in df_rolling.columns:
-            df[col] = df_rolling[col]
-        return df
+        chave = chave_modelo('lstm', df_filtrado, self.n_dias, HIPERPARAMETROS_LSTM)
+        configuracao = chave_configuracao('lstm', df_filtrado, self.n_dias, HIPERPARAMETROS_LSTM)
+        modelo = obter_modelo(
+            chave, lambda: self._treinar_lstm(configuracao, df_filtrado, entradas, saidas, hiper_lstm), 'keras',
+            metadados=metadados_modelo(configuracao, df_filtrado)
+        )
+        modelo_np = registrar_modelo(chave_np, LSTMNumpy.de_keras(modelo), 'npz')
+        return modelo_np if servir_numpy else modelo
+
+    def _treinar_lstm(self, configuracao, df_filtrado, entradas, saidas, hiper_lstm):
+        anterior, n_anterior = buscar_modelo_anterior(configuracao, df_filtrado, 'keras')
+        novos = min(len(df_filtrado) - n_anterior, len(entradas))
+        if anterior is not None and novos <= LIMITE_INCREMENTAL:
+            # Só as janelas cujo alvo é um sorteio novo (nenhuma se novos == 0)
+            inicio = len(entradas) - novos
+            return atualizar_modelo(anterior, entradas[inicio:], saidas[inicio:], batch_size=hiper_lstm['batch_size'])
+        return treinar_modelo(entradas, saidas, **hiper_lstm)
+
+    def _modelo_rf(self, df_filtrado):
+        chave = chave_modelo('rf', df_filtrado, hiperparametros=HIPERPARAMETROS_RF)
+        configuracao = chave_configuracao('rf', df_filtrado, hiperparametros=HIPERPARAMETROS_RF)
+        return obter_modelo(chave, lambda: self._treinar_rf(configuracao, df_filtrado), 'joblib',
+                            metadados=metadados_modelo(configuracao, df_filtrado))
+
+    def _treinar_rf(self, configuracao, df_filtrado):
+        anterior, n_anterior = buscar_modelo_anterior(configuracao, df_filtrado, 'joblib')
+        if anterior is not None and len(df_filtrado) - n_anterior <= LIMITE_INCREMENTAL:
+            return atualizar_ensemble(anterior, df_filtrado, usar_atrasos=HIPERPARAMETROS_RF['usar_atrasos'])
+        return treinar_ensemble(df_filtrado, **HIPERPARAMETROS_RF)
 
     def calcular_probabilidades(self, df_filtrado, usar_aprendizado=False, salvar_aprendizado=False):
         # 1. Features
         df_feat = self.extrair_features(df_filtrado)
         
         # 2. LSTM
-        df_lstm = df_feat.tail(300)
-        entradas, saidas = preparar_dados(df_lstm, intervalo=self.n_dias)
+        hiper_lstm = dict(HIPERPARAMETROS_LSTM)
+        df_lstm = df_feat.tail(hiper_lstm.pop('janela_treino'))
+        escala = ajustar_escala(df_lstm)
+        entradas, saidas = preparar_dados(df_lstm, intervalo=self.n_dias, scaler=escala)
         
         if entradas.size == 0:
             raise ValueError("Dados insuficientes para a Janela de Análise selecionada. Aumente o intervalo de datas.")
 
-        if usar_aprendizado and os.path.exists("modelo_treinado.keras"):
+        if usar_aprendizado and os.path.exists("modelo_treinado.npz"):
+            modelo = LSTMNumpy.carregar("modelo_treinado.npz")
+        elif usar_aprendizado and os.path.exists("modelo_treinado.keras"):
+            from keras.models import load_model
             modelo = load_model("modelo_treinado.keras")
         else:
-            modelo = treinar_modelo(entradas, saidas)
+            modelo = self._modelo_lstm(df_filtrado, entradas, saidas, hiper_lstm, servir_numpy=not salvar_aprendizado)
             if salvar_aprendizado:
                 modelo.save("modelo_treinado.keras")
+                modelo = exportar_pesos(modelo, "modelo_treinado.npz")
         
-        pred_lstm = modelo.predict(entradas[-1][None, ...], verbose=0)[0]
+        # Janela que termina no último sorteio de df_filtrado (prevê o próximo)
+        pred_lstm = modelo.predict(ultima_janela(df_lstm, self.n_dias, escala), verbose=0)[0]
         
         # 3. Ensemble
-        modelo_rf = treinar_ensemble(df_filtrado)
+        modelo_rf = self._modelo_rf(df_filtrado)
         if modelo_rf is not None:
             pred_ensemble = prever_ensemble(modelo_rf, df_filtrado)
         else:
             pred_ensemble = np.zeros(25)
         
-        # 4. Frequência Recente (10)
-        ultimos_10 = df_filtrado.tail(10)
-        freq_contador = Counter()
-        for nums in ultimos_10['numeros']:
-            freq_contador.update(nums)
-        prob_freq = np.zeros(25)
-        for num in range(1, 26):
-            prob_freq[num-1] = freq_contador.get(num, 0) / 10
-            
-        # 5. Atrasos
-        ultima_rodada_abs = df_filtrado['rodada'].max()
-        ultimas_aparicoes = {}
-        for idx, row in df_filtrado.iterrows():
-            for n in row['numeros']:
-                ultimas_aparicoes[n] = row['rodada']
-        
-        prob_atraso = np.zeros(25)
-        for num in range(1, 26):
-            if num in ultimas_aparicoes:
-                atraso = ultima_rodada_abs - ultimas_aparicoes[num]
-                prob_atraso[num-1] = min(atraso * 0.02, 0.2)
-            else:
-                prob_atraso[num-1] = 0.2
-        
-        # Fusão Híbrida
-        prob_final = (pred_lstm * 0.40) + (pred_ensemble * 0.40) + (prob_freq * 0.10) + (prob_atraso * 0.10)
+        # 4-6. Fontes leves (Bayesiano online, frequência recente, atrasos)
+        fontes = self._fontes_leves(df_filtrado)
+        fontes.update({'lstm': pred_lstm, 'rf': pred_ensemble})
+        return fundir_probabilidades(fontes)
+
+    def _fontes_leves(self, df_filtrado):
+        # Bayesiano online: estado salvo + só os sorteios novos
+        pred_bayes = prever_bayesiano(obter_modelo_bayesiano(df_filtrado))
         
-        # Garantir que não temos soma zero
-        if np.sum(prob_final) == 0:
-            prob_final = np.ones(25) / 25
+        # Frequência Recente (10)
+        prob_freq = frequencias_janela(df_filtrado, -10) / 10
             
-        return prob_final / np.sum(prob_final)
+        # Atrasos (lidos da matriz pré-calculada por versão dos dados)
+        atrasos = atrasos_atuais(df_filtrado)
+        prob_atraso = probabilidade_por_atraso(atrasos)
+        return {'bayesiano': pred_bayes, 'frequencia': prob_freq, 'atraso': prob_atraso}
+
+    def calcular_probabilidades_rapidas(self, df_filtrado):
+        """Só as fontes leves (sem LSTM/RF): responde na hora enquanto os modelos pesados treinam."""
+        return fundir_probabilidades(self._fontes_leves(df_filtrado))
 
-    def simular_jogos(self, probabilidades, qtd_sequencias, qtd_numeros, nums_fixos, nums_excluidos, ultima_rodada):
+    def _ajustar_probabilidades(self, probabilidades, nums_fixos, nums_excluidos):
         # Aplicar Fixos/Excluintes
-        prob_ajustada = probabilidades.copy()
+        prob_ajustada = np.array(probabilidades, dtype=np.float64)
         for n in nums_excluidos:
             if 1 <= n <= 25: prob_ajustada[n-1] = 0
         for n in nums_fixos:
@@ -110,93 +170,136 @@ class AIEngine:
              for n in nums_excluidos:
                   if 1 <= n <= 25: prob_ajustada[n-1] = 0
         
-        prob_final = prob_ajustada / np.sum(prob_ajustada)
-        
-        pool_size = max(qtd_sequencias * 50, 500)
-        candidatos = []
-        
-        for _ in range(pool_size):
-            escolhidos = set(nums_fixos)
-            if len(escolhidos) > qtd_numeros: escolhidos = set(list(escolhidos)[:qtd_numeros])
-            
-            tries = 0
-            while len(escolhidos) < qtd_numeros and tries < 100:
-                num = np.random.choice(np.arange(1, 26), p=prob_final)
-                if num not in nums_excluidos: escolhidos.add(num)
-                tries += 1
-            
-            # Fallback se não preencheu (ex: muitos excluidos)
-            if len(escolhidos) < qtd_numeros:
-                restante = list(set(range(1, 26)) - escolhidos - nums_excluidos)
-                if restante: escolhidos.update(restante[:qtd_numeros - len(escolhidos)])
-            
-            seq = sorted(list(escolhidos))
-            
-            # --- VERIFICAÇÃO DE INEDITISMO EMBUTIDA NA GERAÇÃO ---
-            # Evita gerar jogos que já saíram na história se houver alternativas
-            from core.utils import verificar_ineditismo
-            if hasattr(self, 'df'):
-                 # 1. Filtro: Já Saiu na História?
-                 msg = verificar_ineditismo(self.df, seq)
-                 
-                 # 2. Filtro (Regra de Ouro Temporal): Repeteco do último concurso (8 a 10 permitidos)
-                 ultimo_jogo = set(self.df.iloc[-1]['numeros'])
-                 repetidas = len(set(seq).intersection(ultimo_jogo))
-                 passou_regra_temporal = (8 <= repetidas <= 10)
-                 
-                 tentativas_correcao = 0
-                 
-                 # Loop de Mutação Genética Rápida se quebrar regra de Ineditismo OU Regra Temporal
-                 while ((msg and "ALERTA" in msg) or not passou_regra_temporal) and tentativas_correcao < 10:
-                     nao_fixos = list(set(seq) - set(nums_fixos))
-                     if not nao_fixos: break # Impossível corrigir se todos são fixos pelo usuário
-                     
-                     # Escolhe quem vai morrer 
-                     semente_morta = np.random.choice(nao_fixos)
-                     seq.remove(semente_morta)
-                     
-                     # Busca substituto
-                     candidatos_vivos = list(set(range(1, 26)) - set(seq) - set(nums_excluidos))
-                     if candidatos_vivos:
-                         # Tenta puxar da roda de probabilidade original se der, senão aleatório ponderado
-                         pesos_candidatos = [prob_final[n-1] for n in candidatos_vivos]
-                         soma_pesos = sum(pesos_candidatos)
-                         if soma_pesos > 0:
-                             pesos_norm = [p/soma_pesos for p in pesos_candidatos]
-                             novo_num = np.random.choice(candidatos_vivos, p=pesos_norm)
-                         else:
-                             novo_num = np.random.choice(candidatos_vivos)
-                         
-                         seq.append(novo_num)
-                     
-                     seq = sorted(seq)
-                     
-                     # Re-testa
-                     msg = verificar_ineditismo(self.df, seq)
-                     repetidas = len(set(seq).intersection(ultimo_jogo))
-                     passou_regra_temporal = (8 <= repetidas <= 10)
-                     
-                     tentativas_correcao += 1
+        return prob_ajustada / np.sum(prob_ajustada)
 
-            
-            # Cálculo de Confiança
-            soma_probs = sum(probabilidades[n-1] for n in seq)
-            confianca = min(soma_probs * 20 * 100 / qtd_numeros, 100)
-            
-            from core.utils import avaliar_qualidade_jogo
-            score, m = avaliar_qualidade_jogo(seq, ultima_rodada)
-            
-            candidatos.append({
-                'seq': seq, 'score': score, 'confianca': confianca, 
-                'metrics': m
-            })
-            
-        candidatos.sort(key=lambda x: x['score'], reverse=True)
+    def gerar_jogos_streaming(self, probabilidades, qtd_sequencias, qtd_numeros, nums_fixos, nums_excluidos,
+                              ultima_rodada, tamanho_pool=None, rng=None, impares=None, soma=None, max_comuns=None):
+        """
+        Versão em fluxo do simular_jogos: rende (processados, total, top) a cada bloco,
+        com top = (mascaras, scores, confianca) dos qtd_sequencias melhores até ali.
+        max_comuns limita quantas dezenas dois jogos do top podem ter em comum.
+        """
+        pool_size = tamanho_pool or max(qtd_sequencias * 50, 500)
+        prob_final = self._ajustar_probabilidades(probabilidades, nums_fixos, nums_excluidos)
+        for processados, top in iterar_top_k(
+            prob_final, probabilidades, pool_size, qtd_numeros, qtd_sequencias, self.df,
+            nums_fixos, nums_excluidos, ultima_rodada, impares, soma, max_comuns, rng
+        ):
+            yield processados, pool_size, top
+
+    def jogos_de_top(self, top, ultima_rodada):
+        """Converte o top compacto (mascaras, scores, confianca) nos dicionários da UI."""
+        mascaras, scores, confianca = top
+        onehot = matriz_onehot(mascaras)
+        _, metricas = avaliar_qualidade_lote(onehot, ultima_rodada)
+        return self._montar_jogos(onehot, scores, confianca, metricas, np.arange(len(onehot)), ultima_rodada)
+
+    def simular_jogos(self, probabilidades, qtd_sequencias, qtd_numeros, nums_fixos, nums_excluidos, ultima_rodada,
+                      tamanho_pool=None, rng=None, impares=None, soma=None, processos=None, max_comuns=None,
+                      ao_progresso=None):
+        """
+        Sorteia e pontua o pool e devolve os qtd_sequencias jogos. Acima de 100 jogos
+        usa o top-k em fluxo ou, para pools gigantes, a simulação em paralelo; nesses
+        modos ao_progresso(processados, total, top) recebe o top parcial.
+        """
+        prob_final = self._ajustar_probabilidades(probabilidades, nums_fixos, nums_excluidos)
+        
+        pool_size = tamanho_pool or max(qtd_sequencias * 50, 500)
+        rng = np.random.default_rng() if rng is None else rng
         
         if qtd_sequencias > 100:
-            return candidatos[:qtd_sequencias]
-        else:
-            top_cut = max(len(candidatos) // 4, qtd_sequencias)
-            melhores = candidatos[:top_cut]
-            indices = np.random.choice(len(melhores), min(qtd_sequencias, len(melhores)), replace=False)
-            return [melhores[idx] for idx in indices]
+            if processos or pool_size >= LIMITE_PARALELO:
+                # Pool gigante: fatiado entre processos, cada um devolve só o seu top-k
+                top = simular_paralelo(
+                    prob_final, probabilidades, pool_size, qtd_numeros, qtd_sequencias, self.df,
+                    nums_fixos, nums_excluidos, ultima_rodada, impares, soma,
+                    processos=processos, semente=int(rng.integers(2**63)), max_comuns=max_comuns,
+                    ao_progresso=ao_progresso
+                )
+            else:
+                # Top-k em fluxo: o pool nunca fica inteiro na memória
+                for processados, total, top in self.gerar_jogos_streaming(
+                    probabilidades, qtd_sequencias, qtd_numeros, nums_fixos, nums_excluidos, ultima_rodada,
+                    pool_size, rng, impares, soma, max_comuns
+                ):
+                    if ao_progresso:
+                        ao_progresso(processados, total, top)
+            return self.jogos_de_top(top, ultima_rodada)
+        
+        # Pool inteiro sorteado em matriz, já dentro da Regra de Ouro (8 a 10 repetidas
+        # da ultima_rodada) e das restrições opcionais impares=(min, max) e soma=(min, max)
+        onehot = np.concatenate(list(gerar_candidatos(
+            prob_final, pool_size, qtd_numeros, self.df, nums_fixos, nums_excluidos, rng,
+            ultima=ultima_rodada, impares=impares, soma=soma
+        )))
+        
+        # Cálculo de Confiança
+        confianca = np.minimum(onehot @ np.asarray(probabilidades, dtype=np.float64) * 20 * 100 / qtd_numeros, 100)
+        
+        # DNA e score de todos os candidatos de uma vez
+        scores, metricas = avaliar_qualidade_lote(onehot, ultima_rodada)
+        ordem = np.argsort(-scores, kind='stable')
+        
+        # Sorteio entre o melhor quarto do pool (variedade nos poucos jogos pedidos)
+        top_cut = max(len(ordem) // 4, qtd_sequencias)
+        melhores = ordem[:top_cut]
+        selecionados = melhores[rng.choice(len(melhores), min(qtd_sequencias, len(melhores)), replace=False)]
+        
+        return self._montar_jogos(onehot, scores, confianca, metricas, selecionados, ultima_rodada)
+
+    def _montar_jogos(self, onehot, scores, confianca, metricas, selecionados, ultima_rodada):
+        # Só os escolhidos viram dicionários
+        chaves = ['impares', 'primos', 'moldura', 'fibo', 'soma'] + (['repetentes'] if ultima_rodada is not None else [])
+        return [{
+            'seq': (np.flatnonzero(onehot[i]) + 1).tolist(),
+            'score': int(scores[i]),
+            'confianca': float(confianca[i]),
+            'metrics': {k: int(metricas[k][i]) for k in chaves}
+        } for i in selecionados]
+
+# --- Atualização em Segundo Plano ---
+# Logo depois de atualizar_dados, os modelos da configuração atual são ajustados aos
+# sorteios novos numa thread; a primeira previsão depois disso já os encontra prontos.
+
+_TRAVA_AQUECIMENTO = threading.Lock()
+
+def _aquecer(df_filtrado, n_dias):
+    AIEngine(df_filtrado, n_dias=n_dias).calcular_probabilidades(df_filtrado)
+
+def aquecer_modelos(df_filtrado, n_dias):
+    """Treina/atualiza e registra os modelos que calcular_probabilidades vai pedir."""
+    with _TRAVA_AQUECIMENTO:
+        _aquecer(df_filtrado, n_dias)
+
+def aquecimento_em_andamento():
+    return _TRAVA_AQUECIMENTO.locked()
+
+def aguardar_aquecimento():
+    """Bloqueia até o aquecimento em andamento (se houver) terminar."""
+    with _TRAVA_AQUECIMENTO:
+        pass
+
+def iniciar_aquecimento(df_filtrado, n_dias):
+    """
+    Dispara o aquecimento numa thread daemon (ignora se já há um em andamento).
+    A trava é tomada aqui, antes da thread existir, para que um clique logo em
+    seguida já veja o aquecimento em andamento; a thread a solta ao terminar.
+    """
+    if not _TRAVA_AQUECIMENTO.acquire(blocking=False):
+        return None
+
+    def tarefa():
+        try:
+            _aquecer(df_filtrado, n_dias)
+        except Exception:
+            logging.getLogger(__name__).exception("Aquecimento de modelos falhou")
+        finally:
+            _TRAVA_AQUECIMENTO.release()
+
+    try:
+        thread = threading.Thread(target=tarefa, name="aquecimento-modelos", daemon=True)
+        thread.start()
+    except Exception:
+        _TRAVA_AQUECIMENTO.release()
+        raise
+    return thread
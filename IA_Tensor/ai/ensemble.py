@@ -1,97 +1,97 @@
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
+from core.data_loader import matriz_onehot, frequencias_acumuladas
+from core.utils import matriz_atrasos
 
-def preparar_dados_ensemble(df, janela_atraso=10):
+# Janelas (em sorteios) das features de frequência; mais janelas = mais colunas, sem laço
+JANELAS_FREQUENCIA = (10,)
+
+def _features_ensemble(onehot, acumuladas, atrasos, posicoes, janelas):
+    """
+    Linhas de features para prever os sorteios nas 'posicoes' (vendo só 0..p-1):
+    [frequência normalizada em cada janela] + [no último sorteio] + [atrasos].
+    """
+    blocos = [(acumuladas[posicoes] - acumuladas[np.maximum(posicoes - w, 0)]) / w for w in janelas]
+    blocos.append(onehot[posicoes - 1])
+    if atrasos is not None:
+        blocos.append(atrasos[posicoes - 1])
+    return np.hstack(blocos).astype(np.float32)
+
+def preparar_dados_ensemble(df, janela_atraso=10, usar_atrasos=True, janelas=None):
     """
     Prepara dados para Random Forest:
-    Features: Frequência recente (10 jogos) + Atrasos
+    Features: Frequência recente (uma ou mais janelas, padrão 10 jogos) + Último sorteio + Atrasos
     Target: Vetor binário (25 números) do próximo jogo
+    Tudo sai das matrizes one-hot/acumuladas/atrasos já calculadas, numa passada só.
     """
-    X = []
-    y = []
-    
-    # Precisamos de pelo menos 'janela_atraso' para criar o primeiro input
-    # E mais 1 para o target
-    start_idx = janela_atraso
+    janelas = tuple(janelas or (janela_atraso,))
+    onehot = matriz_onehot(df)
+    inicio = max(janelas) # Precisamos da maior janela completa para o primeiro input
+    if len(df) <= inicio:
+        return np.zeros((0, 25 * (len(janelas) + 1 + usar_atrasos)), dtype=np.float32), np.zeros((0, 25))
     
-    for i in range(start_idx, len(df)):
-        # --- FEATURES (O que a IA vê) ---
-        # 1. Frequência nos últimos 10 jogos
-        window = df.iloc[i-janela_atraso:i]
-        freqs = np.zeros(25)
-        for nums in window['numeros']:
-            for n in nums:
-                freqs[n-1] += 1
-        freqs = freqs / janela_atraso # Normaliza
-        
-        # 2. Atrasos (Delay)
-        atrasos = np.zeros(25)
-        ultima_rodada = df.iloc[i-1]['rodada']
-        
-        # Otimização de cálculo de atraso
-        # (Poderíamos iterar pra trás, mas vamos simplificar usando o que temos)
-        # Para ser rápido no treino, calculamos aproximado ou iterativo.
-        # Vamos fazer iterativo simples na janela total disponível nos dados passados é muito lento.
-        # Vamos usar apenas a feature de frequencia por enquanto para ser rápido,
-        # e adicionar se o número saiu no ÚLTIMO jogo (Hot/Cold imediato).
-        
-        no_ultimo = np.zeros(25)
-        last_draw = df.iloc[i-1]['numeros']
-        for n in last_draw:
-            no_ultimo[n-1] = 1
-            
-        # Feature Vector: [25 freqs] + [25 binary last draw] = 50 features
-        features = np.concatenate([freqs, no_ultimo])
-        X.append(features)
-        
-        # --- TARGET (O que ela tem que prever) ---
-        target_nums = df.iloc[i]['numeros']
-        target_vec = np.zeros(25)
-        for n in target_nums:
-            target_vec[n-1] = 1
-        y.append(target_vec)
-        
-    return np.array(X), np.array(y)
+    posicoes = np.arange(inicio, len(df))
+    X = _features_ensemble(onehot, frequencias_acumuladas(df), matriz_atrasos(df) if usar_atrasos else None,
+                           posicoes, janelas)
+    y = onehot[posicoes].astype(np.float64)
+    return X, y
 
-def treinar_ensemble(df):
+def treinar_ensemble(df, usar_atrasos=True, n_estimators=100, max_depth=10, janelas=JANELAS_FREQUENCIA):
     """Treina um Random Forest para prever probabilidades."""
     print("Treinando Ensemble (Random Forest)...")
-    X, y = preparar_dados_ensemble(df)
+    X, y = preparar_dados_ensemble(df, usar_atrasos=usar_atrasos, janelas=janelas)
     if len(X) == 0:
         # Fallback para evitar erro se houver poucos dados
         return None
     
+    # Treina em tudo (pois é para prever o FUTURO desconhecido)
+    rf = treinar_floresta(X, y, n_estimators, max_depth)
+    rf.janelas_ = tuple(janelas) # prever_ensemble monta as mesmas colunas
+    
+    return rf
+
+def treinar_floresta(X, y, n_estimators=100, max_depth=10, n_jobs=-1):
+    """Ajusta o Random Forest numa matriz de features já pronta."""
+    from sklearn.ensemble import RandomForestRegressor
+    
     # Modelo: MultiOutput Regressor com Random Forest
     # Usamos Regressor porque queremos "probabilidade" de sair (0.0 a 1.0)
     # n_estimators=100 é um bom balanço entre performance e velocidade
-    rf = RandomForestRegressor(n_estimators=100, n_jobs=-1, random_state=42, max_depth=10)
-    
-    # Treina em tudo (pois é para prever o FUTURO desconhecido)
+    rf = RandomForestRegressor(n_estimators=n_estimators, n_jobs=n_jobs, random_state=42, max_depth=max_depth)
     rf.fit(X, y)
+    return rf
+
+def atualizar_ensemble(rf, df, n_novas_arvores=10, janela_recente=300, max_arvores=200, usar_atrasos=True):
+    """
+    Floresta rolante: acrescenta 'n_novas_arvores' treinadas só nos 'janela_recente'
+    exemplos mais novos (warm_start) e descarta as árvores mais antigas além de
+    'max_arvores'. Evita refazer a floresta inteira a cada sorteio novo.
+    """
+    X, y = preparar_dados_ensemble(df, usar_atrasos=usar_atrasos, janelas=getattr(rf, 'janelas_', JANELAS_FREQUENCIA))
+    if len(X) == 0 or X.shape[1] != rf.n_features_in_:
+        return rf
     
+    rf.set_params(warm_start=True, n_estimators=len(rf.estimators_) + n_novas_arvores)
+    rf.fit(X[-janela_recente:], y[-janela_recente:])
+    rf.set_params(warm_start=False)
+    
+    if len(rf.estimators_) > max_arvores:
+        rf.estimators_ = rf.estimators_[-max_arvores:]
+        rf.set_params(n_estimators=max_arvores)
     return rf
 
 def prever_ensemble(modelo, df_recente):
     """
     Gera previsão para o próximo concurso usando os últimos dados (df_recente).
-    df_recente deve conter pelo menos os últimos 10 jogos.
+    df_recente deve conter pelo menos os últimos max(janelas) jogos.
     """
-    # Montar APENAS o último vetor de input
-    # 1. Frequencia ultimos 10
-    ultimos_10 = df_recente.tail(10)
-    freqs = np.zeros(25)
-    for nums in ultimos_10['numeros']:
-        for n in nums:
-            freqs[n-1] += 1
-    freqs = freqs / 10
-    
-    # 2. No ultimo jogo
-    no_ultimo = np.zeros(25)
-    last_draw = df_recente.iloc[-1]['numeros']
-    for n in last_draw:
-        no_ultimo[n-1] = 1
-        
-    features = np.concatenate([freqs, no_ultimo])
+    # Montar APENAS o último vetor de input (posição len(df): o sorteio que ainda vai sair)
+    janelas = getattr(modelo, 'janelas_', JANELAS_FREQUENCIA)
+    usar_atrasos = modelo.n_features_in_ > 25 * (len(janelas) + 1) # Atrasos só se o modelo foi treinado com eles
+    features = _features_ensemble(
+        matriz_onehot(df_recente), frequencias_acumuladas(df_recente),
+        matriz_atrasos(df_recente) if usar_atrasos else None,
+        np.array([len(df_recente)]), janelas
+    )[0]
     
     # Prever (reshape para 1 amostra)
     # Retorna array de shape (1, 25) com as probabilidades
@@ -1,10 +1,10 @@
 
 import numpy as np
 import pandas as pd
-import random
 from data.caos_exogeno import sincronizar_dados_financeiros, correlacionar_mercado_loteria, calcular_correlacao_exogena
 import datetime
 import streamlit as st
+from core.coocorrencia import matriz_pares
 
 class EvoEngine:
     def __init__(self, df_historico):
@@ -19,54 +19,106 @@ class EvoEngine:
         
     def _calcular_matriz_sinergia(self):
         """Calcula a frequência com que pares de números aparecem juntos no histórico."""
+        # Janela dos últimos 500 sorteios por diferença de prefixos do armazém de co-ocorrências
         matrix = np.zeros((26, 26))
-        for nums in self.df.tail(500)['numeros']:
-            for i in range(len(nums)):
-                for j in range(i + 1, len(nums)):
-                    matrix[nums[i], nums[j]] += 1
-                    matrix[nums[j], nums[i]] += 1
+        matrix[1:, 1:] = matriz_pares(self.df, -500)
+        np.fill_diagonal(matrix, 0)
         return matrix
 
+    def vetor_exogeno(self, df_corr_exogena=None):
+        """Soma das correlações de cada dezena com os ativos (25,), ou zeros sem dados."""
+        vetor = np.zeros(25)
+        if df_corr_exogena is not None and not df_corr_exogena.empty:
+            somas = df_corr_exogena.groupby('Dezena')['Correlação'].sum()
+            somas = somas[(somas.index >= 1) & (somas.index <= 25)]
+            vetor[somas.index.to_numpy(dtype=np.int64) - 1] = somas.to_numpy()
+        return vetor
+
+    def fitness_lote(self, populacao, exogeno=None):
+        """
+        Fitness de toda a população (pop x 25, 0/1) de uma vez: DNA pelas tabelas de
+        avaliar_qualidade_lote, sinergia média dos pares como x^T S x linha a linha e
+        impacto exógeno como x . vetor_exogeno.
+        """
+        from core.utils import avaliar_qualidade_lote
+
+        X = populacao.astype(np.float64)
+        n = X.sum(axis=1)
+        score_base, _ = avaliar_qualidade_lote(populacao, self.df.iloc[-1]['numeros'])
+        # Ajustar a escala do score base para o fitness do AG (score_base vai de 0 a 10 normalmente, AG estava gerando scores perto de 50-60)
+        score = score_base * 5.0
+
+        # Sinergia Histórica (Pares Fortes): x^T S x conta cada par duas vezes
+        sinergia_total = np.einsum('ij,ij->i', X @ self.matrix_sinergia[1:, 1:], X) / 2
+        score += (sinergia_total / np.maximum(n * (n - 1) / 2, 1)) * 0.5
+
+        # Influência Exógena (Mercado Financeiro / Lua)
+        if exogeno is not None:
+            score += (X @ exogeno) * 100
+        return score
+
     def fitness_function(self, individuo, params_alvo, df_corr_exogena=None):
         """
         Calcula o quão 'bom' é um jogo baseado em múltiplos critérios.
         individuo: lista de 15 a 20 números.
         params_alvo: dicionário com metas (Ex: {'impares': 8, 'soma': 200})
         """
-        score = 0
-        seq = sorted(list(individuo))
-        n = len(seq)
-        
-        # 1. Critérios Matemáticos (Equilíbrio via Utils)
-        from core.utils import avaliar_qualidade_jogo
-        
-        ultima_rodada = set(self.df.iloc[-1]['numeros'])
-        score_base, _ = avaliar_qualidade_jogo(seq, ultima_rodada)
-        # Ajustar a escala do score base para o fitness do AG (score_base vai de 0 a 10 normalmente, AG estava gerando scores perto de 50-60)
-        score += score_base * 5 
-        
-        # 2. Sinergia Histórica (Pares Fortes)
-        sinergia_total = 0
-        for i in range(len(seq)):
-            for j in range(i + 1, len(seq)):
-                sinergia_total += self.matrix_sinergia[seq[i], seq[j]]
-        score += (sinergia_total / (n * (n-1) / 2)) * 0.5
-        
-        # 3. Influência Exógena (Mercado Financeiro / Lua)
-        if df_corr_exogena is not None and not df_corr_exogena.empty:
-            # Pegamos o impacto médio de todos os ativos
-            impacto_exogeno = 0
-            for num in seq:
-                # Soma as correlações positivas desse número
-                impacto_exogeno += df_corr_exogena[df_corr_exogena['Dezena'] == num]['Correlação'].sum()
-            score += impacto_exogeno * 100
-            
-        
-        return score
+        from core.utils import matriz_jogos
+        return float(self.fitness_lote(matriz_jogos([list(individuo)]), self.vetor_exogeno(df_corr_exogena))[0])
+
+    # --- Operadores Genéticos (população inteira como matriz pop x 25) ---
+
+    @staticmethod
+    def _populacao_inicial(pop_size, qtd_numeros, rng):
+        """pop_size jogos aleatórios de qtd_numeros dezenas: top-k de chaves uniformes por linha."""
+        escolhidas = np.argpartition(rng.random((pop_size, 25)), qtd_numeros - 1, axis=1)[:, :qtd_numeros]
+        populacao = np.zeros((pop_size, 25), dtype=np.uint8)
+        np.put_along_axis(populacao, escolhidas, 1, axis=1)
+        return populacao
 
-    def evoluir(self, qtd_sequencias=1, qtd_numeros=15, geracoes=50, pop_size=100, mutation_rate=0.1):
+    @staticmethod
+    def _torneio(fitness, n, rng):
+        """n vencedores de torneios de 2 (índices na população)."""
+        a, b = rng.integers(len(fitness), size=(2, n))
+        return np.where(fitness[a] > fitness[b], a, b)
+
+    @staticmethod
+    def _cruzamento(pai1, pai2, rng):
+        """
+        Cada filho herda as dezenas comuns aos pais e completa com metade das que só
+        um dos pais tem, sorteadas; o segundo filho fica com a outra metade. Os dois
+        mantêm o tamanho dos pais, sem reparo.
+        """
+        comuns = pai1 & pai2
+        diferentes = pai1 ^ pai2
+        faltam = (pai1.sum(axis=1) - comuns.sum(axis=1)).astype(np.int64)
+        # Chaves aleatórias só nas dezenas diferentes; as faltam[i] maiores vão para o filho1
+        chaves = np.where(diferentes == 1, rng.random(diferentes.shape), -1.0)
+        postos = np.argsort(np.argsort(-chaves, axis=1), axis=1)
+        herdadas = ((postos < faltam[:, None]) & (diferentes == 1)).astype(np.uint8)
+        return comuns | herdadas, comuns | (diferentes ^ herdadas)
+
+    @staticmethod
+    def _mutacao(populacao, taxa, rng):
+        """Com probabilidade 'taxa', o jogo troca uma dezena sua, ao acaso, por uma de fora."""
+        mutantes = np.flatnonzero(rng.random(len(populacao)) < taxa)
+        if len(mutantes) == 0:
+            return populacao
+        selecionados = populacao[mutantes]
+        chaves = rng.random(selecionados.shape)
+        sai = np.argmax(np.where(selecionados == 1, chaves, -1.0), axis=1)
+        entra = np.argmax(np.where(selecionados == 0, chaves, -1.0), axis=1)
+        linhas = np.arange(len(mutantes))
+        selecionados[linhas, sai] = 0
+        selecionados[linhas, entra] = 1
+        populacao[mutantes] = selecionados
+        return populacao
+
+    def evoluir(self, qtd_sequencias=1, qtd_numeros=15, geracoes=50, pop_size=100, mutation_rate=0.1, semente=None):
         """Executa o Algoritmo Genético para encontrar o melhor jogo."""
-        
+        from core.data_loader import mascaras_de_onehot, mascara_para_numeros, popcount
+        from core.utils import calcular_metricas_dna
+
         # Obter correlações exógenas atuais
         df_corr = pd.DataFrame()
         try:
@@ -78,115 +130,61 @@ class EvoEngine:
                 df_corr = calcular_correlacao_exogena(df_full)
         except:
             pass
-            
+        exogeno = self.vetor_exogeno(df_corr)
+
+        rng = np.random.default_rng(semente)
+        pop_size = max(2, pop_size - pop_size % 2)
+
         # 1. População Inicial
-        populacao = []
-        for _ in range(pop_size):
-            populacao.append(random.sample(range(1, 26), qtd_numeros))
-            
+        populacao = self._populacao_inicial(pop_size, qtd_numeros, rng)
         historico_fitness = []
-        
+
         for g in range(geracoes):
             # 2. Avaliação
-            fitness_scores = [self.fitness_function(ind, {}, df_corr) for ind in populacao]
-            historico_fitness.append(max(fitness_scores))
-            
-            # 3. Seleção (Torneio)
-            nova_populacao = []
-            for _ in range(pop_size // 2):
-                # Selecionar 4 aleatórios e pegar o melhor
-                idx1, idx2 = random.sample(range(pop_size), 2)
-                idx3, idx4 = random.sample(range(pop_size), 2)
-                
-                pai1 = populacao[idx1] if fitness_scores[idx1] > fitness_scores[idx2] else populacao[idx2]
-                pai2 = populacao[idx3] if fitness_scores[idx3] > fitness_scores[idx4] else populacao[idx4]
-                
-                # 4. Crossover (Troca de dezenas)
-                ponto = random.randint(1, qtd_numeros - 1)
-                filho1 = list(set(pai1[:ponto] + pai2[ponto:]))
-                filho2 = list(set(pai2[:ponto] + pai1[ponto:]))
-                
-                # Ajustar tamanho se o set removeu duplicados
-                while len(filho1) < qtd_numeros:
-                    n = random.randint(1, 25)
-                    if n not in filho1: filho1.append(n)
-                while len(filho1) > qtd_numeros: filho1.pop()
-                
-                while len(filho2) < qtd_numeros:
-                    n = random.randint(1, 25)
-                    if n not in filho2: filho2.append(n)
-                while len(filho2) > qtd_numeros: filho2.pop()
-                    
-                nova_populacao.extend([sorted(filho1), sorted(filho2)])
-                
+            fitness_scores = self.fitness_lote(populacao, exogeno)
+            historico_fitness.append(float(fitness_scores.max()))
+
+            # 3. Seleção (Torneio) e 4. Crossover
+            pais1 = populacao[self._torneio(fitness_scores, pop_size // 2, rng)]
+            pais2 = populacao[self._torneio(fitness_scores, pop_size // 2, rng)]
+            filhos1, filhos2 = self._cruzamento(pais1, pais2, rng)
+
             # 5. Mutação
-            for ind in nova_populacao:
-                if random.random() < mutation_rate:
-                    idx_mut = random.randint(0, qtd_numeros - 1)
-                    novo_num = random.randint(1, 25)
-                    if novo_num not in ind:
-                        ind[idx_mut] = novo_num
-            
-            populacao = nova_populacao
-            
+            populacao = self._mutacao(np.concatenate([filhos1, filhos2]), mutation_rate, rng)
+
         # Resultados Finais - Diversidade Forçada
         # Vamos usar uma abordagem de 'Seleção por Nichos' para garantir que os jogos sejam diferentes
-        unique_pop = []
-        seen = set()
-        for ind in populacao:
-            s = tuple(sorted(ind))
-            if s not in seen:
-                unique_pop.append(list(s))
-                seen.add(s)
-        
-        # Calcular fitness para únicos
-        fitness_unique = [self.fitness_function(ind, {}, df_corr) for ind in unique_pop]
-        
+        unicos, primeiros = np.unique(mascaras_de_onehot(populacao), return_index=True)
+        fitness_unique = self.fitness_lote(populacao[primeiros], exogeno)
+
         # Seleção iterativa priorizando diversidade
+        # Penalidade de Similaridade: Reduz fitness se for muito parecido com os já escolhidos
+        penalidade = np.zeros(len(unicos))
+        disponiveis = np.ones(len(unicos), dtype=bool)
+        ultima_rodada = set(self.df.iloc[-1]['numeros'])
         resultados_finais = []
-        indices_restantes = list(range(len(unique_pop)))
-        
-        for _ in range(min(qtd_sequencias, len(unique_pop))):
-            melhor_idx = -1
-            melhor_score_ajustado = -float('inf')
-            
-            for i in indices_restantes:
-                base_fitness = fitness_unique[i]
-                
-                # Penalidade de Similaridade: Reduz fitness se for muito parecido com os já escolhidos
-                # Queremos maximizar a distância (números diferentes)
-                penalidade = 0
-                for escolhido in resultados_finais:
-                    interseccao = len(set(unique_pop[i]).intersection(set(escolhido['seq'])))
-                    # Se tiver mais de 12 números iguais, a penalidade é alta
-                    if interseccao >= 13: penalidade += 50
-                    elif interseccao >= 11: penalidade += 20
-                    elif interseccao >= 10: penalidade += 10
-                
-                score_ajustado = base_fitness - penalidade
-                
-                if score_ajustado > melhor_score_ajustado:
-                    melhor_score_ajustado = score_ajustado
-                    melhor_idx = i
-            
-            if melhor_idx == -1: break
-            
-            indices_restantes.remove(melhor_idx)
-            seq = sorted(unique_pop[melhor_idx])
-            
+
+        for _ in range(min(qtd_sequencias, len(unicos))):
+            melhor_idx = int(np.argmax(np.where(disponiveis, fitness_unique - penalidade, -np.inf)))
+            disponiveis[melhor_idx] = False
+
+            # Se tiver mais de 12 números iguais, a penalidade é alta
+            interseccao = popcount(unicos & unicos[melhor_idx])
+            penalidade += np.select([interseccao >= 13, interseccao >= 11, interseccao >= 10], [50, 20, 10], 0)
+
+            seq = mascara_para_numeros(unicos[melhor_idx])
+
             # Métricas
-            from core.utils import calcular_metricas_dna
             m = calcular_metricas_dna(seq)
-            ultima_rodada = set(self.df.iloc[-1]['numeros'])
             m['repetentes'] = len(set(seq).intersection(ultima_rodada))
-            
+
             resultados_finais.append({
                 'seq': seq,
                 'score': int(fitness_unique[melhor_idx]), # Mostramos o score original
                 'confianca': min(fitness_unique[melhor_idx] / 2, 100),
                 'metrics': m
             })
-            
+
         return resultados_finais, historico_fitness
 
 def renderizar_tab_evolutiva(df):
@@ -198,8 +196,8 @@ def renderizar_tab_evolutiva(df):
     """)
     
     col1, col2, col3 = st.columns(3)
-    pop_size = col1.slider("Tamanho da População", 50, 500, 200)
-    geracoes = col2.slider("Número de Gerações", 10, 200, 100)
+    pop_size = col1.slider("Tamanho da População", 50, 10000, 1000)
+    geracoes = col2.slider("Número de Gerações", 10, 500, 100)
     mut_rate = col3.slider("Taxa de Mutação", 0.01, 0.5, 0.1)
     
     qtd_jogos = st.number_input("Quantidade de Jogos a Gerar", 1, 50, 5)
@@ -1,5 +1,6 @@
 import pandas as pd
 from core.utils import verificar_ineditismo
+from core.data_loader import numeros_para_mascara, obter_mascaras, contar_acertos
 
 def analisar_riscos_jogo(numeros, df_historico=None):
     """
@@ -16,8 +17,8 @@ def analisar_riscos_jogo(numeros, df_historico=None):
               riscos.append(f"⛔ {inedito_msg}")
               
          # Regra Ouro: Cruzar com o imediatamente anterior
-         ultimo_jogo_oficial = set(df_historico.iloc[-1]['numeros'])
-         repetidas_ontem = len(set(numeros).intersection(ultimo_jogo_oficial))
+         ultimo_jogo_oficial = obter_mascaras(df_historico.tail(1))
+         repetidas_ontem = int(contar_acertos(numeros_para_mascara(numeros), ultimo_jogo_oficial)[0])
          
          if repetidas_ontem < 8 or repetidas_ontem > 10:
              riscos.append(f"⚠️ Matemática Perigosa: Você repetiu {repetidas_ontem} números do último sorteio. Essa configuração falha em 80% das vezes. A Regra de Ouro indica repetir de 8 a 10 números.")
@@ -1,43 +1,162 @@
 import numpy as np
-from keras.models import Sequential
-from keras.layers import LSTM, Dense
-from sklearn.preprocessing import MinMaxScaler
-
-def preparar_dados(df, intervalo=30):
-    features = df.drop(columns=['data', 'numeros'])
-    scaler = MinMaxScaler()
-    X = scaler.fit_transform(features)
+from numpy.lib.stride_tricks import sliding_window_view
+from core.data_loader import matriz_onehot
+
+def _colunas_features(df):
+    return df.drop(columns=['data', 'numeros', 'mascara'], errors='ignore')
+
+def ajustar_escala(df):
+    """MinMaxScaler ajustado nas features de df (a escala que o modelo treinado viu)."""
+    from sklearn.preprocessing import MinMaxScaler
+    return MinMaxScaler().fit(_colunas_features(df))
+
+def preparar_dados(df, intervalo=30, scaler=None):
+    """
+    Janelas (amostras x intervalo x features) e alvos one-hot (amostras x 25).
+    entradas[j] = X[j:j + intervalo] é uma view com strides sobre a matriz escalada
+    (nenhuma janela é copiada) e o alvo é o sorteio seguinte, df.iloc[j + intervalo].
+    scaler: escala já ajustada (ajustar_escala) a reaplicar; sem ele, ajusta em df.
+    """
+    scaler = ajustar_escala(df) if scaler is None else scaler
+    X = scaler.transform(_colunas_features(df)).astype(np.float32)
     
-    entradas = []
-    saidas = []
+    if len(X) <= intervalo:
+        return np.zeros((0, intervalo, X.shape[1]), dtype=np.float32), np.zeros((0, 25), dtype=np.float32)
+    
+    # (n - intervalo + 1, features, intervalo) -> (..., intervalo, features); a última
+    # janela termina no sorteio mais recente e ainda não tem alvo
+    entradas = sliding_window_view(X, intervalo, axis=0).transpose(0, 2, 1)[:-1]
+    saidas = matriz_onehot(df)[intervalo:].astype(np.float32)
+    return entradas, saidas
 
-    for i in range(intervalo, len(X)):
-        entradas.append(X[i - intervalo:i])
-        # Convertendo lista de números sorteados em vetor binário
-        y = np.zeros(25)
-        for num in df.iloc[i]['numeros']:
-            y[num - 1] = 1
-        saidas.append(y)
+def ultima_janela(df, intervalo=30, scaler=None):
+    """
+    Janela (1 x intervalo x features) com os 'intervalo' sorteios mais recentes de df:
+    a entrada para prever o sorteio seguinte ao fim de df (preparar_dados descarta
+    essa janela por não ter alvo). Use o mesmo scaler do treino.
+    """
+    scaler = ajustar_escala(df) if scaler is None else scaler
+    X = scaler.transform(_colunas_features(df.tail(intervalo))).astype(np.float32)
+    return X[None, ...]
 
-    return np.array(entradas), np.array(saidas)
+def _dataset_janelas(X, y, batch_size, embaralhar=True):
+    """
+    PyDataset que monta cada lote a partir da view de janelas: só o lote é copiado,
+    nunca o tensor inteiro. Embaralha as amostras a cada época, como o fit faria.
+    """
+    from keras.utils import PyDataset
+    
+    class _Janelas(PyDataset):
+        def __init__(self):
+            super().__init__()
+            self.ordem = np.arange(len(X))
+            self.on_epoch_end()
+        
+        def __len__(self):
+            return -(-len(X) // batch_size)
+        
+        def __getitem__(self, indice):
+            lote = self.ordem[indice * batch_size:(indice + 1) * batch_size]
+            return X[lote], y[lote]
+        
+        def on_epoch_end(self):
+            if embaralhar:
+                np.random.shuffle(self.ordem)
+    
+    return _Janelas()
 
-def treinar_modelo(X, y):
+def treinar_modelo(X, y, unidades=16, epocas=5, batch_size=64):
     import tensorflow as tf
-    from keras.layers import Input
+    from keras.models import Sequential
+    from keras.layers import Input, LSTM, Dense
     
     # Forçar CPU para modelos pequenos (evita overhead do Metal e travamentos no Mac)
     with tf.device('/CPU:0'):
         modelo = Sequential()
         modelo.add(Input(shape=(X.shape[1], X.shape[2])))
-        modelo.add(LSTM(16, return_sequences=False))
+        modelo.add(LSTM(unidades, return_sequences=False))
         modelo.add(Dense(25, activation='sigmoid'))
         modelo.compile(optimizer='adam', loss='binary_crossentropy')
         
         # Treino ultra rápido
-        modelo.fit(X, y, epochs=5, batch_size=64, verbose=0)
+        modelo.fit(_dataset_janelas(X, y, batch_size), epochs=epocas, verbose=0)
+    return modelo
+
+def atualizar_modelo(modelo, X_novos, y_novos, epocas=2, batch_size=64):
+    """
+    Ajuste fino (warm start) de um modelo já treinado usando só as janelas novas:
+    parte dos pesos do último checkpoint em vez de treinar do zero.
+    """
+    import tensorflow as tf
+    
+    if len(X_novos) == 0:
+        return modelo
+    with tf.device('/CPU:0'):
+        modelo.fit(_dataset_janelas(X_novos, y_novos, batch_size), epochs=epocas, verbose=0)
     return modelo
 
 def prever_proxima_rodada(modelo, entrada, qtd_numeros=15):
     pred = modelo.predict(entrada)[0]
     indices = np.argsort(pred)[-qtd_numeros:]
     return [i + 1 for i in sorted(indices)]
+
+# --- Inferência em NumPy ---
+# O modelo é pequeno (uma LSTM + uma Dense): com os pesos exportados em .npz, o
+# forward roda em NumPy puro e servir um modelo já treinado não carrega o TensorFlow.
+
+def _sigmoide(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+class LSTMNumpy:
+    """
+    Forward de LSTM (ativação tanh, recorrente sigmoid, portas na ordem i, f, c, o
+    do Keras) seguida de Dense(25, sigmoid). predict() tem a mesma assinatura do Keras.
+    """
+
+    def __init__(self, kernel, recurrent_kernel, bias, dense_kernel, dense_bias):
+        self.kernel = np.asarray(kernel, dtype=np.float32)
+        self.recurrent_kernel = np.asarray(recurrent_kernel, dtype=np.float32)
+        self.bias = np.asarray(bias, dtype=np.float32)
+        self.dense_kernel = np.asarray(dense_kernel, dtype=np.float32)
+        self.dense_bias = np.asarray(dense_bias, dtype=np.float32)
+
+    @classmethod
+    def de_keras(cls, modelo):
+        """Exporta os pesos de um Sequential(Input, LSTM, Dense) treinado."""
+        camadas = {camada.__class__.__name__: camada for camada in modelo.layers}
+        lstm, densa = camadas['LSTM'], camadas['Dense']
+        if lstm.activation.__name__ != 'tanh' or lstm.recurrent_activation.__name__ != 'sigmoid':
+            raise ValueError("LSTMNumpy só reproduz LSTM com ativações tanh/sigmoid")
+        return cls(*lstm.get_weights(), *densa.get_weights())
+
+    def predict(self, X, verbose=0, tamanho_lote=4096):
+        """(amostras x passos x features) -> (amostras x 25), em lotes para limitar a memória."""
+        unidades = self.recurrent_kernel.shape[0]
+        saida = np.empty((len(X), self.dense_bias.shape[0]), dtype=np.float32)
+        for inicio in range(0, len(X), tamanho_lote):
+            lote = np.asarray(X[inicio:inicio + tamanho_lote], dtype=np.float32)
+            # Projeção da entrada de todos os passos numa multiplicação só
+            entrada = lote @ self.kernel + self.bias
+            h = np.zeros((len(lote), unidades), dtype=np.float32)
+            c = np.zeros_like(h)
+            for t in range(lote.shape[1]):
+                i, f, g, o = np.split(entrada[:, t] + h @ self.recurrent_kernel, 4, axis=1)
+                c = _sigmoide(f) * c + _sigmoide(i) * np.tanh(g)
+                h = _sigmoide(o) * np.tanh(c)
+            saida[inicio:inicio + len(lote)] = _sigmoide(h @ self.dense_kernel + self.dense_bias)
+        return saida
+
+    def salvar(self, caminho):
+        np.savez(caminho, kernel=self.kernel, recurrent_kernel=self.recurrent_kernel, bias=self.bias,
+                 dense_kernel=self.dense_kernel, dense_bias=self.dense_bias)
+
+    @classmethod
+    def carregar(cls, caminho):
+        with np.load(caminho) as pesos:
+            return cls(**{nome: pesos[nome] for nome in pesos.files})
+
+def exportar_pesos(modelo, caminho):
+    """Salva os pesos do modelo Keras em .npz para inferência sem TensorFlow."""
+    modelo_np = LSTMNumpy.de_keras(modelo)
+    modelo_np.salvar(caminho)
+    return modelo_np
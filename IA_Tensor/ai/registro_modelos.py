@@ -0,0 +1,220 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from core.data_loader import versao_dados
+
+try:
+    import fcntl
+except ImportError: # Windows: sem flock, o registro assume um único processo
+    fcntl = None
+
+# --- Registro de Modelos Treinados ---
+# Cada modelo (LSTM, Random Forest...) fica salvo em disco sob uma chave que junta
+# a impressão digital dos dados, a janela de datas, o n_dias e os hiperparâmetros.
+# Mesma configuração = mesmo modelo: servido da memória ou do disco, sem retreinar.
+
+DIRETORIO_MODELOS = "modelos_cache"
+LIMITE_DISCO = 24      # modelos mantidos em disco (LRU)
+LIMITE_MEMORIA = 4     # modelos mantidos já carregados (LRU)
+
+_MEMORIA = OrderedDict()
+_TRAVA = threading.RLock()
+_TRAVA_ARQUIVO = {'profundidade': 0, 'arquivo': None}
+
+def chave_modelo(tipo, df, n_dias=None, hiperparametros=None):
+    """Chave estável do modelo: tipo + dados + janela de datas + n_dias + hiperparâmetros."""
+    partes = {
+        'tipo': tipo,
+        'dados': versao_dados(df),
+        'janela': [str(df['data'].iloc[0].date()), str(df['data'].iloc[-1].date())] if len(df) else [],
+        'n_dias': n_dias,
+        'hiperparametros': hiperparametros or {}
+    }
+    texto = json.dumps(partes, sort_keys=True, default=str)
+    return f"{tipo}-{hashlib.blake2b(texto.encode(), digest_size=10).hexdigest()}"
+
+def chave_configuracao(tipo, df, n_dias=None, hiperparametros=None):
+    """
+    Igual a chave_modelo, mas sem os dados nem o fim da janela: identifica a mesma
+    configuração ao longo do tempo, para achar o modelo anterior a sorteios novos.
+    """
+    partes = {
+        'tipo': tipo,
+        'inicio': str(df['data'].iloc[0].date()) if len(df) else None,
+        'n_dias': n_dias,
+        'hiperparametros': hiperparametros or {}
+    }
+    texto = json.dumps(partes, sort_keys=True, default=str)
+    return hashlib.blake2b(texto.encode(), digest_size=10).hexdigest()
+
+def metadados_modelo(configuracao, df):
+    """Metadados que permitem reconhecer df como continuação dos dados do modelo."""
+    return {'configuracao': configuracao, 'n_sorteios': len(df), 'versao': versao_dados(df)}
+
+# --- Formatos de Arquivo ---
+
+def _salvar_keras(modelo, caminho):
+    modelo.save(caminho)
+
+def _carregar_keras(caminho):
+    from keras.models import load_model
+    return load_model(caminho)
+
+def _salvar_joblib(modelo, caminho):
+    import joblib
+    joblib.dump(modelo, caminho)
+
+def _carregar_joblib(caminho):
+    import joblib
+    return joblib.load(caminho)
+
+def _salvar_npz(modelo, caminho):
+    modelo.salvar(caminho)
+
+def _carregar_npz(caminho):
+    from ai.lstm import LSTMNumpy
+    return LSTMNumpy.carregar(caminho)
+
+FORMATOS = {
+    'keras': ('.keras', _salvar_keras, _carregar_keras),
+    'npz': ('.npz', _salvar_npz, _carregar_npz), # pesos da LSTM para inferência em NumPy
+    'joblib': ('.joblib', _salvar_joblib, _carregar_joblib),
+}
+
+# --- Índice em Disco ---
+
+def _caminho_indice(diretorio):
+    return os.path.join(diretorio, "indice.json")
+
+@contextmanager
+def _trava_registro(diretorio):
+    """
+    Exclusão mútua no ler-alterar-gravar do indice.json: RLock entre threads e flock
+    num arquivo .lock entre processos (pool da busca de hiperparâmetros, workers do
+    Streamlit). Reentrante: só a chamada mais externa pega e solta o flock.
+    """
+    with _TRAVA:
+        if _TRAVA_ARQUIVO['profundidade'] == 0 and fcntl is not None:
+            os.makedirs(diretorio, exist_ok=True)
+            _TRAVA_ARQUIVO['arquivo'] = open(os.path.join(diretorio, "indice.lock"), 'a')
+            fcntl.flock(_TRAVA_ARQUIVO['arquivo'], fcntl.LOCK_EX)
+        _TRAVA_ARQUIVO['profundidade'] += 1
+        try:
+            yield
+        finally:
+            _TRAVA_ARQUIVO['profundidade'] -= 1
+            if _TRAVA_ARQUIVO['profundidade'] == 0 and _TRAVA_ARQUIVO['arquivo'] is not None:
+                fcntl.flock(_TRAVA_ARQUIVO['arquivo'], fcntl.LOCK_UN)
+                _TRAVA_ARQUIVO['arquivo'].close()
+                _TRAVA_ARQUIVO['arquivo'] = None
+
+def _ler_indice(diretorio):
+    try:
+        with open(_caminho_indice(diretorio), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _gravar_indice(diretorio, indice):
+    caminho = _caminho_indice(diretorio)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w') as f:
+        json.dump(indice, f, indent=2)
+    os.replace(temporario, caminho)
+
+def _remover_arquivo(diretorio, arquivo):
+    try:
+        os.remove(os.path.join(diretorio, arquivo))
+    except OSError:
+        pass
+
+def _despejar(diretorio, indice, limite):
+    """Remove do disco os modelos menos usados recentemente além do limite."""
+    excedentes = sorted(indice, key=lambda c: indice[c]['ultimo_uso'])[:max(0, len(indice) - limite)]
+    for chave in excedentes:
+        _remover_arquivo(diretorio, indice.pop(chave)['arquivo'])
+
+def _guardar_memoria(chave, modelo):
+    _MEMORIA[chave] = modelo
+    _MEMORIA.move_to_end(chave)
+    while len(_MEMORIA) > LIMITE_MEMORIA:
+        _MEMORIA.popitem(last=False)
+
+# --- API ---
+
+def carregar_modelo(chave, formato, diretorio=DIRETORIO_MODELOS, da_memoria=True):
+    """
+    Modelo registrado sob 'chave' (memória primeiro, depois disco), ou None.
+    Com da_memoria=False lê sempre do disco: devolve uma cópia que pode ser alterada.
+    """
+    with _trava_registro(diretorio):
+        if da_memoria and chave in _MEMORIA:
+            _MEMORIA.move_to_end(chave)
+            return _MEMORIA[chave]
+
+        indice = _ler_indice(diretorio)
+        entrada = indice.get(chave)
+        if entrada is None:
+            return None
+        try:
+            modelo = FORMATOS[formato][2](os.path.join(diretorio, entrada['arquivo']))
+        except Exception:
+            # Arquivo sumiu ou corrompeu: esquece a entrada e deixa retreinar
+            _remover_arquivo(diretorio, indice.pop(chave)['arquivo'])
+            _gravar_indice(diretorio, indice)
+            return None
+
+        entrada['ultimo_uso'] = time.time()
+        _gravar_indice(diretorio, indice)
+        if da_memoria:
+            _guardar_memoria(chave, modelo)
+        return modelo
+
+def buscar_modelo_anterior(configuracao, df, formato, diretorio=DIRETORIO_MODELOS):
+    """
+    Modelo mais recente da mesma configuração treinado num prefixo de df (sorteios
+    novos só no fim). Retorna (cópia do modelo, n_sorteios do prefixo) ou (None, 0).
+    """
+    with _trava_registro(diretorio):
+        candidatos = sorted(
+            ((chave, entrada['metadados']) for chave, entrada in _ler_indice(diretorio).items()
+             if entrada.get('metadados', {}).get('configuracao') == configuracao
+             and entrada['metadados'].get('n_sorteios', 0) < len(df)),
+            key=lambda item: item[1]['n_sorteios'], reverse=True
+        )
+        for chave, metadados in candidatos:
+            if versao_dados(df.iloc[:metadados['n_sorteios']]) == metadados['versao']:
+                modelo = carregar_modelo(chave, formato, diretorio, da_memoria=False)
+                if modelo is not None:
+                    return modelo, metadados['n_sorteios']
+    return None, 0
+
+def registrar_modelo(chave, modelo, formato, diretorio=DIRETORIO_MODELOS, metadados=None):
+    """Salva o modelo em disco sob 'chave' e aplica o despejo LRU."""
+    extensao, salvar, _ = FORMATOS[formato]
+    with _trava_registro(diretorio):
+        os.makedirs(diretorio, exist_ok=True)
+        arquivo = f"{chave}{extensao}"
+        salvar(modelo, os.path.join(diretorio, arquivo))
+
+        indice = _ler_indice(diretorio)
+        agora = time.time()
+        indice[chave] = {'arquivo': arquivo, 'formato': formato, 'criado': agora,
+                         'ultimo_uso': agora, 'metadados': metadados or {}}
+        _despejar(diretorio, indice, LIMITE_DISCO)
+        _gravar_indice(diretorio, indice)
+        _guardar_memoria(chave, modelo)
+    return modelo
+
+def obter_modelo(chave, treinar, formato, diretorio=DIRETORIO_MODELOS, metadados=None):
+    """Devolve o modelo registrado sob 'chave' ou o treina com treinar() e registra."""
+    modelo = carregar_modelo(chave, formato, diretorio)
+    if modelo is None:
+        modelo = treinar()
+        if modelo is not None:
+            registrar_modelo(chave, modelo, formato, diretorio, metadados)
+    return modelo
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import altair as alt
+from core.coocorrencia import matriz_pares
 
 def renderizar_mapa_conexoes(df):
     st.markdown("---")
@@ -16,12 +17,9 @@ def renderizar_mapa_conexoes(df):
     n_concursos = len(df)
     matriz = np.zeros((26, 26)) # 1 a 25 (usaremos indices 1-25)
     
-    # Preencher contagens
-    for nums in df['numeros']:
-        for n1 in nums:
-            for n2 in nums:
-                if n1 != n2:
-                    matriz[n1][n2] += 1
+    # Contagens lidas do armazém de co-ocorrências (XᵀX, sem recontar sorteio a sorteio)
+    matriz[1:, 1:] = matriz_pares(df)
+    np.fill_diagonal(matriz, 0)
                     
     # Converter para Porcentagem (Probabilidade de Par)
     # Ex: Se '1' saiu 100 vezes, e '1 e 2' saíram juntos 80 vezes -> Força = 80% (mas isso é condicional)
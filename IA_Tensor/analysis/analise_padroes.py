@@ -1,62 +1,44 @@
 
 import pandas as pd
-from itertools import combinations
-from collections import Counter, defaultdict
+import numpy as np
+from collections import Counter
 import streamlit as st
-from core.utils import calcular_metricas_dna
+from core.utils import calcular_metricas_dna_lote, indice_ciclos, estado_ciclo_atual
+from core.data_loader import numeros_para_mascara, obter_mascaras, contem_dezenas, indices_por_data
+from core.coocorrencia import estatisticas_combinacoes
 
 
 def analisar_recorrencias(df):
     """
     Analisa duplas e trios frequentes e calcula estatísticas de intervalo (gaps).
     """
-    pares_ocorrencias = defaultdict(list)
-    trios_ocorrencias = defaultdict(list)
-    
     max_rodada = df['rodada'].max() if not df.empty else 0
+    rodadas = df['rodada'].to_numpy()
     
-    # Mapear ocorrências
-    for rodada_id, numeros in zip(df['rodada'], df['numeros']):
-        numeros_sorted = sorted(numeros)
+    def processar_dados(tamanho, format_func):
+        # Contagem e primeira/última aparição de cada combinação vêm do armazém de co-ocorrências
+        stats = estatisticas_combinacoes(df, tamanho)
+        saiu = stats['contagem'] > 0
+        qtd = stats['contagem'][saiu]
+        primeira = rodadas[stats['primeira'][saiu]]
+        ultima = rodadas[stats['ultima'][saiu]]
         
-        for par in combinations(numeros_sorted, 2):
-            pares_ocorrencias[par].append(rodada_id)
-            
-        for trio in combinations(numeros_sorted, 3):
-            trios_ocorrencias[trio].append(rodada_id)
-            
-    def processar_dados(ocorrencias_dict, format_func):
-        data = []
-        for combo, lista_rodadas in ocorrencias_dict.items():
-            qtd = len(lista_rodadas)
-            lista_rodadas.sort()
-            
-            # Cálculo de Gaps
-            if qtd > 1:
-                gaps = [lista_rodadas[i] - lista_rodadas[i-1] for i in range(1, qtd)]
-                media_gap = sum(gaps) / len(gaps)
-            else:
-                media_gap = 0
-                
-            atraso = max_rodada - lista_rodadas[-1]
-            
-            data.append({
-                'Numeros': format_func(combo),
-                'Frequencia': qtd,
-                'Média Gap': round(media_gap, 1),
-                'Atraso': atraso
-            })
-            
-        df_out = pd.DataFrame(data)
+        # Média dos gaps entre aparições consecutivas = (última - primeira) / (qtd - 1)
+        media_gap = np.where(qtd > 1, (ultima - primeira) / np.maximum(qtd - 1, 1), 0)
+        
+        df_out = pd.DataFrame({
+            'Numeros': [format_func(combo) for combo in stats['dezenas'][saiu].tolist()],
+            'Frequencia': qtd,
+            'Média Gap': [round(g, 1) for g in media_gap.tolist()],
+            'Atraso': max_rodada - ultima
+        })
         if not df_out.empty:
-            df_out = df_out.sort_values(by='Frequencia', ascending=False)
-        else:
-             df_out = pd.DataFrame(columns=['Numeros', 'Frequencia', 'Média Gap', 'Atraso'])
+            df_out = df_out.sort_values(by='Frequencia', ascending=False, kind='stable')
              
         return df_out[['Numeros', 'Frequencia', 'Média Gap', 'Atraso']]
 
-    df_pares = processar_dados(pares_ocorrencias, lambda x: f"{x[0]} - {x[1]}")
-    df_trios = processar_dados(trios_ocorrencias, lambda x: f"{x[0]} - {x[1]} - {x[2]}")
+    df_pares = processar_dados(2, lambda x: f"{x[0]} - {x[1]}")
+    df_trios = processar_dados(3, lambda x: f"{x[0]} - {x[1]} - {x[2]}")
     
     return df_pares, df_trios
 
@@ -81,9 +63,9 @@ def renderizar_analise_padroes(df):
     with col_d2:
         dt_fim = st.date_input("Data Final", value=max_global, min_value=min_global, max_value=max_global, key="ana_dt_fim")
         
-    # Filtra o DF com base nas datas selecionadas localmente
-    mask = (df['data'].dt.date >= dt_ini) & (df['data'].dt.date <= dt_fim)
-    df_filtrado = df.loc[mask]
+    # Filtra o DF com base nas datas selecionadas localmente (busca binária, sem varrer a coluna)
+    inicio, fim = indices_por_data(df, dt_ini, dt_fim)
+    df_filtrado = df.iloc[inicio:fim]
     
     if df_filtrado.empty:
         st.warning("Sem dados para analisar no período selecionado.")
@@ -126,23 +108,18 @@ def renderizar_analise_padroes(df):
     
     if nums_selecionados:
         st.markdown(f"**Selecionados:** {sorted(nums_selecionados)}")
-        nums_set = set(nums_selecionados)
-        rodadas_encontradas = []
-        
-        # Iterar sobre o DF filtrado
-        for _, row in df_filtrado.iterrows():
-            if nums_set.issubset(set(row['numeros'])):
-                rodadas_encontradas.append(row)
+        # Filtro binário: sorteios que contêm todas as dezenas selecionadas
+        filtro_combo = contem_dezenas(numeros_para_mascara(nums_selecionados), obter_mascaras(df_filtrado))
+        df_encontradas = df_filtrado[filtro_combo]
         
-        count = len(rodadas_encontradas)
+        count = len(df_encontradas)
         porcentagem = (count / len(df_filtrado) * 100) if len(df_filtrado) > 0 else 0
         
         st.success(f"A combinação **{sorted(nums_selecionados)}** apareceu **{count}** vezes ({porcentagem:.2f}%) neste período.")
         
         # --- Cálculo de Estatísticas de Intervalo (Gaps) ---
         if count > 1:
-            rodadas_ids = [r['rodada'] for r in rodadas_encontradas]
-            rodadas_ids.sort()
+            rodadas_ids = sorted(df_encontradas['rodada'].tolist())
             
             # Calcular intervalos (diferença entre rodadas consecutivas onde houve acerto)
             gaps = [rodadas_ids[i] - rodadas_ids[i-1] for i in range(1, len(rodadas_ids))]
@@ -187,7 +164,7 @@ def renderizar_analise_padroes(df):
 
         if count > 0:
             with st.expander("Ver detalhes dos concursos"):
-                df_detalhe = pd.DataFrame(rodadas_encontradas)[['rodada', 'data', 'numeros']]
+                df_detalhe = df_encontradas[['rodada', 'data', 'numeros']].copy()
                 df_detalhe['data'] = df_detalhe['data'].dt.strftime('%d/%m/%Y')
                 st.dataframe(df_detalhe, hide_index=True, width='stretch')
 
@@ -197,17 +174,13 @@ def renderizar_analise_padroes(df):
     st.markdown("### ⚖️ Métricas de Equilíbrio (DNA do Jogo)")
     st.caption("Distribuição estatística dos resultados no período selecionado. Jogos equilibrados tendem a seguir estas médias.")
 
-    # Processamento dos Dados
-    dados_equilibrio = []
-    for numeros in df_filtrado['numeros']:
-        metricas = calcular_metricas_dna(numeros)
-        dados_equilibrio.append({
-            'Impares': metricas['impares'],
-            'Primos': metricas['primos'],
-            'Soma': metricas['soma']
-        })
-    
-    df_eq = pd.DataFrame(dados_equilibrio)
+    # Processamento dos Dados (todos os sorteios do período em lote)
+    metricas = calcular_metricas_dna_lote(obter_mascaras(df_filtrado))
+    df_eq = pd.DataFrame({
+        'Impares': metricas['impares'].astype(int),
+        'Primos': metricas['primos'].astype(int),
+        'Soma': metricas['soma'].astype(int)
+    })
     
     col_eq1, col_eq2, col_eq3 = st.columns(3)
     
@@ -298,31 +271,16 @@ def renderizar_ciclos(df):
     # Garantir ordenação
     df = df.sort_values('rodada')
     
-    # Lógica Forward (Do início ao fim) para determinar estado atual
-    numeros_no_ciclo = set()
-    ultimo_fechamento = -1
-    
-    # Percorrer todo o histórico para simular os ciclos reais
-    for i, row in df.iterrows():
-        numeros = set(row['numeros'])
-        numeros_no_ciclo.update(numeros)
-        
-        if len(numeros_no_ciclo) == 25:
-            # Ciclo fechou nesta rodada
-            numeros_no_ciclo.clear()
-            ultimo_fechamento = row['rodada']
-            
-    # Estado Atual
-    # Se numeros_no_ciclo estiver vazio, significa que o ultimo sorteio fechou o ciclo.
-    # Logo, estamos iniciando um NOVO ciclo.
+    import altair as alt
     
-    todos = set(range(1, 26))
-    sairam = numeros_no_ciclo
-    faltam_sair = sorted(list(todos - sairam))
+    # Estado atual e histórico de ciclos lidos do índice (construído uma vez por versão dos dados)
+    indice = indice_ciclos(df)
+    estado = estado_ciclo_atual(df)
+    faltam_sair = estado['faltantes']
     
     # Determinar se ciclo fechou no último (novo ciclo iniciando agora)
-    # Se len(sairam) == 0, então o ciclo fechou no último processado.
-    ciclo_fechado_ultimo = (len(sairam) == 0)
+    # Se nada saiu no ciclo aberto, então o ciclo fechou no último processado.
+    ciclo_fechado_ultimo = (len(estado['sairam']) == 0)
     
     c1, c2 = st.columns([1, 2])
     
@@ -339,12 +297,8 @@ def renderizar_ciclos(df):
         st.caption("Como o ciclo reiniciou, todos os 25 números estão disponíveis. Não há 'faltantes' para forçar.")
         
     else:
-        # Calcular tamanho do ciclo atual em andamento
-        # Filtra rodadas APÓS o ultimo fechamento
-        if ultimo_fechamento == -1:
-            tamanho = len(df)
-        else:
-            tamanho = len(df[df['rodada'] > ultimo_fechamento])
+        # Tamanho do ciclo atual em andamento (rodadas após o último fechamento)
+        tamanho = estado['sorteios']
 
         with c1:
             st.metric("Ciclo Atual (Andamento)", f"{tamanho} rodadas")
@@ -358,6 +312,27 @@ def renderizar_ciclos(df):
         )
         st.caption("Estatisticamente, apostar nestes números é muito forte para os próximos sorteios.")
 
+    # Estatísticas históricas dos ciclos fechados (saem do mesmo índice, sem custo extra)
+    tamanhos = indice['tamanho']
+    if tamanhos.size > 0:
+        st.markdown("#### 📏 Duração Histórica dos Ciclos")
+        h1, h2, h3, h4 = st.columns(4)
+        h1.metric("Ciclos Fechados", f"{tamanhos.size}")
+        h2.metric("Duração Média", f"{tamanhos.mean():.1f} rods")
+        h3.metric("Mais Comum", f"{np.bincount(tamanhos).argmax()} rods")
+        h4.metric("Mais Longo", f"{tamanhos.max()} rods")
+        if not ciclo_fechado_ultimo:
+            pct_fechados = (tamanhos <= estado['sorteios']).mean() * 100
+            st.caption(f"{pct_fechados:.0f}% dos ciclos da história já tinham fechado com {estado['sorteios']} rodadas.")
+        
+        df_tamanhos = pd.Series(tamanhos).value_counts().sort_index().rename_axis('Duração').reset_index(name='Ciclos')
+        chart_ciclos = alt.Chart(df_tamanhos).mark_bar().encode(
+            x=alt.X('Duração:O', axis=alt.Axis(labelAngle=0)),
+            y='Ciclos:Q',
+            tooltip=['Duração', 'Ciclos']
+        )
+        st.altair_chart(chart_ciclos, width='stretch')
+
     # Análise extra: Números mais frequentes sozinhos
     numeros_isolados = Counter()
     for rodada in df['numeros']:
@@ -366,7 +341,6 @@ def renderizar_ciclos(df):
     df_isolados = pd.DataFrame(numeros_isolados.most_common(), columns=['Número', 'Frequência'])
     df_isolados = df_isolados.sort_values(by='Frequência', ascending=False)
     
-    import altair as alt
 
     st.markdown("---")
     st.markdown("#### 🏆 Frequência Individual dos Números (Geral)")
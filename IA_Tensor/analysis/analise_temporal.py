@@ -1,7 +1,9 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import altair as alt
-from collections import Counter
+from datetime import date
+from core.data_loader import matriz_onehot, frequencias_janela, frequencias_por_data
 
 def renderizar_analise_temporal(df):
     st.markdown("---")
@@ -91,16 +93,23 @@ def renderizar_analise_temporal(df):
     
     # Calcular Frequências no Subset
     total_draws = len(df_filtered)
-    counts = Counter()
-    for nums in df_filtered['numeros']:
-        counts.update(nums)
+    so_filtro_anos = filtro_dia_tipo == "Todos" and not filtro_dia_semana_en and filtro_periodo == "Todo o Ano"
+    if so_filtro_anos:
+        # Cada ano é uma janela contígua de sorteios: frequência = subtração no índice acumulado
+        counts = np.zeros(25, dtype=np.int64)
+        for ano in (filtro_anos or [None]):
+            inicio_ano = date(ano, 1, 1) if ano else None
+            fim_ano = date(ano, 12, 31) if ano else None
+            counts += frequencias_por_data(df_temp, inicio_ano, fim_ano)[0]
+    else:
+        counts = matriz_onehot(df_filtered).sum(axis=0)
         
     data_freq = []
     # Probabilidade base teórica da Lotofácil (15/25 = 0.60)
     FREQ_TEORICA = 0.60
     
     for num in range(1, 26):
-        qtd = counts[num]
+        qtd = int(counts[num - 1])
         freq = qtd / total_draws
         diff = freq - FREQ_TEORICA # Diferença da média estatistica
         data_freq.append({
@@ -161,24 +170,16 @@ def renderizar_analise_temporal(df):
             with st.spinner(f"🕵️‍♂️ Comparando os {len(df_filtered)} jogos filtrados com a média histórica..."):
                 insights = []
                 
-                # Helper para calcular frequencia
-                def get_freqs(dframe):
-                    total = len(dframe)
-                    if total == 0: return {}
-                    c = Counter()
-                    for nums in dframe['numeros']: c.update(nums)
-                    return {k: v/total for k,v in c.items()}
-
-                # Média Global (Baseline - O "Normal" da Loteria)
-                global_freqs = get_freqs(df_temp)
+                # Média Global (Baseline - O "Normal" da Loteria), direto do índice acumulado
+                global_freqs = frequencias_janela(df_temp) / len(df_temp)
                 
                 # Média do Filtro (O comportamento neste cenário específico)
-                filter_freqs = get_freqs(df_filtered)
+                filter_freqs = counts / total_draws
                 
                 # 1. Análise Direta: Quem brilha neste filtro?
                 for num in range(1, 26):
-                    freq_filtro = filter_freqs.get(num, 0)
-                    freq_global = global_freqs.get(num, 0)
+                    freq_filtro = filter_freqs[num - 1]
+                    freq_global = global_freqs[num - 1]
                     
                     diff = freq_filtro - freq_global
                     
@@ -26,12 +26,17 @@ def analisar_tendencias_recentes(df, window=20):
     # Recorte recente
     df_recente = df.tail(window).copy()
     
-    # Calcular métricas para cada jogo do recorte
-    metricas_list = []
-    for nums in df_recente['numeros']:
-        metricas_list.append(calcular_metricas(nums))
-        
-    df_metrics = pd.DataFrame(metricas_list)
+    # Calcular métricas de todos os jogos do recorte em lote
+    from core.utils import calcular_metricas_dna_lote
+    from core.data_loader import obter_mascaras
+    m = calcular_metricas_dna_lote(obter_mascaras(df_recente))
+    df_metrics = pd.DataFrame({
+        'Impares': m['impares'].astype(int),
+        'Primos': m['primos'].astype(int),
+        'Moldura': m['moldura'].astype(int),
+        'Fibo': m['fibo'].astype(int),
+        'Soma': m['soma'].astype(int)
+    })
     
     # Médias Observadas vs Esperadas (Teóricas aproximadas para Lotofácil)
     referencias = {
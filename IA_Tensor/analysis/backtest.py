@@ -4,6 +4,8 @@ import numpy as np
 from collections import Counter
 import random
 import altair as alt
+from core.data_loader import obter_mascaras, matriz_onehot, mascaras_de_onehot, popcount
+from core.utils import matriz_acertos, matriz_atrasos, FAIXAS_PREMIO
 
 def calcular_premio(acertos):
     # Prêmios fixos base (valores aproximados)
@@ -26,6 +28,7 @@ def executar_simulacao(df, n_dias, qtd_testes=5):
         return pd.DataFrame()
         
     prog_bar = st.progress(0)
+    atrasos_matriz = matriz_atrasos(df)
     
     for i in range(qtd_testes):
         prog_bar.progress((i + 1) / qtd_testes)
@@ -37,10 +40,8 @@ def executar_simulacao(df, n_dias, qtd_testes=5):
         target_numeros = set(row_alvo['numeros'])
         
         # --- MODELO PROXY (Simulação Rápida) ---
-        df_treino = df.iloc[:idx_alvo].copy()
-        
         # 1. Frequência Dinâmica nos últimos 15 jogos (Peso 60%)
-        ultimos_15 = df_treino.tail(15)
+        ultimos_15 = df.iloc[max(0, idx_alvo - 15):idx_alvo]
         freq_contador = Counter()
         for nums in ultimos_15['numeros']:
             freq_contador.update(nums)
@@ -52,21 +53,13 @@ def executar_simulacao(df, n_dias, qtd_testes=5):
         # 2. Atraso Inteligente (Peso 40%)
         # Penaliza números muito atrasados (>10) pois tendem a continuar frios em tendências curtas
         # Mas bonifica atrasos médios (reversão à média)
-        prob_atraso = np.zeros(25)
-        ultima_rodada_abs = df_treino['rodada'].max()
-        for num in range(1, 26):
-            ocorrencias = df_treino[df_treino['numeros'].apply(lambda x: num in x)]
-            if not ocorrencias.empty:
-                atraso = ultima_rodada_abs - ocorrencias['rodada'].max()
-                if atraso <= 2:
-                    val = 0.3 # Repetição recente (Hot)
-                elif 3 <= atraso <= 8:
-                    val = 0.5 # Zona de retorno provavel
-                else: 
-                    val = 0.2 # Muito frio
-                prob_atraso[num-1] = val
-            else:
-                prob_atraso[num-1] = 0.1 # Never seen
+        # Linha idx_alvo-1 da matriz = atrasos vistos antes do sorteio alvo (sem viagem no tempo)
+        atrasos = atrasos_matriz[idx_alvo - 1]
+        prob_atraso = np.select(
+            [atrasos < 0, atrasos <= 2, atrasos <= 8],
+            [0.1, 0.3, 0.5], # Never seen / Repetição recente (Hot) / Zona de retorno provavel
+            default=0.2 # Muito frio
+        )
         
         # Fusão
         prob_final = (prob_freq * 0.6) + (prob_atraso * 0.4)
@@ -175,12 +168,7 @@ def renderizar_tab_lab(df, n_dias):
             df_teste = df.tail(periodo_teste).copy()
             df_historico_base = df.head(len(df) - periodo_teste).copy() # Para o caso das mais frequentes (sem viagem no tempo)
             
-            resultados_estrategia = []
-            ganho_financeiro = 0.0
-            
             with st.spinner("Varrendo a linha do tempo..."):
-                prog_bar = st.progress(0)
-                
                 # Validação prévia de Teimosinha
                 teimosinha_set = set()
                 if "Teimosinha" in estrategia_escolhida:
@@ -193,60 +181,45 @@ def renderizar_tab_lab(df, n_dias):
                          st.error("Formato inválido de números. Use vírgulas.")
                          st.stop()
                          
-                curr_history = df_historico_base.copy()
+                # Bilhete jogado em cada sorteio testado (periodo x 25), montado de uma vez
+                onehot_teste = matriz_onehot(df_teste)
                 
-                for idx, (_, row) in enumerate(df_teste.iterrows()):
-                    prog_bar.progress((idx + 1) / periodo_teste)
-                    alvo = set(row['numeros'])
-                    
-                    jogo_gerado = set()
-                    if "Teimosinha" in estrategia_escolhida:
-                        jogo_gerado = teimosinha_set
-                    elif "Frequentes" in estrategia_escolhida:
-                        todas_nums = []
-                        for nums in curr_history['numeros']: todas_nums.extend(nums)
-                        c = Counter(todas_nums)
-                        top15 = [x[0] for x in c.most_common(15)]
-                        jogo_gerado = set(top15)
-                    elif "Zebras" in estrategia_escolhida:
-                        # Contagem do tempo em que as bolas não saem
-                        # Simplificado: as 15 que menos saíram genericamente pro teste rápido na memory history
-                        todas_nums = []
-                        for nums in curr_history['numeros']: todas_nums.extend(nums)
-                        c = Counter(todas_nums)
-                        # preenche os que nem saíram com 0
-                        for i in range(1, 26):
-                            if i not in c: c[i] = 0
-                        frias15 = [x[0] for x in c.most_common()[:-16:-1]]
-                        jogo_gerado = set(frias15)
-                    elif "Aleatório" in estrategia_escolhida:
-                        jogo_gerado = set(random.sample(range(1, 26), 15))
-                        
-                    acertos = len(jogo_gerado.intersection(alvo))
-                    premio = calcular_premio(acertos)
-                    ganho_financeiro += premio
-                    
-                    resultados_estrategia.append({
-                        'Rodada': row['rodada'],
-                        'Acertos': acertos,
-                        'Premio': premio
-                    })
-                    
-                    # Alimenta o histórico simulando a passagem do tempo passo a passo
-                    curr_history = pd.concat([curr_history, pd.DataFrame([row])])
-            
-            prog_bar.empty()
+                if "Teimosinha" in estrategia_escolhida:
+                    # Bilhete fixo: o motor de backtest em lote faz tudo num só produto matricial
+                    acertos = matriz_acertos([sorted(teimosinha_set)], df_teste)[0].astype(np.int64)
+                else:
+                    if "Aleatório" in estrategia_escolhida:
+                        ordem = np.argsort(np.random.random((periodo_teste, 25)), axis=1)
+                    else:
+                        # Contagens acumuladas ANTES de cada sorteio (sem viagem no tempo)
+                        contagens = matriz_onehot(df_historico_base).sum(axis=0).astype(np.int64)
+                        contagens = contagens + np.cumsum(onehot_teste, axis=0) - onehot_teste
+                        if "Frequentes" in estrategia_escolhida:
+                            ordem = np.argsort(-contagens, axis=1, kind='stable')
+                        else:
+                            # Zebras: as 15 que menos saíram genericamente até aquele sorteio
+                            ordem = np.argsort(contagens, axis=1, kind='stable')
+                    jogos = np.zeros((periodo_teste, 25), dtype=np.uint8)
+                    np.put_along_axis(jogos, ordem[:, :15], 1, axis=1)
+                    # Cada bilhete só enfrenta o seu próprio sorteio: a "diagonal" do backtest
+                    acertos = popcount(mascaras_de_onehot(jogos) & obter_mascaras(df_teste))
+                
+                tabela_premios = np.array([calcular_premio(a) for a in range(16)])
+                
+                df_res_est = pd.DataFrame({
+                    'Rodada': df_teste['rodada'].to_numpy(),
+                    'Acertos': acertos,
+                    'Premio': tabela_premios[acertos]
+                })
             
             # Análise
-            df_res_est = pd.DataFrame(resultados_estrategia)
+            ganho_financeiro = float(df_res_est['Premio'].sum())
             custo_total = periodo_teste * custo_aposta
             lucro_liquido = ganho_financeiro - custo_total
             roi = (lucro_liquido / custo_total) * 100 if custo_total > 0 else 0
             
             # Tabela de ocorrências de acertos
-            count_premios = {11: 0, 12: 0, 13: 0, 14: 0, 15: 0}
-            for a in df_res_est['Acertos']:
-                if a in count_premios: count_premios[a] += 1
+            count_premios = {faixa: int(np.count_nonzero(acertos == faixa)) for faixa in FAIXAS_PREMIO}
                 
             st.success("🏁 Simulação Temporo-Mecânica Concluída!")
             
@@ -1,40 +1,40 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
 import altair as alt
 import streamlit as st
 
-def extrair_metricas_avancadas(numeros):
+def extrair_metricas_lote(jogos):
     """
-    Retorna vetor de features para clusterização:
+    Matriz de features (jogos x 6) para clusterização, calculada em lote:
     [Soma, Ímpares, Primos, Moldura, Desvio Padrão, Amplitude Interquartil]
     """
-    from core.utils import calcular_metricas_dna
-    nums = sorted(list(numeros))
-    m = calcular_metricas_dna(nums)
-    soma = m['soma']
-    imp = m['impares']
-    pri = m['primos']
-    mol = m['moldura']
+    from core.utils import calcular_metricas_dna_lote
+    nums = np.sort(np.array(jogos, dtype=np.float64), axis=1)
+    m = calcular_metricas_dna_lote(jogos)
     
     # Métricas de dispersão (distribuição no volante)
-    std = np.std(nums)
-    iqr = np.percentile(nums, 75) - np.percentile(nums, 25)
+    std = np.std(nums, axis=1)
+    iqr = np.percentile(nums, 75, axis=1) - np.percentile(nums, 25, axis=1)
     
-    return [soma, imp, pri, mol, std, iqr]
+    return np.column_stack([m['soma'], m['impares'], m['primos'], m['moldura'], std, iqr])
+
+def extrair_metricas_avancadas(numeros):
+    """
+    Retorna vetor de features para clusterização:
+    [Soma, Ímpares, Primos, Moldura, Desvio Padrão, Amplitude Interquartil]
+    """
+    return extrair_metricas_lote([list(numeros)])[0].tolist()
 
 @st.cache_data
 def treinar_modelo_clusters(numeros_historico):
     """
     Treina o KMeans com todo o histórico para encontrar os arquétipos (famílias) de jogos.
     """
-    # Preparar Dataset
-    X = []
-    for nums in numeros_historico:
-        X.append(extrair_metricas_avancadas(nums))
+    from sklearn.cluster import KMeans
+    from sklearn.preprocessing import StandardScaler
     
-    X = np.array(X)
+    # Preparar Dataset
+    X = extrair_metricas_lote(numeros_historico)
     
     # Normalizar (Importante pois Soma ~200 e Primos ~5 têm escalas muito diferentes)
     scaler = StandardScaler()
@@ -1,10 +1,12 @@
+import time
+INICIO_SCRIPT = time.perf_counter()
+
 import streamlit as st
 import pandas as pd
 from datetime import datetime
 from analysis.analise_padroes import renderizar_analise_padroes, renderizar_ciclos
 from ui.desdobramento import renderizar_tab_desdobramento
 from analysis.backtest import renderizar_tab_lab
-from data.atualizador import atualizar_dados
 from analysis.analise_temporal import renderizar_analise_temporal
 from ui.montador import renderizar_montador_manual
 from analysis.analise_conexoes import renderizar_mapa_conexoes
@@ -15,7 +17,11 @@ from data.caos_exogeno import renderizar_caos_exogeno
 from ui.teorias_ludicas import renderizar_tab_teorias_ludicas
 from ui.tab_previsao import renderizar_tab_previsao
 from ai.evolutiva import renderizar_tab_evolutiva
-from core.data_loader import carregar_dados
+from core.data_loader import carregar_dados, indices_por_data
+from core.diagnostico import renderizar_diagnostico
+
+# Pilhas pesadas (Keras/TensorFlow, sklearn, yfinance, requests) só são importadas
+# dentro das funções que as usam, para não atrasar a primeira renderização
 
 st.set_page_config(layout="wide", page_title="IA Lotofácil Pro") #tamanho da tela
 st.title("IA - Previsão de Rodada")
@@ -26,8 +32,10 @@ df = carregar_dados()
 st.sidebar.header("Parâmetros")
 
 if st.sidebar.button("🔄 Atualizar Base de Dados"):
+    from data.atualizador import atualizar_dados
     if atualizar_dados("rodadas.json"):
         st.cache_data.clear() # Limpa cache se houver
+        st.session_state.base_atualizada = True # Ajusta os modelos aos sorteios novos no próximo ciclo
         st.rerun()
 
 # Datas Limites da Base
@@ -74,11 +82,18 @@ salvar_aprendizado = st.sidebar.checkbox("Salvar aprendizado após execução",
 tab_manual, tab_previsao, tab_evolutiva, tab_analise, tab_montador, tab_desdobra, tab_lab, tab_ludico, tab_caos = st.tabs(["📘 Manual", "🔮 Previsão", "🧬 IA Evolutiva", "📊 Análise", "🏗️ Montador", "🔢 Desdobrador", "🧪 Laboratório", "🎭 Lúdico", "🌌 Caos Exógeno"])
 
 
-# Filtrar dados para análise baseado no sidebar definido acima
-df_filtrado_analise = df[(df['data'] >= pd.to_datetime(data_inicial)) & (df['data'] <= pd.to_datetime(data_final))].reset_index(drop=True)
+# Filtrar dados para análise baseado no sidebar definido acima (busca binária nas datas)
+inicio_analise, fim_analise = indices_por_data(df, data_inicial, data_final)
+df_filtrado_analise = df.iloc[inicio_analise:fim_analise].reset_index(drop=True)
+
+# Base acabou de ser atualizada: ajusta LSTM/RF aos sorteios novos em segundo plano
+if st.session_state.pop('base_atualizada', False) and not df_filtrado_analise.empty:
+    from ai.engine import iniciar_aquecimento
+    iniciar_aquecimento(df_filtrado_analise, int(n_dias))
 
 with tab_manual:
     renderizar_manual_instrucoes()
+    renderizar_diagnostico(time.perf_counter() - INICIO_SCRIPT)
 
 with tab_evolutiva:
     renderizar_tab_evolutiva(df)
@@ -0,0 +1,154 @@
+import os
+import zipfile
+from itertools import combinations
+import numpy as np
+from core.data_loader import matriz_onehot, obter_derivado, versao_dados
+
+# --- Armazém de Co-ocorrências (Pares e Trios) ---
+# Contagens de pares (XᵀX acumulado, com soma de prefixos para qualquer janela) e de
+# trios, mais a primeira/última aparição de cada combinação. Construído uma vez por
+# versão dos dados (~80 ms para o histórico inteiro); o disco guarda só o armazém do
+# maior histórico visto, e janelas (df filtrado) ficam apenas na memória.
+
+CAMINHO_CACHE = "coocorrencia.cache.npz"
+
+# Combinações de dezenas (índices 0-24) na ordem de itertools.combinations
+_PARES = np.array(list(combinations(range(25), 2)), dtype=np.int64)
+_TRIOS = np.array(list(combinations(range(25), 3)), dtype=np.int64)
+_COMBINACOES = {2: ('pares', _PARES), 3: ('trios', _TRIOS)}
+
+def _armazem_vazio():
+    return {
+        'n': 0,
+        'pares_prefixo': np.zeros((1, 25, 25), dtype=np.int32),
+        'pares_primeira': np.full(len(_PARES), -1, dtype=np.int32),
+        'pares_ultima': np.full(len(_PARES), -1, dtype=np.int32),
+        'trios': np.zeros(len(_TRIOS), dtype=np.int32),
+        'trios_primeira': np.full(len(_TRIOS), -1, dtype=np.int32),
+        'trios_ultima': np.full(len(_TRIOS), -1, dtype=np.int32),
+    }
+
+def _indicadores(onehot, combos):
+    """Matriz booleana (sorteios x combinações): True se todas as dezenas da combinação saíram."""
+    presente = onehot.astype(bool)
+    indicador = presente[:, combos[:, 0]]
+    for coluna in range(1, combos.shape[1]):
+        indicador = indicador & presente[:, combos[:, coluna]]
+    return indicador
+
+def _acumular(armazem, mascaras_novas):
+    """Soma os sorteios novos ao armazém (usado na construção e para completar um prefixo salvo)."""
+    base = armazem['n']
+    onehot = matriz_onehot(mascaras_novas).astype(np.int32)
+    novo = dict(armazem)
+    novo['n'] = base + len(onehot)
+    if len(onehot) == 0:
+        return novo
+
+    externos = onehot[:, :, None] * onehot[:, None, :]
+    novo['pares_prefixo'] = np.concatenate([
+        armazem['pares_prefixo'],
+        armazem['pares_prefixo'][-1] + np.cumsum(externos, axis=0, dtype=np.int32)
+    ])
+
+    for nome, combos in (('pares', _PARES), ('trios', _TRIOS)):
+        indicador = _indicadores(onehot, combos)
+        saiu = indicador.any(axis=0)
+        primeira = armazem[f'{nome}_primeira'].copy()
+        ultima = armazem[f'{nome}_ultima'].copy()
+        inedita = saiu & (primeira < 0)
+        primeira[inedita] = base + np.argmax(indicador, axis=0)[inedita]
+        ultima[saiu] = base + len(indicador) - 1 - np.argmax(indicador[::-1], axis=0)[saiu]
+        novo[f'{nome}_primeira'] = primeira
+        novo[f'{nome}_ultima'] = ultima
+        if nome == 'trios':
+            novo['trios'] = armazem['trios'] + indicador.sum(axis=0, dtype=np.int32)
+    return novo
+
+def _ler_cache(caminho):
+    try:
+        with np.load(caminho) as arquivo:
+            dados = {chave: arquivo[chave] for chave in arquivo.files}
+        dados['n'] = int(dados['n'])
+        dados['versao'] = str(dados['versao'])
+        return dados
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return None
+
+def _salvar_cache(caminho, armazem, versao):
+    temporario = f"{caminho}.tmp.npz"
+    np.savez(temporario, versao=versao, **armazem)
+    os.replace(temporario, caminho)
+
+def _construir_armazem(mascaras, caminho_cache):
+    """
+    Reaproveita o armazém salvo em disco se ele for desta versão ou de um prefixo dela.
+    Só grava se o resultado cobre pelo menos tantos sorteios quanto o salvo: um df
+    filtrado (mais curto) nunca substitui o armazém do histórico completo.
+    """
+    versao = versao_dados(mascaras)
+    salvo = _ler_cache(caminho_cache) if caminho_cache else None
+    n_salvo = salvo['n'] if salvo is not None else 0
+    if salvo is not None:
+        versao_salva = salvo.pop('versao')
+        if salvo['n'] > len(mascaras) or versao_dados(mascaras[:salvo['n']]) != versao_salva:
+            salvo = None
+    if salvo is None:
+        salvo = _armazem_vazio()
+    elif salvo['n'] == len(mascaras):
+        return salvo
+
+    armazem = _acumular(salvo, mascaras[salvo['n']:])
+    if caminho_cache and len(mascaras) >= n_salvo:
+        _salvar_cache(caminho_cache, armazem, versao)
+    return armazem
+
+def obter_coocorrencia(df, persistir=True):
+    """
+    Armazém de co-ocorrências dos sorteios de df. Com persistir=True o armazém do
+    maior histórico é gravado em CAMINHO_CACHE e reaproveitado nas próximas execuções.
+    Sorteios novos refazem o armazém (mais barato que estender o prefixo e regravar o arquivo).
+    """
+    caminho_cache = CAMINHO_CACHE if persistir else None
+    return obter_derivado(df, 'coocorrencia', lambda m: _construir_armazem(m, caminho_cache))
+
+# --- Consultas ---
+
+def matriz_pares(df, inicio=0, fim=None):
+    """
+    Matriz 25x25 de co-ocorrência (diagonal = frequência de cada dezena) entre as
+    linhas inicio:fim de df, obtida por diferença de prefixos. Aceita índices
+    negativos (ex: inicio=-500 = últimos 500 sorteios).
+    """
+    prefixo = obter_coocorrencia(df)['pares_prefixo']
+    inicio, fim, _ = slice(inicio, fim).indices(prefixo.shape[0] - 1)
+    return prefixo[max(fim, inicio)] - prefixo[inicio]
+
+def tensor_trios(df):
+    """Tensor simétrico 25x25x25 com quantas vezes cada trio de dezenas saiu junto."""
+    contagens = obter_coocorrencia(df)['trios']
+    tensor = np.zeros((25, 25, 25), dtype=np.int32)
+    i, j, k = _TRIOS.T
+    for a, b, c in ((i, j, k), (i, k, j), (j, i, k), (j, k, i), (k, i, j), (k, j, i)):
+        tensor[a, b, c] = contagens
+    return tensor
+
+def estatisticas_combinacoes(df, tamanho):
+    """
+    Estatísticas de todas as combinações de 'tamanho' (2 ou 3) dezenas em df:
+    dezenas (combinações x tamanho, 1-25), contagem e posição (linha de df) da
+    primeira e da última aparição (-1 se nunca saiu).
+    """
+    nome, combos = _COMBINACOES[tamanho]
+    armazem = obter_coocorrencia(df)
+    if tamanho == 2:
+        pares = armazem['pares_prefixo'][-1]
+        contagem = pares[combos[:, 0], combos[:, 1]]
+    else:
+        contagem = armazem['trios']
+    return {
+        'dezenas': combos + 1,
+        'contagem': contagem,
+        'primeira': armazem[f'{nome}_primeira'],
+        'ultima': armazem[f'{nome}_ultima'],
+    }
@@ -1,16 +1,354 @@
 import pandas as pd
 import json
+import os
+import gc
+import hashlib
+import threading
+from collections import OrderedDict
 import numpy as np
 import streamlit as st
 
+# Pesos de cada dezena na máscara de 25 bits (bit 0 = dezena 1, bit 24 = dezena 25)
+_BITS_DEZENAS = np.left_shift(np.uint32(1), np.arange(25, dtype=np.uint32))
+# Tabela de popcount só é necessária em NumPy < 2.0 (sem np.bitwise_count)
+_POPCOUNT_16 = None if hasattr(np, 'bitwise_count') else np.array([bin(i).count('1') for i in range(1 << 16)], dtype=np.uint8)
+
 @st.cache_data
 def carregar_dados():
-    caminho = "rodadas.json"
+    return ler_historico("rodadas.json")
+
+# --- Cache Binário do Histórico (sidecar .npy) ---
+# O rodadas.json (indentado, ~1.2 MB) só é parseado quando muda. Nas demais
+# inicializações o histórico vem de um array estruturado mapeado em memória.
+
+_DTYPE_SIDECAR = np.dtype([('rodada', '<i4'), ('dia', '<i4'), ('mascara', '<u4')])
+
+def _caminhos_sidecar(caminho):
+    return f"{caminho}.cache.npy", f"{caminho}.cache.json"
+
+def _carimbo_arquivo(caminho):
+    info = os.stat(caminho)
+    return {'mtime_ns': info.st_mtime_ns, 'tamanho': info.st_size}
+
+def _hash_arquivo(caminho):
+    with open(caminho, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def _gravar_atomico(caminho, escrever):
+    """Escreve em arquivo temporário e troca de uma vez (nunca deixa meio arquivo)."""
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as f:
+        escrever(f)
+    os.replace(temporario, caminho)
+
+def _reconstruir_sidecar(caminho, sha1=None):
     with open(caminho, 'r') as f:
         dados = json.load(f)
-    df = pd.DataFrame(dados)
-    df['data'] = pd.to_datetime(df['data'])
-    return df
+    dados.sort(key=lambda d: d['rodada'])
+
+    registros = np.zeros(len(dados), dtype=_DTYPE_SIDECAR)
+    registros['rodada'] = [d['rodada'] for d in dados]
+    registros['dia'] = np.array([d['data'] for d in dados], dtype='datetime64[D]').astype(np.int64)
+    registros['mascara'] = mascaras_de_numeros(d['numeros'] for d in dados)
+
+    caminho_npy, caminho_meta = _caminhos_sidecar(caminho)
+    _gravar_atomico(caminho_npy, lambda f: np.save(f, registros))
+    meta = _carimbo_arquivo(caminho)
+    meta['sha1'] = sha1 or _hash_arquivo(caminho)
+    _gravar_atomico(caminho_meta, lambda f: f.write(json.dumps(meta).encode()))
+    return registros
+
+def _carregar_sidecar(caminho):
+    """Retorna o array mapeado em memória, reconstruindo-o só se o JSON mudou."""
+    caminho_npy, caminho_meta = _caminhos_sidecar(caminho)
+    try:
+        with open(caminho_meta, 'r') as f:
+            meta = json.load(f)
+        carimbo = _carimbo_arquivo(caminho)
+        if carimbo['mtime_ns'] != meta['mtime_ns'] or carimbo['tamanho'] != meta['tamanho']:
+            # mtime mudou (cópia, checkout...): só reconstrói se o conteúdo mudou de fato
+            sha1 = _hash_arquivo(caminho)
+            if sha1 != meta['sha1']:
+                return _reconstruir_sidecar(caminho, sha1)
+            meta.update(carimbo)
+            _gravar_atomico(caminho_meta, lambda f: f.write(json.dumps(meta).encode()))
+        return np.load(caminho_npy, mmap_mode='r')
+    except (OSError, ValueError, KeyError):
+        return _reconstruir_sidecar(caminho)
+
+# --- Diário de Sorteios Novos (append-only) ---
+# Sorteios novos entram no rodadas.jsonl, uma linha JSON por sorteio, e a escrita
+# custa só o que chegou. De tempos em tempos a compactação os incorpora ao
+# rodadas.json com uma troca atômica, e até lá o carregador junta os dois.
+
+LIMITE_DIARIO = 100
+
+def caminho_diario(caminho):
+    return f"{os.path.splitext(caminho)[0]}.jsonl"
+
+def ler_diario(caminho):
+    """Sorteios do diário. Uma última linha incompleta (queda no meio da escrita) é ignorada."""
+    registros = []
+    try:
+        with open(caminho_diario(caminho), 'r') as f:
+            for linha in f:
+                try:
+                    registros.append(json.loads(linha))
+                except json.JSONDecodeError:
+                    continue
+    except FileNotFoundError:
+        pass
+    return registros
+
+def anexar_sorteios(novos, caminho="rodadas.json"):
+    """Anexa os sorteios (dicts rodada/data/numeros) ao diário e força a ida ao disco."""
+    if not novos:
+        return 0
+    linhas = ''.join(json.dumps(d) + '\n' for d in novos)
+    with open(caminho_diario(caminho), 'ab+') as f:
+        # Se a última escrita foi interrompida, começa numa linha nova
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                linhas = '\n' + linhas
+        f.write(linhas.encode())
+        f.flush()
+        os.fsync(f.fileno())
+    return len(novos)
+
+def ultima_rodada_salva(caminho="rodadas.json"):
+    """Maior rodada entre o arquivo principal (via sidecar) e o diário, sem parsear o JSON."""
+    registros = _carregar_sidecar(caminho)
+    rodadas = [int(registros['rodada'].max())] if len(registros) else []
+    rodadas += [d['rodada'] for d in ler_diario(caminho)]
+    return max(rodadas, default=0)
+
+def _mesclar_sorteios(dados, diario):
+    """Une as listas por rodada (o diário prevalece) e devolve ordenado por rodada."""
+    por_rodada = {d['rodada']: d for d in dados}
+    por_rodada.update((d['rodada'], d) for d in diario)
+    return [por_rodada[r] for r in sorted(por_rodada)]
+
+def compactar_historico(caminho="rodadas.json"):
+    """
+    Incorpora o diário ao arquivo principal (troca atômica) e então apaga o diário.
+    Uma queda entre os dois passos é inofensiva: sorteios repetidos são unidos por rodada.
+    """
+    diario = ler_diario(caminho)
+    if not diario:
+        return 0
+    with open(caminho, 'r') as f:
+        dados = _mesclar_sorteios(json.load(f), diario)
+    _gravar_atomico(caminho, lambda f: f.write(json.dumps(dados, indent=4).encode()))
+    _reconstruir_sidecar(caminho)
+    os.remove(caminho_diario(caminho))
+    return len(diario)
+
+def _registros_diario(caminho, registros):
+    """Acrescenta aos registros do sidecar os sorteios do diário que ainda não estão nele."""
+    diario = ler_diario(caminho)
+    if not diario:
+        return registros
+    diario = _mesclar_sorteios([], diario)
+    extras = np.zeros(len(diario), dtype=_DTYPE_SIDECAR)
+    extras['rodada'] = [d['rodada'] for d in diario]
+    extras['dia'] = np.array([d['data'] for d in diario], dtype='datetime64[D]').astype(np.int64)
+    extras['mascara'] = mascaras_de_numeros(d['numeros'] for d in diario)
+
+    # Rodadas do diário substituem as do arquivo principal (mesma regra da compactação)
+    base = np.asarray(registros)
+    base = base[~np.isin(base['rodada'], extras['rodada'])]
+    combinados = np.concatenate([base, extras])
+    return combinados[np.argsort(combinados['rodada'], kind='stable')]
+
+def ler_historico(caminho="rodadas.json"):
+    """
+    Carrega o histórico completo (rodada, data, numeros, mascara) ordenado por rodada,
+    já com os sorteios pendentes no diário (rodadas.jsonl).
+    Não depende do Streamlit: pode ser usado por scripts de análise em lote.
+    """
+    registros = _registros_diario(caminho, _carregar_sidecar(caminho))
+    mascaras = np.array(registros['mascara'], dtype=np.uint32)
+    onehot = matriz_onehot(mascaras)
+    # Milhares de listas novas disparariam o coletor cíclico no meio da carga
+    gc_ativo = gc.isenabled()
+    gc.disable()
+    try:
+        if onehot.shape[0] and np.all(onehot.sum(axis=1) == 15):
+            # Todos os sorteios têm 15 dezenas: as colunas ligadas já vêm ordenadas por linha
+            # (uint8 deixa o tolist() bem mais rápido que int64)
+            numeros = (np.nonzero(onehot)[1].reshape(-1, 15) + 1).astype(np.uint8).tolist()
+        else:
+            numeros = [mascara_para_numeros(m) for m in mascaras]
+
+        return pd.DataFrame({
+            'rodada': np.array(registros['rodada'], dtype=np.int64),
+            'data': np.array(registros['dia'], dtype=np.int64).astype('datetime64[D]').astype('datetime64[ns]'),
+            'numeros': numeros,
+            'mascara': mascaras
+        })
+    finally:
+        if gc_ativo:
+            gc.enable()
+
+# --- Representação Binária dos Sorteios ---
+# Cada jogo vira um inteiro de 25 bits. Interseção de jogos passa a ser um AND
+# seguido de popcount, sem criar set() linha a linha.
+
+def numeros_para_mascara(numeros):
+    """Converte uma lista de dezenas (1-25) em máscara de 25 bits."""
+    mascara = 0
+    for n in numeros:
+        mascara |= 1 << (int(n) - 1)
+    return mascara
+
+def mascara_para_numeros(mascara):
+    """Converte uma máscara de 25 bits de volta para a lista ordenada de dezenas."""
+    mascara = int(mascara)
+    return [i + 1 for i in range(25) if (mascara >> i) & 1]
+
+def mascaras_de_numeros(lista_numeros):
+    """Converte uma sequência de jogos (listas de dezenas) em um array uint32 de máscaras."""
+    lista_numeros = list(lista_numeros)
+    if not lista_numeros:
+        return np.zeros(0, dtype=np.uint32)
+    tamanhos = np.fromiter((len(nums) for nums in lista_numeros), dtype=np.int64, count=len(lista_numeros))
+    planos = np.fromiter((n for nums in lista_numeros for n in nums), dtype=np.int64, count=int(tamanhos.sum()))
+    bits = _BITS_DEZENAS[planos - 1]
+    # Dezenas de um mesmo jogo são distintas, então somar os bits equivale ao OR
+    inicios = np.concatenate(([0], np.cumsum(tamanhos)[:-1]))
+    mascaras = np.add.reduceat(bits, inicios).astype(np.uint32)
+    mascaras[tamanhos == 0] = 0
+    return mascaras
+
+def obter_mascaras(df):
+    """Retorna as máscaras do DataFrame (usa a coluna 'mascara' se já existir)."""
+    if 'mascara' in df.columns:
+        return df['mascara'].to_numpy(dtype=np.uint32)
+    return mascaras_de_numeros(df['numeros'])
+
+def matriz_onehot(mascaras):
+    """
+    Matriz contígua uint8 (n_sorteios x 25): coluna j = 1 se a dezena j+1 saiu.
+    Aceita um array de máscaras ou um DataFrame com 'numeros'/'mascara'.
+    """
+    if isinstance(mascaras, pd.DataFrame):
+        mascaras = obter_mascaras(mascaras)
+    mascaras = np.asarray(mascaras, dtype=np.uint32)
+    return np.ascontiguousarray(((mascaras[:, None] & _BITS_DEZENAS) != 0).astype(np.uint8))
+
+def mascaras_de_onehot(matriz):
+    """Inverso de matriz_onehot: (N x 25) -> array uint32 de máscaras."""
+    matriz = np.asarray(matriz, dtype=np.uint32)
+    return (matriz @ _BITS_DEZENAS).astype(np.uint32)
+
+def popcount(valores):
+    """Conta os bits ligados de cada elemento (vetorizado)."""
+    valores = np.asarray(valores, dtype=np.uint32)
+    if _POPCOUNT_16 is None:
+        return np.bitwise_count(valores).astype(np.int64)
+    return (_POPCOUNT_16[valores & 0xFFFF] + _POPCOUNT_16[valores >> 16]).astype(np.int64)
+
+def contar_acertos(mascara_jogo, mascaras):
+    """Quantidade de dezenas em comum entre um jogo e cada sorteio."""
+    return popcount(np.asarray(mascaras, dtype=np.uint32) & np.uint32(mascara_jogo))
+
+def contem_dezenas(mascara_sel, mascaras):
+    """Array booleano: quais sorteios contêm TODAS as dezenas da máscara selecionada."""
+    mascara_sel = np.uint32(mascara_sel)
+    return (np.asarray(mascaras, dtype=np.uint32) & mascara_sel) == mascara_sel
+
+# --- Cache de Estruturas Derivadas (por versão dos dados) ---
+# Índices caros (ineditismo, atrasos, ciclos...) são construídos uma única vez
+# para cada versão do histórico e reaproveitados entre reruns do Streamlit.
+
+_MAX_DERIVADOS = 32
+_CACHE_DERIVADOS = OrderedDict()
+# Última versão de cada estrutura incremental: nome -> (n_sorteios, versao, objeto)
+_ULTIMOS_DERIVADOS = {}
+# O aquecimento de modelos roda numa thread junto com a do Streamlit; reentrante
+# porque construir() pode pedir outras estruturas derivadas
+_TRAVA_DERIVADOS = threading.RLock()
+
+def versao_dados(mascaras):
+    """Impressão digital curta de uma sequência de sorteios (ordem importa)."""
+    if isinstance(mascaras, pd.DataFrame):
+        mascaras = obter_mascaras(mascaras)
+    mascaras = np.ascontiguousarray(mascaras, dtype=np.uint32)
+    return hashlib.blake2b(mascaras.tobytes(), digest_size=12).hexdigest()
+
+def obter_derivado(df, nome, construir, estender=None):
+    """
+    Retorna a estrutura 'nome' para os sorteios de df, construindo-a com
+    construir(mascaras) apenas na primeira vez que esta versão aparece.
+    Se estender(objeto, mascaras_novas) for informado e a última versão
+    conhecida for um prefixo de df (sorteios novos no fim), ela é apenas
+    estendida em vez de reconstruída do zero.
+    """
+    mascaras = obter_mascaras(df)
+    versao = versao_dados(mascaras)
+    chave = (nome, versao)
+    with _TRAVA_DERIVADOS:
+        if chave in _CACHE_DERIVADOS:
+            _CACHE_DERIVADOS.move_to_end(chave)
+            return _CACHE_DERIVADOS[chave]
+
+        objeto = None
+        anterior = _ULTIMOS_DERIVADOS.get(nome) if estender is not None else None
+        if anterior is not None:
+            n_anterior, versao_anterior, objeto_anterior = anterior
+            if n_anterior < len(mascaras) and versao_dados(mascaras[:n_anterior]) == versao_anterior:
+                objeto = estender(objeto_anterior, mascaras[n_anterior:])
+        if objeto is None:
+            objeto = construir(mascaras)
+
+        if estender is not None:
+            _ULTIMOS_DERIVADOS[nome] = (len(mascaras), versao, objeto)
+        _CACHE_DERIVADOS[chave] = objeto
+        if len(_CACHE_DERIVADOS) > _MAX_DERIVADOS:
+            _CACHE_DERIVADOS.popitem(last=False)
+        return objeto
+
+# --- Índice de Frequências Acumuladas ---
+# acumuladas[i] = quantas vezes cada dezena saiu nos sorteios 0..i-1 (linha 0 zerada).
+# A frequência de qualquer janela de sorteios é uma única subtração de duas linhas.
+
+def _construir_acumuladas(mascaras):
+    acumuladas = np.zeros((len(mascaras) + 1, 25), dtype=np.int32)
+    np.cumsum(matriz_onehot(mascaras), axis=0, dtype=np.int32, out=acumuladas[1:])
+    return acumuladas
+
+def _estender_acumuladas(acumuladas, mascaras_novas):
+    novas = acumuladas[-1] + np.cumsum(matriz_onehot(mascaras_novas), axis=0, dtype=np.int32)
+    return np.concatenate([acumuladas, novas])
+
+def frequencias_acumuladas(df):
+    """Array (n_sorteios + 1) x 25 de contagens acumuladas, uma vez por versão dos dados."""
+    return obter_derivado(df, 'acumuladas', _construir_acumuladas, _estender_acumuladas)
+
+def indices_por_data(df, data_inicial=None, data_final=None):
+    """
+    Converte um intervalo de datas (inclusivo) em posições [inicio, fim) de df,
+    via busca binária na coluna 'data' (df ordenado por rodada/data).
+    """
+    datas = df['data'].to_numpy(dtype='datetime64[ns]')
+    inicio = 0 if data_inicial is None else int(np.searchsorted(datas, np.datetime64(pd.Timestamp(data_inicial)), side='left'))
+    fim = len(datas) if data_final is None else int(np.searchsorted(datas, np.datetime64(pd.Timestamp(data_final)), side='right'))
+    return inicio, max(inicio, fim)
+
+def frequencias_janela(df, inicio=0, fim=None):
+    """
+    Contagem de cada dezena (índice 0 = dezena 1) nos sorteios inicio:fim de df.
+    Aceita índices negativos (ex: inicio=-10 = últimos 10 sorteios).
+    """
+    acumuladas = frequencias_acumuladas(df)
+    inicio, fim, _ = slice(inicio, fim).indices(len(df))
+    return acumuladas[max(fim, inicio)] - acumuladas[inicio]
+
+def frequencias_por_data(df, data_inicial=None, data_final=None):
+    """Frequências de cada dezena entre duas datas (inclusivo) e o total de sorteios no intervalo."""
+    inicio, fim = indices_por_data(df, data_inicial, data_final)
+    return frequencias_janela(df, inicio, fim), fim - inicio
 
 def contar_frequencias(df, idx, n):
     start = max(0, idx - n)
@@ -19,20 +357,15 @@ def contar_frequencias(df, idx, n):
     return freq
 
 def preencher_frequencias(df, n_dias):
-    # Otimização: Criar matriz binária uma única vez
-    X = np.zeros((len(df), 25))
-    for i, nums in enumerate(df['numeros']):
-        for n in nums:
-            if 1 <= n <= 25:
-                X[i, n-1] = 1
-    
-    # Usar soma móvel (rolling sum) para calcular frequencias em massa
-    df_bins = pd.DataFrame(X, columns=[f'freq_{i}' for i in range(1, 26)])
-    df_rolling = df_bins.rolling(window=n_dias, min_periods=1).sum().shift(1).fillna(0)
+    # Soma móvel dos n_dias sorteios ANTERIORES (shift de 1) por diferença de linhas acumuladas
+    acumuladas = frequencias_acumuladas(df)
+    fins = np.arange(len(df))
+    inicios = np.maximum(fins - n_dias, 0)
+    janelas = (acumuladas[fins] - acumuladas[inicios]).astype(np.float64)
     
     # Adicionar de volta ao dataframe
-    for col in df_rolling.columns:
-        df[col] = df_rolling[col]
+    for i in range(25):
+        df[f'freq_{i + 1}'] = janelas[:, i]
     return df
 
 def extrair_features(df, n_dias):
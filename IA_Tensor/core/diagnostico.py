@@ -0,0 +1,95 @@
+"""
+Diagnóstico de inicialização: quanto custa importar cada módulo do app e quais
+pilhas pesadas (Keras/TensorFlow, sklearn, yfinance, requests) já foram carregadas.
+A medição roda num processo Python limpo (python -X importtime), sem afetar o app.
+"""
+import os
+import subprocess
+import sys
+import pandas as pd
+import streamlit as st
+
+DIRETORIO_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos importados pelo app.py antes da primeira renderização
+MODULOS_APP = [
+    'analysis.analise_padroes', 'ui.desdobramento', 'analysis.backtest', 'analysis.analise_temporal',
+    'ui.montador', 'analysis.analise_conexoes', 'analysis.analise_tendencias', 'analysis.smart_clustering',
+    'ui.manual', 'data.caos_exogeno', 'ui.teorias_ludicas', 'ui.tab_previsao', 'ai.evolutiva',
+    'core.data_loader', 'core.diagnostico'
+]
+
+# Pilhas que só devem carregar quando o caminho de código que as usa roda
+PILHAS_PESADAS = {
+    'TensorFlow/Keras': ('tensorflow', 'keras'),
+    'scikit-learn': ('sklearn',),
+    'yfinance': ('yfinance',),
+    'requests': ('requests',),
+    'joblib': ('joblib',),
+}
+
+def _ler_importtime(saida):
+    """Linhas 'import time: self | cumulative | pacote' -> registros (modulo, nível, µs)."""
+    registros = []
+    for linha in saida.splitlines():
+        if not linha.startswith("import time:") or "[us]" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        nivel = (len(nome) - len(nome.lstrip()) - 1) // 2
+        registros.append({'modulo': nome.strip(), 'nivel': nivel,
+                          'proprio_ms': int(proprio) / 1000, 'acumulado_ms': int(acumulado) / 1000})
+    return registros
+
+def medir_importacoes(modulos=None, executavel=sys.executable, timeout=120):
+    """
+    Importa 'modulos' (padrão: os do app.py) num processo novo com -X importtime.
+    Retorna DataFrame (modulo, nivel, proprio_ms, acumulado_ms, pacote) na ordem de
+    importação; nivel 0 = importado diretamente pelo módulo medido.
+    """
+    modulos = modulos or MODULOS_APP
+    codigo = "\n".join(f"import {m}" for m in modulos)
+    processo = subprocess.run(
+        [executavel, "-X", "importtime", "-c", codigo],
+        cwd=DIRETORIO_APP, capture_output=True, text=True, timeout=timeout
+    )
+    df = pd.DataFrame(_ler_importtime(processo.stderr), columns=['modulo', 'nivel', 'proprio_ms', 'acumulado_ms'])
+    df['pacote'] = df['modulo'].str.split('.').str[0]
+    return df
+
+def resumo_por_pacote(df_importacoes):
+    """Tempo próprio somado por pacote raiz (numpy, streamlit, sklearn...), do maior ao menor."""
+    return (df_importacoes.groupby('pacote', as_index=False)['proprio_ms'].sum()
+            .sort_values('proprio_ms', ascending=False).reset_index(drop=True))
+
+def pilhas_carregadas(modulos=None):
+    """Quais pilhas pesadas já estão em sys.modules (ou no conjunto 'modulos' informado)."""
+    modulos = sys.modules if modulos is None else modulos
+    return {nome: any(raiz in modulos for raiz in raizes) for nome, raizes in PILHAS_PESADAS.items()}
+
+def renderizar_diagnostico(tempo_ate_manual=None):
+    with st.expander("🩺 Diagnóstico de Inicialização", expanded=False):
+        if tempo_ate_manual is not None:
+            st.metric("Script até o Manual (imports + dados)", f"{tempo_ate_manual * 1000:.0f} ms")
+
+        carregadas = pilhas_carregadas()
+        st.caption("Pilhas pesadas já carregadas nesta sessão: " + " | ".join(
+            f"{'🔴' if carregada else '🟢'} {nome}" for nome, carregada in carregadas.items()
+        ))
+
+        if st.button("⏱️ Medir tempos de importação"):
+            with st.spinner("Importando os módulos do app num processo limpo..."):
+                df_imp = medir_importacoes()
+            if df_imp.empty:
+                st.warning("Não foi possível medir (o processo de medição falhou).")
+                return
+            diretos = df_imp[df_imp['modulo'].isin(MODULOS_APP)]
+            st.markdown("**Por módulo do app (acumulado)**")
+            st.dataframe(diretos[['modulo', 'acumulado_ms']].sort_values('acumulado_ms', ascending=False),
+                         hide_index=True, use_container_width=True)
+            st.markdown("**Por pacote (tempo próprio)**")
+            st.dataframe(resumo_por_pacote(df_imp).head(15), hide_index=True, use_container_width=True)
+            pesadas = pilhas_carregadas(set(df_imp['modulo']))
+            if any(pesadas.values()):
+                st.warning("Importadas na inicialização: " + ", ".join(n for n, c in pesadas.items() if c))
+            else:
+                st.success("Nenhuma pilha pesada é importada na inicialização.")
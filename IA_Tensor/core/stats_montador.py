@@ -1,30 +1,17 @@
 import pandas as pd
 import numpy as np
+from core.utils import atrasos_atuais, estado_ciclo_atual
 
 def calcular_estado_ciclo(df):
     """
     Retorna quais dezenas faltam para fechar o ciclo atual e qual é o sorteio atual do ciclo.
     Um ciclo se inicia no sorteio X e se encerra quando as 25 dezenas foram sorteadas pelo menos uma vez.
     """
-    dezenas_sorteadas = set()
-    sorteio_ciclo = 0
-    df_sorted = df.sort_values(by='rodada', ascending=True)
-    
-    # Processar rodadas a partir da última até achar o ciclo atual
-    # Para ser eficiente, contaremos de trás pra frente
-    # Mas é mais seguro iterar de toda a vida e achar ciclos:
-    for _, row in df_sorted.iterrows():
-        nums = set(row['numeros'])
-        dezenas_sorteadas.update(nums)
-        sorteio_ciclo += 1
-        
-        if len(dezenas_sorteadas) == 25:
-            # Ciclo fechou, zera para o próximo
-            dezenas_sorteadas = set()
-            sorteio_ciclo = 0
-            
-    todas_dezenas = set(range(1, 26))
-    dezenas_faltantes = list(todas_dezenas - dezenas_sorteadas)
+    # Estado lido do índice de ciclos (construído uma vez por versão dos dados)
+    estado = estado_ciclo_atual(df.sort_values(by='rodada', ascending=True))
+    sorteio_ciclo = estado['sorteios']
+    dezenas_sorteadas = estado['sairam']
+    dezenas_faltantes = estado['faltantes']
     
     return {
         'sorteio_atual_do_ciclo': sorteio_ciclo,
@@ -42,17 +29,16 @@ def calcular_forca_dezenas(df):
     ultimos_10 = df_rec.head(10)['numeros'].tolist()
     ultimos_20 = df_rec.head(20)['numeros'].tolist()
     
+    # Atrasos lidos da matriz pré-calculada (-1 = nunca saiu: conta o histórico inteiro)
+    atrasos = atrasos_atuais(df.sort_values(by='rodada', ascending=True))
+    
     # Calcular frequência nos últimos 10 (max 10) -> peso até 40
     for i in range(1, 26):
         freq_10 = sum(1 for jogo in ultimos_10 if i in jogo)
         freq_20 = sum(1 for jogo in ultimos_20 if i in jogo)
         
         # Calcular atraso
-        atraso = 0
-        for jogo in df_rec['numeros'].tolist():
-            if i in jogo:
-                break
-            atraso += 1
+        atraso = int(atrasos[i-1]) if atrasos[i-1] >= 0 else len(df_rec)
             
         # Fórmula customizada (exemplo heurístico)
         # Freq 10 jogos ideal: ~6 (60%) -> 40 pts
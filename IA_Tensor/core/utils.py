@@ -1,4 +1,10 @@
+import numpy as np
 from core.constants import PRIMOS, MOLDURA, FIBONACCI
+from core.coocorrencia import matriz_pares, tensor_trios
+from core.data_loader import (
+    numeros_para_mascara, mascara_para_numeros, obter_mascaras, matriz_onehot, contem_dezenas, popcount,
+    mascaras_de_onehot, mascaras_de_numeros, obter_derivado
+)
 
 def calcular_metricas_dna(numeros):
     """
@@ -21,6 +27,20 @@ def calcular_metricas_dna(numeros):
         'soma': soma
     }
 
+def _faixa_soma_ideal(dia_semana=None):
+    """Faixa de soma ideal (min, max) sintonizada pelo dia da semana (0=Seg, 4=Sex, 5=Sab)."""
+    # === SINTONIZAÇÃO TEMPORAL (DIA DA SEMANA) ===
+    if dia_semana is None:
+        import datetime
+        dia_semana = datetime.datetime.now().weekday()
+
+    # Ajustes Históricos Comprovados
+    if dia_semana == 4: # Sexta-Feira puxa a soma para o alto
+        return 195, 210
+    if dia_semana == 5: # Sábado empurra a soma para baixo
+        return 180, 195
+    return 190, 205
+
 def avaliar_qualidade_jogo(seq, ultima_rodada=None):
     """
     Gera um score de 0 a 10 + baseado na proximidade das métricas ideais.
@@ -40,20 +60,7 @@ def avaliar_qualidade_jogo(seq, ultima_rodada=None):
     if m['fibo'] == 4: score += 2
     elif 3 <= m['fibo'] <= 5: score += 1
     
-    # === SINTONIZAÇÃO TEMPORAL (DIA DA SEMANA) ===
-    import datetime
-    dia_semana_atual = datetime.datetime.now().weekday() # 0=Seg, 4=Sex, 5=Sab
-    soma_ideal_min = 190
-    soma_ideal_max = 205
-    
-    # Ajustes Históricos Comprovados
-    if dia_semana_atual == 4: # Sexta-Feira puxa a soma para o alto
-        soma_ideal_min = 195
-        soma_ideal_max = 210
-    elif dia_semana_atual == 5: # Sábado empurra a soma para baixo
-        soma_ideal_min = 180
-        soma_ideal_max = 195
-        
+    soma_ideal_min, soma_ideal_max = _faixa_soma_ideal()
     if soma_ideal_min <= m['soma'] <= soma_ideal_max: score += 2
     elif (soma_ideal_min - 10) <= m['soma'] <= (soma_ideal_max + 10): score += 1
     
@@ -68,6 +75,114 @@ def avaliar_qualidade_jogo(seq, ultima_rodada=None):
     
     return score, m
 
+# --- Métricas de DNA em Lote ---
+# Todas as contagens saem de um único produto (bilhetes x 25) @ (25 x métricas) com
+# vetores de peso fixos; o score vem de tabelas de consulta indexadas pela contagem.
+
+_DEZENAS = np.arange(1, 26)
+_COLUNAS_DNA = ('impares', 'primos', 'moldura', 'fibo', 'soma')
+_PESOS_DNA = np.column_stack([
+    _DEZENAS % 2,
+    np.isin(_DEZENAS, list(PRIMOS)),
+    np.isin(_DEZENAS, list(MOLDURA)),
+    np.isin(_DEZENAS, list(FIBONACCI)),
+    _DEZENAS,
+    # Uma coluna por linha do volante (5 x 5) para contar as linhas vazias
+    *[(_DEZENAS - 1) // 5 == linha for linha in range(5)]
+]).astype(np.float32)
+
+def _tabela_pontos(tamanho, ideal, aceitavel, pontos_ideal=2, pontos_aceitavel=1):
+    """Tabela (contagem -> pontos) para as faixas ideal e aceitável (intervalos fechados)."""
+    tabela = np.zeros(tamanho, dtype=np.int16)
+    tabela[aceitavel[0]:aceitavel[1] + 1] = pontos_aceitavel
+    tabela[ideal[0]:ideal[1] + 1] = pontos_ideal
+    return tabela
+
+# Mesmas faixas de avaliar_qualidade_jogo
+_TABELAS_DNA = {
+    'impares': _tabela_pontos(26, (7, 9), (6, 10)),
+    'primos': _tabela_pontos(26, (4, 6), (3, 7)),
+    'moldura': _tabela_pontos(26, (9, 11), (8, 12)),
+    'fibo': _tabela_pontos(26, (4, 4), (3, 5)),
+    'repetentes': _tabela_pontos(26, (8, 10), (7, 11), pontos_ideal=3),
+}
+
+def _tabela_soma(dia_semana=None):
+    soma_min, soma_max = _faixa_soma_ideal(dia_semana)
+    return _tabela_pontos(326, (soma_min, soma_max), (soma_min - 10, soma_max + 10))
+
+def _maior_sequencia(mascaras):
+    """Maior sequência de dezenas consecutivas de cada máscara (x &= x >> 1 até zerar)."""
+    mascaras = np.array(mascaras, dtype=np.uint32)
+    maior = np.zeros(len(mascaras), dtype=np.int16)
+    while True:
+        ativas = mascaras != 0
+        if not ativas.any():
+            return maior
+        maior += ativas
+        mascaras &= mascaras >> 1
+
+def calcular_metricas_dna_lote(jogos, ultima_rodada=None, tamanho_bloco=1 << 16):
+    """
+    Métricas de DNA de vários bilhetes de uma vez. Aceita a matriz one-hot (N x 25),
+    um array de máscaras ou uma lista de jogos (ver matriz_jogos).
+    Retorna um dicionário de arrays (N,): impares, primos, moldura, fibo, soma,
+    max_consecutivas, linhas_vazias e, se ultima_rodada for informada, repetentes.
+    """
+    onehot = matriz_jogos(jogos)
+    n = onehot.shape[0]
+    contagens = np.empty((n, _PESOS_DNA.shape[1]), dtype=np.float32)
+    for inicio in range(0, n, tamanho_bloco):
+        contagens[inicio:inicio + tamanho_bloco] = onehot[inicio:inicio + tamanho_bloco].astype(np.float32) @ _PESOS_DNA
+    contagens = contagens.astype(np.int16)
+
+    metricas = {nome: contagens[:, j] for j, nome in enumerate(_COLUNAS_DNA)}
+    metricas['linhas_vazias'] = np.count_nonzero(contagens[:, len(_COLUNAS_DNA):] == 0, axis=1).astype(np.int16)
+    mascaras = mascaras_de_onehot(onehot)
+    metricas['max_consecutivas'] = _maior_sequencia(mascaras)
+    if ultima_rodada is not None:
+        ultima = np.uint32(numeros_para_mascara(ultima_rodada))
+        metricas['repetentes'] = popcount(mascaras & ultima).astype(np.int16)
+    return metricas
+
+def avaliar_qualidade_lote(jogos, ultima_rodada=None, dia_semana=None):
+    """
+    Versão vetorizada de avaliar_qualidade_jogo: retorna (scores, metricas), com
+    scores int16 (N,) e metricas no formato de calcular_metricas_dna_lote.
+    """
+    metricas = calcular_metricas_dna_lote(jogos, ultima_rodada)
+    scores = _tabela_soma(dia_semana)[metricas['soma']]
+    for nome, tabela in _TABELAS_DNA.items():
+        if nome in metricas:
+            scores = scores + tabela[metricas[nome]]
+    return scores, metricas
+
+def _construir_indice_ineditismo(mascaras):
+    return {
+        'conjunto': frozenset(mascaras.tolist()),
+        'ordenadas': np.unique(mascaras)
+    }
+
+def indice_ineditismo(df):
+    """
+    Índice hash de todos os resultados de 15 números já sorteados (frozenset de máscaras),
+    construído uma única vez por versão dos dados.
+    """
+    return obter_derivado(df, 'ineditismo', _construir_indice_ineditismo)
+
+def jogos_ja_sorteados(df, jogos):
+    """
+    Versão em lote do ineditismo: recebe um array de máscaras (N,) ou uma matriz
+    one-hot (N x 25) e devolve um array booleano (True = jogo idêntico a um sorteio).
+    """
+    jogos = np.asarray(jogos)
+    jogos = mascaras_de_onehot(jogos) if jogos.ndim == 2 else jogos.astype(np.uint32)
+    ordenadas = indice_ineditismo(df)['ordenadas']
+    if ordenadas.size == 0:
+        return np.zeros(jogos.shape, dtype=bool)
+    pos = np.minimum(np.searchsorted(ordenadas, jogos), ordenadas.size - 1)
+    return ordenadas[pos] == jogos
+
 def verificar_ineditismo(df, selecionados):
     """
     Ineditismo: verifica se este JOGO EXATO (15 números) já saiu em algum momento na história.
@@ -77,15 +192,209 @@ def verificar_ineditismo(df, selecionados):
     if len(selecionados) < 15:
         return None
         
-    set_sel = set(selecionados)
-    for _, row in df.iterrows():
-        set_jogo = set(row['numeros'])
-        # Se for 15 números exatos
-        if len(set_sel.intersection(set_jogo)) == 15 and len(selecionados) == 15:
-            return f"🚨 ALERTA VERMELHO: Você está montando o exato resultado do Concurso {row['rodada']}! Em toda a história da Lotofácil (mais de 3.000 sorteios), um jogo de 15 pontos NUNCA se repetiu. A chance de repetição é de apenas 0,11%. Sugerimos fortemente trocar pelo menos 1 dezena."
+    # Só um jogo de exatamente 15 números pode coincidir com um sorteio
+    if len(selecionados) == 15:
+        mascara = numeros_para_mascara(selecionados)
+        if mascara in indice_ineditismo(df)['conjunto']:
+            iguais = np.flatnonzero(obter_mascaras(df) == np.uint32(mascara))
+            rodada = df['rodada'].iloc[iguais[0]]
+            return f"🚨 ALERTA VERMELHO: Você está montando o exato resultado do Concurso {rodada}! Em toda a história da Lotofácil (mais de 3.000 sorteios), um jogo de 15 pontos NUNCA se repetiu. A chance de repetição é de apenas 0,11%. Sugerimos fortemente trocar pelo menos 1 dezena."
     
     return "✅ Jogo Inédito! Ótimo. A chance do próximo sorteio ser uma combinação absoluta nunca antes vista é de 99,8%. Você está no caminho certo escolhendo uma sequência matematicamente inédita."
 
+# --- Matriz de Atrasos ---
+# atrasos[i, j] = quantos sorteios se passaram, até o sorteio i (inclusive), desde a
+# última vez que a dezena j+1 saiu (0 = saiu no próprio sorteio i, -1 = ainda não saiu).
+
+def _ultimas_aparicoes(onehot, deslocamento=0, ultimas_anteriores=None):
+    indices = np.arange(deslocamento, deslocamento + onehot.shape[0], dtype=np.int64)[:, None]
+    ultimas = np.where(onehot != 0, indices, -1)
+    if ultimas_anteriores is not None and ultimas.shape[0]:
+        ultimas[0] = np.maximum(ultimas[0], ultimas_anteriores)
+    ultimas = np.maximum.accumulate(ultimas, axis=0) if ultimas.shape[0] else ultimas
+    atrasos = np.where(ultimas >= 0, indices - ultimas, -1)
+    return atrasos.astype(np.int32), ultimas
+
+def _construir_atrasos(mascaras):
+    atrasos, ultimas = _ultimas_aparicoes(matriz_onehot(mascaras))
+    return {'atrasos': atrasos, 'ultimas': ultimas[-1] if len(ultimas) else np.full(25, -1, dtype=np.int64)}
+
+def _estender_atrasos(indice, mascaras_novas):
+    n = indice['atrasos'].shape[0]
+    novos, ultimas = _ultimas_aparicoes(matriz_onehot(mascaras_novas), n, indice['ultimas'])
+    return {'atrasos': np.concatenate([indice['atrasos'], novos]), 'ultimas': ultimas[-1]}
+
+def matriz_atrasos(df):
+    """
+    Matriz (sorteios x 25) de atrasos, calculada uma vez por versão dos dados
+    e estendida incrementalmente quando chegam sorteios novos.
+    """
+    return obter_derivado(df, 'atrasos', _construir_atrasos, _estender_atrasos)['atrasos']
+
+def atrasos_atuais(df):
+    """Atraso de cada dezena (índice 0 = dezena 1) após o último sorteio de df."""
+    atrasos = matriz_atrasos(df)
+    if atrasos.shape[0] == 0:
+        return np.full(25, -1, dtype=np.int32)
+    return atrasos[-1]
+
+# --- Índice de Ciclos das Dezenas ---
+# Um ciclo começa num sorteio e fecha quando as 25 dezenas já saíram ao menos uma vez.
+# O fechamento é achado com OR acumulado (bitwise_or.accumulate) sobre as máscaras,
+# em janelas curtas, em vez de percorrer o histórico com sets linha a linha.
+
+_TODAS_DEZENAS = np.uint32((1 << 25) - 1)
+_JANELA_CICLO = 16
+
+def _varrer_ciclos(mascaras, base=0, aberto=None):
+    """
+    Fecha ciclos a partir do sorteio 'base' (posição absoluta de mascaras[0]),
+    continuando o ciclo 'aberto' se houver. Retorna (ciclos fechados, ciclo aberto).
+    """
+    if aberto is None:
+        aberto = {'inicio': base, 'mascara': 0, 'deslocamentos': np.full(25, -1, dtype=np.int16)}
+    inicio, acumulada, deslocamentos = aberto['inicio'], aberto['mascara'], aberto['deslocamentos'].copy()
+    inicios, fins, todos_deslocamentos = [], [], []
+
+    pos = 0
+    while pos < len(mascaras):
+        acumulado = np.bitwise_or.accumulate(mascaras[pos:pos + _JANELA_CICLO]) | np.uint32(acumulada)
+        fechou = np.flatnonzero(acumulado == _TODAS_DEZENAS)
+        fim_local = int(fechou[0]) if fechou.size else len(acumulado) - 1
+        acumulado = acumulado[:fim_local + 1]
+
+        # Primeira aparição no ciclo das dezenas que ainda não tinham saído
+        vistos = matriz_onehot(acumulado) != 0
+        novas = vistos[-1] & (deslocamentos < 0)
+        deslocamentos[novas] = base + pos + np.argmax(vistos, axis=0)[novas] - inicio
+
+        if fechou.size:
+            inicios.append(inicio)
+            fins.append(base + pos + fim_local)
+            todos_deslocamentos.append(deslocamentos)
+            inicio, acumulada = base + pos + fim_local + 1, 0
+            deslocamentos = np.full(25, -1, dtype=np.int16)
+        else:
+            acumulada = int(acumulado[-1])
+        pos += fim_local + 1
+
+    fechados = {
+        'inicio': np.array(inicios, dtype=np.int64),
+        'fim': np.array(fins, dtype=np.int64),
+        'deslocamentos': np.array(todos_deslocamentos, dtype=np.int16).reshape(-1, 25)
+    }
+    return fechados, {'inicio': inicio, 'mascara': acumulada, 'deslocamentos': deslocamentos}
+
+def _montar_indice_ciclos(fechados, aberto, n_sorteios):
+    return {
+        'inicio': fechados['inicio'],
+        'fim': fechados['fim'],
+        'tamanho': fechados['fim'] - fechados['inicio'] + 1,
+        'deslocamentos': fechados['deslocamentos'],
+        'aberto': aberto,
+        'n_sorteios': n_sorteios
+    }
+
+def _construir_indice_ciclos(mascaras):
+    fechados, aberto = _varrer_ciclos(mascaras)
+    return _montar_indice_ciclos(fechados, aberto, len(mascaras))
+
+def _estender_indice_ciclos(indice, mascaras_novas):
+    fechados, aberto = _varrer_ciclos(mascaras_novas, indice['n_sorteios'], indice['aberto'])
+    for chave in ('inicio', 'fim', 'deslocamentos'):
+        fechados[chave] = np.concatenate([indice[chave], fechados[chave]])
+    return _montar_indice_ciclos(fechados, aberto, indice['n_sorteios'] + len(mascaras_novas))
+
+def indice_ciclos(df):
+    """
+    Índice de todos os ciclos do histórico (posições relativas às linhas de df,
+    que deve estar ordenado por rodada):
+      - 'inicio', 'fim', 'tamanho': arrays com um elemento por ciclo fechado
+      - 'deslocamentos': (ciclos x 25) sorteio do ciclo em que cada dezena saiu pela 1ª vez
+      - 'aberto': ciclo em andamento ('inicio', 'mascara' das dezenas já sorteadas, 'deslocamentos')
+    Construído uma vez por versão dos dados e estendido quando chegam sorteios novos.
+    """
+    return obter_derivado(df, 'ciclos', _construir_indice_ciclos, _estender_indice_ciclos)
+
+def estado_ciclo_atual(df):
+    """Resumo do ciclo em andamento: sorteios decorridos, dezenas já sorteadas e faltantes."""
+    indice = indice_ciclos(df)
+    sairam = mascara_para_numeros(indice['aberto']['mascara'])
+    return {
+        'sorteios': indice['n_sorteios'] - indice['aberto']['inicio'],
+        'sairam': sairam,
+        'faltantes': [n for n in range(1, 26) if n not in sairam]
+    }
+
+# --- Backtest em Lote (Máquina do Tempo) ---
+# Os acertos de todos os bilhetes contra todos os sorteios saem de um único produto
+# matricial (bilhetes x 25) @ (25 x sorteios), feito em blocos para limitar a memória.
+
+FAIXAS_PREMIO = (11, 12, 13, 14, 15)
+PREMIOS_APROXIMADOS = {11: 6.0, 12: 12.0, 13: 30.0, 14: 1500.0, 15: 1000000.0}
+
+def matriz_jogos(jogos):
+    """
+    Converte bilhetes em matriz one-hot uint8 (N x 25). Aceita uma lista de jogos
+    (listas de dezenas), um array de máscaras (N,) ou uma matriz 0/1 (N x 25).
+    """
+    if isinstance(jogos, np.ndarray):
+        if jogos.ndim == 2 and jogos.shape[1] == 25:
+            return np.ascontiguousarray(jogos, dtype=np.uint8)
+        if jogos.ndim == 1:
+            return matriz_onehot(jogos)
+    return matriz_onehot(mascaras_de_numeros(jogos))
+
+def _historico_transposto(df):
+    """Histórico em float32 já transposto (25 x sorteios), pronto para o produto matricial."""
+    return obter_derivado(df, 'onehot_t_float32', lambda m: np.ascontiguousarray(matriz_onehot(m).T, dtype=np.float32))
+
+def _blocos_de_jogos(jogos, df, elementos_por_bloco):
+    """Gera (inicio, acertos) com a matriz de acertos (bloco x sorteios) de cada fatia de bilhetes."""
+    matriz = matriz_jogos(jogos).astype(np.float32)
+    historico_t = _historico_transposto(df)
+    tamanho_bloco = max(1, elementos_por_bloco // max(1, historico_t.shape[1]))
+    for inicio in range(0, matriz.shape[0], tamanho_bloco):
+        yield inicio, matriz[inicio:inicio + tamanho_bloco] @ historico_t
+
+def matriz_acertos(jogos, df):
+    """Acertos de cada bilhete (linhas) em cada sorteio de df (colunas), como uint8."""
+    partes = [acertos.astype(np.uint8) for _, acertos in _blocos_de_jogos(jogos, df, 1 << 22)]
+    if not partes:
+        return np.zeros((0, len(df)), dtype=np.uint8)
+    return np.concatenate(partes)
+
+def calcular_backtest_lote(jogos, df, premios=None, custo_aposta=3.0, elementos_por_bloco=1 << 22):
+    """
+    Backtest vetorizado de vários bilhetes contra todos os sorteios de df.
+    Retorna um dicionário com:
+      - 'histograma': matriz (bilhetes x 5) com as vezes que cada bilhete fez 11..15 pontos
+      - 'ganho': prêmio bruto acumulado por bilhete
+      - 'custo': custo de jogar um bilhete em todos os sorteios
+      - 'roi': ROI (%) por bilhete
+    """
+    premios = PREMIOS_APROXIMADOS if premios is None else premios
+    jogos = matriz_jogos(jogos)
+    n_jogos = jogos.shape[0]
+    histograma = np.zeros((n_jogos, len(FAIXAS_PREMIO)), dtype=np.int64)
+
+    for inicio, acertos in _blocos_de_jogos(jogos, df, elementos_por_bloco):
+        fim = inicio + acertos.shape[0]
+        for j, faixa in enumerate(FAIXAS_PREMIO):
+            histograma[inicio:fim, j] = np.count_nonzero(acertos == faixa, axis=1)
+
+    valores = np.array([premios.get(f, 0.0) for f in FAIXAS_PREMIO], dtype=np.float64)
+    ganho = histograma @ valores
+    custo = len(df) * custo_aposta
+    roi = ((ganho - custo) / custo) * 100 if custo > 0 else np.zeros(n_jogos)
+
+    return {
+        'histograma': histograma,
+        'ganho': ganho,
+        'custo': custo,
+        'roi': roi
+    }
+
 def calcular_backtest_rapido(df, selecionados):
     """
     Faz um backtest instantâneo ignorando peso financeiro complexo (usado como termômetro).
@@ -93,36 +402,10 @@ def calcular_backtest_rapido(df, selecionados):
     if len(selecionados) != 15:
         return None
         
-    acertos_15 = 0
-    acertos_14 = 0
-    acertos_13 = 0
-    acertos_12 = 0
-    acertos_11 = 0
-    
-    set_sel = set(selecionados)
-    
-    for jogo in df['numeros'].tolist():
-        matches = len(set_sel.intersection(set(jogo)))
-        if matches == 15: acertos_15 += 1
-        elif matches == 14: acertos_14 += 1
-        elif matches == 13: acertos_13 += 1
-        elif matches == 12: acertos_12 += 1
-        elif matches == 11: acertos_11 += 1
-        
-    total_jogos = len(df)
-    custo_total = total_jogos * 3.0  # Assumindo R$ 3,00 a aposta
-    ganho_aprox = (acertos_11 * 6) + (acertos_12 * 12) + (acertos_13 * 30) + (acertos_14 * 1500) + (acertos_15 * 1000000)
-    
-    roi = ((ganho_aprox - custo_total) / custo_total) * 100 if custo_total > 0 else 0
-    
-    return {
-        '15': acertos_15,
-        '14': acertos_14,
-        '13': acertos_13,
-        '12': acertos_12,
-        '11': acertos_11,
-        'roi': roi
-    }
+    bt = calcular_backtest_lote([selecionados], df)
+    resultado = {str(faixa): int(bt['histograma'][0, j]) for j, faixa in enumerate(FAIXAS_PREMIO)}
+    resultado['roi'] = float(bt['roi'][0])
+    return resultado
 
 def calcular_afinidades(df, selecionados):
     """
@@ -132,16 +415,22 @@ def calcular_afinidades(df, selecionados):
         return []
         
     set_sel = set(selecionados)
-    ocorrencias_conjuntas = {i: 0 for i in range(1, 26) if i not in set_sel}
-    total_filtro = 0
-    
-    for jogo in df['numeros'].tolist():
-        set_jogo = set(jogo)
-        if set_sel.issubset(set_jogo):
-            total_filtro += 1
-            for n in set_jogo:
-                if n not in set_sel:
-                     ocorrencias_conjuntas[n] += 1
+    if len(set_sel) <= 2:
+        # 1 ou 2 dezenas: contagens prontas no armazém de co-ocorrências (pares / trios)
+        sel = sorted(set_sel)
+        if len(sel) == 1:
+            contagens = matriz_pares(df)[sel[0] - 1]
+            total_filtro = int(contagens[sel[0] - 1])
+        else:
+            contagens = tensor_trios(df)[sel[0] - 1, sel[1] - 1]
+            total_filtro = int(matriz_pares(df)[sel[0] - 1, sel[1] - 1])
+    else:
+        # Sorteios que contêm todas as selecionadas, somados coluna a coluna
+        mascaras = obter_mascaras(df)
+        filtro = contem_dezenas(numeros_para_mascara(selecionados), mascaras)
+        total_filtro = int(np.count_nonzero(filtro))
+        contagens = matriz_onehot(mascaras[filtro]).sum(axis=0)
+    ocorrencias_conjuntas = {i: int(contagens[i-1]) for i in range(1, 26) if i not in set_sel}
                      
     if total_filtro == 0:
         return []
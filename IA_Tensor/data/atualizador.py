@@ -1,81 +1,189 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import threading
 import streamlit as st
 import time
+from core.data_loader import anexar_sorteios, compactar_historico, ler_diario, ultima_rodada_salva, LIMITE_DIARIO
+
+# Mirror pública e gratuita da API da Caixa (loteriascaixa-api.herokuapp.com)
+URL_API = "https://loteriascaixa-api.herokuapp.com/api/lotofacil"
+MAX_CONEXOES = 8
+TAMANHO_JANELA = 64
+
+# --- Busca Concorrente de Concursos ---
+# Uma Session com pool de conexões reaproveitadas, um número limitado de requisições
+# em paralelo e um limitador adaptativo que recua em 429/5xx e volta a acelerar
+# conforme as respostas voltam a dar certo.
+
+class ErroAPI(Exception):
+    """A API respondeu com erro persistente (ou ficou fora do ar) durante a busca."""
+
+class _Limitador:
+    """Intervalo mínimo entre requisições, compartilhado pelas threads (backoff exponencial)."""
+
+    def __init__(self, intervalo_min=0.0, intervalo_max=8.0):
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.intervalo = intervalo_min
+        self._proxima = 0.0
+        self._trava = threading.Lock()
+
+    def aguardar(self):
+        with self._trava:
+            agora = time.monotonic()
+            espera = max(0.0, self._proxima - agora)
+            self._proxima = max(agora, self._proxima) + self.intervalo
+        if espera:
+            time.sleep(espera)
+
+    def recuar(self, retry_after=None):
+        with self._trava:
+            self.intervalo = min(self.intervalo_max, max(self.intervalo * 2, 0.02, retry_after or 0.0))
+
+    def acelerar(self):
+        with self._trava:
+            self.intervalo = max(self.intervalo_min, self.intervalo * 0.8 if self.intervalo > 0.005 else 0.0)
+
+def criar_sessao(max_conexoes=MAX_CONEXOES):
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=max_conexoes, pool_maxsize=max_conexoes)
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    return sessao
+
+def _converter_concurso(data):
+    """Resposta da API -> registro no formato do rodadas.json."""
+    # Formatar data DD/MM/YYYY -> YYYY-MM-DD
+    dt_str = data['data']
+    try:
+        dt_fmt = datetime.strptime(dt_str, "%d/%m/%Y").strftime("%Y-%m-%d")
+    except ValueError:
+        dt_fmt = dt_str # Fallback
+    return {
+        "rodada": int(data['concurso']),
+        "data": dt_fmt,
+        "numeros": sorted(int(n) for n in data['dezenas'])
+    }
+
+def _get(sessao, url, limitador, tentativas=6, timeout=5):
+    """GET com limitação de taxa: 429/5xx e erros de conexão recuam e tentam de novo."""
+    for _ in range(tentativas):
+        limitador.aguardar()
+        try:
+            r = sessao.get(url, timeout=timeout)
+        except requests.RequestException:
+            limitador.recuar()
+            continue
+        if r.status_code == 429 or r.status_code >= 500:
+            retry_after = r.headers.get('Retry-After')
+            limitador.recuar(float(retry_after) if retry_after and retry_after.isdigit() else None)
+            continue
+        limitador.acelerar()
+        return r
+    raise ErroAPI(f"Sem resposta válida de {url} após {tentativas} tentativas")
+
+def buscar_concurso(sessao, concurso, limitador, url_base=URL_API):
+    """Registro do concurso, ou None se ele ainda não existe (404 ou número diferente)."""
+    r = _get(sessao, f"{url_base}/{concurso}", limitador)
+    if r.status_code != 200:
+        return None
+    data = r.json()
+    # Validar se é o concurso certo (algumas mirrors devolvem o último no lugar)
+    if int(data.get('concurso', -1)) != concurso:
+        return None
+    return _converter_concurso(data)
+
+def ultimo_concurso_disponivel(sessao, limitador, a_partir_de, url_base=URL_API):
+    """
+    Último concurso publicado. Usa o endpoint /latest e, se ele falhar, acha o fim
+    da série com busca galopante (a_partir_de+1, +2, +4, ...) e depois binária.
+    """
+    try:
+        r = _get(sessao, f"{url_base}/latest", limitador, tentativas=2)
+        if r.status_code == 200:
+            return int(r.json()['concurso'])
+    except (ErroAPI, ValueError, KeyError):
+        pass
+
+    existe = lambda n: buscar_concurso(sessao, n, limitador, url_base) is not None
+    baixo, passo = a_partir_de, 1
+    while existe(baixo + passo):
+        baixo, passo = baixo + passo, passo * 2
+    alto = baixo + passo # baixo existe (ou é o já salvo), alto não
+    while alto - baixo > 1:
+        meio = (baixo + alto) // 2
+        if existe(meio):
+            baixo = meio
+        else:
+            alto = meio
+    return baixo
+
+def buscar_concursos(inicio, fim=None, url_base=URL_API, max_conexoes=MAX_CONEXOES,
+                     tamanho_janela=TAMANHO_JANELA, sessao=None, ao_progresso=None):
+    """
+    Baixa os concursos inicio..fim (fim=None: até o último publicado) em janelas
+    de 'tamanho_janela' números, com até 'max_conexoes' requisições em paralelo.
+    Retorna a lista ordenada e contígua a partir de 'inicio' (para no primeiro buraco).
+    """
+    sessao = sessao or criar_sessao(max_conexoes)
+    limitador = _Limitador()
+    if fim is None:
+        fim = ultimo_concurso_disponivel(sessao, limitador, inicio - 1, url_base)
+    total = max(0, fim - inicio + 1)
+
+    registros = []
+    with ThreadPoolExecutor(max_workers=max_conexoes) as pool:
+        for janela in range(inicio, fim + 1, tamanho_janela):
+            numeros = range(janela, min(janela + tamanho_janela, fim + 1))
+            try:
+                for registro in pool.map(lambda n: buscar_concurso(sessao, n, limitador, url_base), numeros):
+                    if registro is None:
+                        return registros
+                    registros.append(registro)
+            except ErroAPI:
+                # API caiu no meio: fica com o trecho contíguo já baixado
+                if not registros:
+                    raise
+                return registros
+            if ao_progresso:
+                ao_progresso(len(registros), total)
+    return registros
 
 def atualizar_dados(caminho_arquivo="rodadas.json"):
     """
     Tenta atualizar o arquivo JSON com os últimos concursos.
     Usa uma API pública gratuita (sujeita a disponibilidade).
+    Os concursos novos são anexados ao diário (rodadas.jsonl); o rodadas.json só
+    é reescrito quando o diário passa de LIMITE_DIARIO sorteios.
     """
     status_msg = st.empty()
     bar = st.progress(0)
-    
+
     try:
-        with open(caminho_arquivo, 'r') as f:
-            dados = json.load(f)
-        
-        # Achar último concurso salvo
-        ultimo_concurso = 0
-        if dados:
-            ultimo_concurso = max(d['rodada'] for d in dados)
-            
+        # Achar último concurso salvo (arquivo principal + diário)
+        ultimo_concurso = ultima_rodada_salva(caminho_arquivo)
         concurso_alvo = ultimo_concurso + 1
-        novos = 0
-        
+
         status_msg.info(f"Verificando novos concursos a partir do {concurso_alvo}...")
-        
-        while True:
-            # Tenta API oficial ou mirror pública
-            # Usando loteriascaixa-api.herokuapp.com (comum e gratuita)
-            url = f"https://loteriascaixa-api.herokuapp.com/api/lotofacil/{concurso_alvo}"
-            
-            try:
-                r = requests.get(url, timeout=5)
-                if r.status_code == 200:
-                    data = r.json()
-                    
-                    # Validar se é o concurso certo
-                    if data['concurso'] != concurso_alvo:
-                        break # Algo errado ou API retornou anterior
-                        
-                    # Formatar data DD/MM/YYYY -> YYYY-MM-DD
-                    dt_str = data['data']
-                    try:
-                        dt_obj = datetime.strptime(dt_str, "%d/%m/%Y")
-                        dt_fmt = dt_obj.strftime("%Y-%m-%d")
-                    except:
-                        dt_fmt = dt_str # Fallback
-                        
-                    numeros = sorted([int(n) for n in data['dezenas']])
-                    
-                    novo_registro = {
-                        "rodada": data['concurso'],
-                        "data": dt_fmt,
-                        "numeros": numeros
-                    }
-                    
-                    dados.append(novo_registro)
-                    concurso_alvo += 1
-                    novos += 1
-                    
-                    status_msg.info(f"Baixando concurso {data['concurso']}...")
-                    bar.progress(min(novos % 100, 100))
-                    
-                    time.sleep(0.5) # Evitar block da API
-                else:
-                    # Se der 404 ou outro erro, assumimos que chegamos ao fim
-                    break
-            except Exception as e:
-                # Erro de conexão
-                break
-                
+
+        def progresso(baixados, total):
+            status_msg.info(f"Baixando concursos... {baixados}/{total}")
+            bar.progress(min(baixados / total, 1.0) if total else 1.0)
+
+        try:
+            novos_registros = buscar_concursos(concurso_alvo, ao_progresso=progresso)
+        except ErroAPI:
+            novos_registros = [] # API fora do ar
+        novos = len(novos_registros)
+
         bar.empty()
-        
+
         if novos > 0:
-            with open(caminho_arquivo, 'w') as f:
-                json.dump(dados, f, indent=4)
+            anexar_sorteios(novos_registros, caminho_arquivo)
+            if len(ler_diario(caminho_arquivo)) >= LIMITE_DIARIO:
+                compactar_historico(caminho_arquivo)
             status_msg.success(f"Base atualizada! {novos} novos concursos adicionados.")
             time.sleep(2)
             status_msg.empty()
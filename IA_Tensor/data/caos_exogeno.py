@@ -1,4 +1,3 @@
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import altair as alt
@@ -79,6 +78,7 @@ def sincronizar_dados_financeiros(data_inicio, data_fim):
         ativos_reais = ['IBOV', 'DOLAR', 'ITUB4', 'BBDC4', 'BBAS3', 'SANB11', 'BPAC11', 'PETR4', 'VALE3', 'CXSE3', 'EWZ', 'BTC', 'VIX']
         real_tickers = [TICKERS[a] for a in ativos_reais]
         try:
+            import yfinance as yf
             dados = yf.download(real_tickers, start=fetch_inicio, end=data_fim, progress=False, ignore_tz=True)['Close']
             
             if not dados.empty:
@@ -172,9 +172,6 @@ def get_forca_pagamento(data):
     return forca
 
 
-
-from data.futebol_stats import sincronizar_futebol
-
 def correlacionar_mercado_loteria(df_loto, df_mercado):
     """
     Cruza datas dos sorteios com fechamento do mercado e calcula impacto nas dezenas.
@@ -198,6 +195,7 @@ def correlacionar_mercado_loteria(df_loto, df_mercado):
         try: progress_bar = st.progress(0, text="Sincronizando Placar de Futebol (ESPN)...")
         except: pass
         
+    from data.futebol_stats import sincronizar_futebol
     df_futebol = sincronizar_futebol(datas_yyyymmdd, barra_progresso=progress_bar)
     
     if progress_bar: progress_bar.empty()
@@ -5,9 +5,23 @@ import hashlib
 from datetime import datetime
 import pandas as pd
 import numpy as np
+from core.data_loader import obter_mascaras, numeros_para_mascara, popcount
+from core.utils import calcular_metricas_dna_lote
 
 DB_PATH = "previsoes.db"
 
+# Colunas pré-calculadas do espelho de resultados (máscara de 25 bits + DNA)
+COLUNAS_RESULTADOS = {
+    'mascara': 'INTEGER',
+    'impares': 'INTEGER',
+    'primos': 'INTEGER',
+    'moldura': 'INTEGER',
+    'fibo': 'INTEGER',
+    'repetentes': 'INTEGER',
+    'max_consecutivas': 'INTEGER',
+    'linhas_vazias': 'INTEGER'
+}
+
 def init_db():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
@@ -45,11 +59,61 @@ def init_db():
         soma INTEGER
     )
     """)
+    _migrar_resultados_oficiais(cursor)
     
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_concurso ON previsoes (concurso_alvo)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resultados_data ON resultados_oficiais (data)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resultados_soma ON resultados_oficiais (soma)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resultados_mascara ON resultados_oficiais (mascara)")
     conn.commit()
     conn.close()
 
+def _linhas_resultados(rodadas, datas, numeros, mascaras, mascara_anterior=0):
+    """Tuplas prontas para o INSERT (uma por sorteio), com o DNA calculado em lote."""
+    mascaras = np.asarray(mascaras, dtype=np.uint32)
+    dna = calcular_metricas_dna_lote(mascaras)
+    anteriores = np.concatenate(([mascara_anterior], mascaras[:-1])).astype(np.uint32)
+    repetentes = popcount(mascaras & anteriores)
+    return list(zip(
+        (int(r) for r in rodadas),
+        datas,
+        # Mesmo texto de json.dumps para listas de inteiros, sem passar pelo encoder
+        ('[' + ', '.join(map(str, nums)) + ']' for nums in numeros),
+        dna['soma'].tolist(),
+        mascaras.tolist(),
+        dna['impares'].tolist(),
+        dna['primos'].tolist(),
+        dna['moldura'].tolist(),
+        dna['fibo'].tolist(),
+        repetentes.tolist(),
+        dna['max_consecutivas'].tolist(),
+        dna['linhas_vazias'].tolist()
+    ))
+
+def _migrar_resultados_oficiais(cursor):
+    """Acrescenta as colunas de máscara/DNA a bancos antigos e preenche as linhas já espelhadas."""
+    existentes = {linha[1] for linha in cursor.execute("PRAGMA table_info(resultados_oficiais)")}
+    for coluna, tipo in COLUNAS_RESULTADOS.items():
+        if coluna not in existentes:
+            cursor.execute(f"ALTER TABLE resultados_oficiais ADD COLUMN {coluna} {tipo}")
+
+    pendentes = cursor.execute(
+        "SELECT rodada, data, numeros FROM resultados_oficiais WHERE mascara IS NULL ORDER BY rodada"
+    ).fetchall()
+    if not pendentes:
+        return
+    rodadas, datas, numeros = zip(*pendentes)
+    numeros = [json.loads(n) for n in numeros]
+    mascaras = [numeros_para_mascara(n) for n in numeros]
+    anterior = cursor.execute(
+        "SELECT mascara FROM resultados_oficiais WHERE rodada = ?", (rodadas[0] - 1,)
+    ).fetchone()
+    linhas = _linhas_resultados(rodadas, datas, numeros, mascaras, (anterior[0] or 0) if anterior else 0)
+    cursor.executemany(f"""
+    UPDATE resultados_oficiais SET {', '.join(f'{c} = ?' for c in COLUNAS_RESULTADOS)}
+    WHERE rodada = ?
+    """, [linha[4:] + (linha[0],) for linha in linhas])
+
 def sincronizar_resultados(df):
     """Espelha o rodadas.json para o SQLite (Tabela resultados_oficiais)."""
     init_db() # Garante tabela criada
@@ -66,31 +130,57 @@ def sincronizar_resultados(df):
     if ultimo_salvo is None: ultimo_salvo = 0
     
     # Filtrar apenas novos (assumindo que df tem coluna 'rodada')
-    # Se rodadas.json mudar indices, garantir que rodada é int
-    
-    # Performance: Se df é pequeno, itera. 
-    # Mas aqui vamos filtrar no Pandas primeiro.
-    novos = df[df['rodada'] > ultimo_salvo]
-    
-    if novos.empty:
+    posicoes = np.flatnonzero(df['rodada'].to_numpy() > ultimo_salvo)
+    if posicoes.size == 0:
         conn.close()
         return 0
-        
-    count = 0
-    for idx, row in novos.iterrows():
-        # Converter Numeros para JSON string
-        nums_json = json.dumps(row['numeros'])
-        # Garantir data string
-        data_str = pd.to_datetime(row['data']).strftime('%Y-%m-%d')
-        soma = int(sum(row['numeros']))
-        
-        cursor.execute("INSERT INTO resultados_oficiais (rodada, data, numeros, soma) VALUES (?, ?, ?, ?)", 
-                       (int(row['rodada']), data_str, nums_json, soma))
-        count += 1
-        
-    conn.commit()
+
+    # Máscaras e DNA de todos os novos de uma vez; o sorteio anterior entra para os repetentes
+    mascaras = obter_mascaras(df)
+    anterior = int(mascaras[posicoes[0] - 1]) if posicoes[0] > 0 else 0
+    novos = df.iloc[posicoes]
+    datas = pd.to_datetime(novos['data']).dt.strftime('%Y-%m-%d').tolist()
+    linhas = _linhas_resultados(novos['rodada'].to_numpy(), datas, novos['numeros'], mascaras[posicoes], anterior)
+
+    # Um único executemany dentro de uma transação
+    with conn:
+        conn.executemany(f"""
+        INSERT INTO resultados_oficiais (rodada, data, numeros, soma, {', '.join(COLUNAS_RESULTADOS)})
+        VALUES ({', '.join('?' * (4 + len(COLUNAS_RESULTADOS)))})
+        """, linhas)
     conn.close()
-    return count
+    return len(linhas)
+
+def consultar_resultados(dezenas=None, soma_min=None, soma_max=None):
+    """
+    Consulta direta no espelho SQLite: sorteios que contêm todas as 'dezenas'
+    e/ou com soma entre soma_min e soma_max. Retorna um DataFrame ordenado por rodada.
+    """
+    condicoes, parametros = [], []
+    if dezenas:
+        mascara = numeros_para_mascara(dezenas)
+        condicoes.append("(mascara & ?) = ?")
+        parametros += [mascara, mascara]
+    if soma_min is not None:
+        condicoes.append("soma >= ?")
+        parametros.append(int(soma_min))
+    if soma_max is not None:
+        condicoes.append("soma <= ?")
+        parametros.append(int(soma_max))
+
+    query = "SELECT * FROM resultados_oficiais"
+    if condicoes:
+        query += " WHERE " + " AND ".join(condicoes)
+    query += " ORDER BY rodada"
+
+    init_db()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        resultado = pd.read_sql_query(query, conn, params=parametros)
+    finally:
+        conn.close()
+    resultado['numeros'] = resultado['numeros'].apply(json.loads)
+    return resultado
 
 def gerar_hash_sequencia(numeros, timestamp_str):
     """Gera um hash único para a sequência baseado nos números e momento."""
@@ -0,0 +1,127 @@
+"""
+Servidor local que imita a API de resultados (/api/lotofacil/<n> e /latest) a partir
+do rodadas.json. Serve para testar e medir o atualizador sem rede:
+
+    python -m data.servidor_mock            # benchmark de backfill completo
+"""
+import json
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _formatar_concurso(registro):
+    """Registro do rodadas.json -> resposta no formato da API."""
+    return {
+        "concurso": registro['rodada'],
+        "data": datetime.strptime(registro['data'], "%Y-%m-%d").strftime("%d/%m/%Y"),
+        "dezenas": [f"{n:02d}" for n in registro['numeros']]
+    }
+
+class ServidorMock:
+    """
+    API falsa em uma porta local. taxa_429/taxa_500 simulam limitação e instabilidade;
+    latencia (s) imita o tempo de ida e volta de um servidor remoto.
+    """
+
+    def __init__(self, registros, latencia=0.0, taxa_429=0.0, taxa_500=0.0, com_latest=True, semente=0):
+        self.concursos = {r['rodada']: _formatar_concurso(r) for r in registros}
+        self.latencia = latencia
+        self.taxa_429 = taxa_429
+        self.taxa_500 = taxa_500
+        self.com_latest = com_latest
+        self.requisicoes = 0
+        self._rng = random.Random(semente)
+        self._trava = threading.Lock()
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), self._criar_handler())
+        self._servidor.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._servidor.server_address[1]}/api/lotofacil"
+
+    def _sortear_falha(self):
+        with self._trava:
+            self.requisicoes += 1
+            sorteio = self._rng.random()
+        if sorteio < self.taxa_429:
+            return 429
+        if sorteio < self.taxa_429 + self.taxa_500:
+            return 503
+        return None
+
+    def _criar_handler(self):
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, para o pool de conexões valer
+            disable_nagle_algorithm = True # cabeçalho e corpo saem em escritas separadas
+
+            def _responder(self, status, corpo=None):
+                dados = json.dumps(corpo if corpo is not None else {"erro": status}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def do_GET(self):
+                if servidor.latencia:
+                    time.sleep(servidor.latencia)
+                falha = servidor._sortear_falha()
+                if falha:
+                    return self._responder(falha)
+
+                chave = self.path.rstrip("/").rsplit("/", 1)[-1]
+                if chave == "latest" and servidor.com_latest and servidor.concursos:
+                    return self._responder(200, servidor.concursos[max(servidor.concursos)])
+                if chave.isdigit() and int(chave) in servidor.concursos:
+                    return self._responder(200, servidor.concursos[int(chave)])
+                return self._responder(404)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def iniciar(self):
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *args):
+        self.parar()
+
+def benchmark(caminho="rodadas.json", quantidade=3000, latencia=0.02, taxa_429=0.01):
+    """
+    Backfill de 'quantidade' concursos: busca concorrente vs. um por vez (estimado).
+    Retorna {'concursos', 'segundos', 'requisicoes', 'segundos_serial_estimado'}.
+    """
+    from data.atualizador import buscar_concursos
+
+    with open(caminho, 'r') as f:
+        registros = json.load(f)[:quantidade]
+
+    with ServidorMock(registros, latencia=latencia, taxa_429=taxa_429) as servidor:
+        inicio = time.perf_counter()
+        baixados = buscar_concursos(1, url_base=servidor.url)
+        tempo = time.perf_counter() - inicio
+
+    assert [r['rodada'] for r in baixados] == [r['rodada'] for r in registros]
+    serial = len(registros) * (latencia + 0.5) # antigo: 1 requisição + sleep(0.5) por concurso
+    return {'concursos': len(baixados), 'segundos': tempo, 'requisicoes': servidor.requisicoes,
+            'segundos_serial_estimado': serial}
+
+if __name__ == "__main__":
+    r = benchmark()
+    print(f"{r['concursos']} concursos em {r['segundos']:.2f}s ({r['requisicoes']} requisições, "
+          f"~{r['segundos_serial_estimado']:.0f}s no laço serial antigo)")
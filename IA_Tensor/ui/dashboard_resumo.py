@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from collections import Counter
+from core.utils import estado_ciclo_atual
 
 def renderizar_dashboard_resumo(df):
     """
@@ -37,26 +38,12 @@ def renderizar_dashboard_resumo(df):
         common = c.most_common(3)
         top_hoje = [n for n, q in common]
         
-    # B. Análise de Ciclo (Lógica Forward Robusta - Sincronizada com analise_padroes)
-    df_sorted = df.sort_values('rodada')
-    numeros_no_ciclo = set()
-    
-    # Simulação Forward
-    for _, row in df_sorted.iterrows():
-        numeros_no_ciclo.update(row['numeros'])
-        if len(numeros_no_ciclo) == 25:
-            numeros_no_ciclo.clear()
-            
-    # Estado final
-    todas_dezenas = set(range(1, 26))
-    if not numeros_no_ciclo:
-        # Se vazio, ciclo acabou de fechar no último concurso
+    # B. Análise de Ciclo (lido do índice de ciclos - mesma fonte de analise_padroes)
+    faltam_sair = estado_ciclo_atual(df.sort_values('rodada'))['faltantes']
+    # Se nada saiu ainda no ciclo, ele acabou de fechar no último concurso
+    is_novo_ciclo = len(faltam_sair) == 25
+    if is_novo_ciclo:
         faltam_sair = []
-        is_novo_ciclo = True
-    else:
-        # Ciclo aberto
-        faltam_sair = list(todas_dezenas - numeros_no_ciclo)
-        is_novo_ciclo = False
     
     # --- RENDERIZAR O PAINEL ---
     
@@ -2,7 +2,8 @@ import streamlit as st
 from itertools import combinations
 import random
 from collections import Counter
-from core.utils import verificar_ineditismo, avaliar_qualidade_jogo
+from core.utils import indice_ineditismo, jogos_ja_sorteados, avaliar_qualidade_jogo, avaliar_qualidade_lote, calcular_backtest_lote, FAIXAS_PREMIO
+from core.data_loader import numeros_para_mascara, mascaras_de_numeros
 
 def gerar_desdobramentos_inteligentes(numeros_base, num_jogos, df=None, aplicar_filtro_inedito=True, aplicar_filtro_dna=True):
     """
@@ -15,21 +16,19 @@ def gerar_desdobramentos_inteligentes(numeros_base, num_jogos, df=None, aplicar_
     if len(numeros_base) <= 16:
         comb = [sorted(list(c)) for c in combinations(numeros_base, 15)]
         random.shuffle(comb)
-        for jogo in comb:
+        
+        # Ineditismo e DNA checados em lote para todas as combinações de uma vez
+        mascaras = mascaras_de_numeros(comb)
+        validos = [True] * len(comb)
+        if aplicar_filtro_inedito and df is not None and comb:
+            validos = ~jogos_ja_sorteados(df, mascaras)
+        if aplicar_filtro_dna and comb:
+            scores, _ = avaliar_qualidade_lote(mascaras)
+            validos = validos & (scores >= 4) # Descarta jogos muito mal balanceados
+        
+        for jogo, valido in zip(comb, validos):
             if len(jogos) >= num_jogos:
                 break
-            
-            valido = True
-            if aplicar_filtro_inedito and df is not None:
-                msg = verificar_ineditismo(df, jogo)
-                if msg and "ALERTA" in msg:
-                    valido = False
-            
-            if valido and aplicar_filtro_dna:
-                score, _ = avaliar_qualidade_jogo(jogo)
-                if score < 4: # Descarta jogos muito mal balanceados
-                    valido = False
-                    
             if valido:
                 jogos.append(jogo)
         return jogos
@@ -42,6 +41,7 @@ def gerar_desdobramentos_inteligentes(numeros_base, num_jogos, df=None, aplicar_
         
     numeros_list = list(numeros_base)
     uso_numeros = Counter({n: 0 for n in numeros_list})
+    historico_sorteado = indice_ineditismo(df)['conjunto'] if df is not None else frozenset()
     
     for _ in range(num_jogos):
         tentativas = 0
@@ -53,10 +53,8 @@ def gerar_desdobramentos_inteligentes(numeros_base, num_jogos, df=None, aplicar_
             jogo = sorted(candidatos[:15])
             
             valido = True
-            if aplicar_filtro_inedito and df is not None:
-                msg = verificar_ineditismo(df, jogo)
-                if msg and "ALERTA" in msg:
-                    valido = False
+            if aplicar_filtro_inedito and numeros_para_mascara(jogo) in historico_sorteado:
+                valido = False
             
             if valido and aplicar_filtro_dna:
                 score, _ = avaliar_qualidade_jogo(jogo)
@@ -129,7 +127,20 @@ def renderizar_tab_desdobramento(df):
                 
                 if jogos_efetivos < qtd_jogos:
                     st.warning(f"Foram gerados apenas {jogos_efetivos} jogos válidos de {qtd_jogos} solicitados. Os filtros de IA impediram o gasto com jogos inúteis.")
-                
+
+                # Máquina do Tempo do pacote inteiro (todos os cartões x todos os sorteios)
+                if jogos_efetivos > 0 and df is not None:
+                    bt = calcular_backtest_lote(jogos_gerados, df, custo_aposta=custo_unitario)
+                    faixas = bt['histograma'].sum(axis=0)
+                    ganho_total = float(bt['ganho'].sum())
+                    custo_historico = bt['custo'] * jogos_efetivos
+                    roi_pacote = ((ganho_total - custo_historico) / custo_historico) * 100 if custo_historico > 0 else 0
+                    st.markdown("#### ⏱️ Máquina do Tempo do Desdobramento")
+                    st.write(f"Se estes {jogos_efetivos} cartões tivessem sido jogados em TODOS os {len(df)} sorteios da história:")
+                    st.markdown(" | ".join(f"**{faixa} pts:** {int(qtd)}x" for faixa, qtd in zip(FAIXAS_PREMIO, faixas)))
+                    cor_roi = "green" if roi_pacote > 0 else "red"
+                    st.markdown(f"**Investido:** R$ {custo_historico:,.2f} | **Retorno:** R$ {ganho_total:,.2f} | **ROI:** <span style='color:{cor_roi}'>**{roi_pacote:.2f}%**</span>", unsafe_allow_html=True)
+
                 # Análise de Cobertura
                 all_used = set()
                 for j in jogos_gerados: all_used.update(j)
@@ -1,12 +1,12 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import altair as alt
 import random
 from ui.dashboard_resumo import renderizar_dashboard_resumo
 from data.historico_previsoes import executar_retro_analise, salvar_previsoes_detalhadas, sincronizar_resultados
 from ui.visualizacao import plotar_radar_equilibrio
 from ai.ia_critica import analisar_riscos_jogo
-from ai.engine import AIEngine
 
 def renderizar_tab_previsao(
     df, df_filtrado_analise, 
@@ -155,6 +155,7 @@ def renderizar_tab_previsao(
             st.session_state.ultima_previsao = resultados[0]['seq']
 
     if btn_ia:
+        from ai.engine import AIEngine, aguardar_aquecimento, aquecimento_em_andamento
         try:
             df_filtrado = df_filtrado_analise
             if df_filtrado.empty:
@@ -166,6 +167,12 @@ def renderizar_tab_previsao(
                     st.write("📡 Escaneando padrões históricos...")
                     
                     st.write("🧠 Sincronizando Redes Neurais (LSTM & RF)...")
+                    if aquecimento_em_andamento():
+                        # Prévia instantânea (Bayesiano + frequência + atrasos) enquanto LSTM/RF terminam
+                        previa = engine.calcular_probabilidades_rapidas(df_filtrado)
+                        destaque = sorted(int(i) + 1 for i in np.argsort(previa)[-qtd_numeros:])
+                        st.write(f"⚡ Prévia rápida (modelos ainda ajustando): {destaque}")
+                    aguardar_aquecimento() # Se a atualização da base ainda está ajustando os modelos
                     probabilidades = engine.calcular_probabilidades(
                         df_filtrado, 
                         usar_aprendizado=usar_aprendizado, 
@@ -223,6 +230,27 @@ def renderizar_tab_previsao(
                         # Embaralhar para evitar que todos da IA fiquem na pg 1 e os do Mercado na pg 2
                         random.shuffle(resultados)
                         
+                    elif qtd_sequencias > 100:
+                        # Top-k em fluxo (ou em paralelo, para pools gigantes): mostra os melhores até agora
+                        barra, parcial = st.progress(0.0), st.empty()
+
+                        def mostrar_parcial(processados, total, top):
+                            barra.progress(min(processados / total, 1.0))
+                            mascaras, scores, confianca = top
+                            parcial.dataframe(pd.DataFrame({
+                                'Jogo': [', '.join(f"{d:02d}" for d in range(1, 26) if m >> (d - 1) & 1) for m in mascaras[:5]],
+                                'Score': scores[:5], 'Confiança (%)': confianca[:5].round(1)
+                            }), hide_index=True)
+
+                        resultados = engine.simular_jogos(
+                            probabilidades, qtd_sequencias=qtd_sequencias, qtd_numeros=qtd_numeros,
+                            nums_fixos=nums_fixos, nums_excluidos=nums_excluidos, ultima_rodada=ultima_rodada,
+                            ao_progresso=mostrar_parcial
+                        )
+                        barra.empty(); parcial.empty()
+                        for r in resultados:
+                            r['origem'] = '🤖 IA Padrão (Estatística Pura)'
+
                     else:
                         resultados = engine.simular_jogos(
                             probabilidades, 
@@ -3,30 +3,23 @@ import pandas as pd
 import altair as alt
 import sqlite3
 import datetime
-
-def calcular_dna(numeros):
-    impares = sum(1 for x in numeros if x % 2 != 0)
-    primos = sum(1 for x in numeros if x in [2, 3, 5, 7, 11, 13, 17, 19, 23])
-    moldura = sum(1 for x in numeros if x in [1,2,3,4,5,6,10,11,15,16,20,21,22,23,24,25])
-    soma = sum(numeros)
-    return impares, primos, moldura, soma
+from core.utils import calcular_metricas_dna_lote
+from core.data_loader import obter_mascaras
 
 @st.cache_data
 def carregar_dados_ludicos(df_loto):
-    # Processar loto
-    records = []
-    for idx, row in df_loto.iterrows():
-        nums = row['numeros']
-        i, p, m, s = calcular_dna(nums)
-        records.append({
-            'data': pd.to_datetime(row['data']),
-            'soma': s,
-            'impares': i,
-            'primos': p,
-            'moldura': m,
-            'numeros': nums
-        })
-    df_l = pd.DataFrame(records)
+    # Processar loto (DNA de todo o histórico em lote)
+    dna = calcular_metricas_dna_lote(obter_mascaras(df_loto))
+    df_l = pd.DataFrame({
+        'data': pd.to_datetime(df_loto['data']).to_numpy(),
+        'soma': dna['soma'].astype(int),
+        'impares': dna['impares'].astype(int),
+        'primos': dna['primos'].astype(int),
+        'moldura': dna['moldura'].astype(int),
+        'linhas_vazias': dna['linhas_vazias'].astype(int),
+        'max_consecutivas': dna['max_consecutivas'].astype(int),
+        'numeros': df_loto['numeros'].to_numpy()
+    })
     
     # Futebol
     try:
@@ -130,17 +123,8 @@ def renderizar_tab_teorias_ludicas(df_loto):
         ordem_dias = ['2ª Feira', '3ª Feira', '4ª Feira', '5ª Feira', '6ª Feira', 'Sábado']
         
         # Evolução da "Sujeira" na Máquina ao longo da semana (Quantos buracos aparecem?)
-        # Vamos calcular "Linhas Vazias" médias
-        def calc_linhas_vazias(nums):
-             linhas_vazias = 0
-             for r in range(5):
-                 inicio = r * 5 + 1
-                 fim = inicio + 4
-                 if not any(inicio <= n <= fim for n in nums):
-                     linhas_vazias += 1
-             return linhas_vazias
-             
-        df_l['Buracos_na_Cartela'] = df_l['numeros'].apply(calc_linhas_vazias)
+        # "Linhas Vazias" médias (já calculadas em lote no carregamento)
+        df_l['Buracos_na_Cartela'] = df_l['linhas_vazias']
         
         stats_dia = df_l.groupby('dia_da_semana').agg(
              Media_Soma=('soma', 'mean'),
@@ -178,18 +162,7 @@ def renderizar_tab_teorias_ludicas(df_loto):
         st.subheader("🎲 O Caos Gera Ordem? (Repetições Assassinas)")
         st.write("Vamos investigar o que acontece com O JOGO INTEIRO quando encontramos sequências lógicas de 6 dezenas seguidas (ex: 20, 21, 22, 23, 24, 25). Quando isso acontece, o jogo seguinte tenta consertar essa 'anomalia' matando aquele bloco?")
         
-        def max_consec_len(nums):
-             max_len = 1
-             curr_len = 1
-             for i in range(len(nums)-1):
-                 if nums[i+1] == nums[i] + 1:
-                     curr_len += 1
-                 else:
-                     max_len = max(max_len, curr_len)
-                     curr_len = 1
-             return max(max_len, curr_len)
-             
-        df_l['Max_Sequencia'] = df_l['numeros'].apply(max_consec_len)
+        df_l['Max_Sequencia'] = df_l['max_consecutivas']
         
         st.markdown("Quantas vezes uma anomalia extrema (6+ dezenas coladas juntas) ocorreu na história?")
         stats_seq = df_l['Max_Sequencia'].value_counts().sort_index().reset_index()
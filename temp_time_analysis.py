@@ -1,6 +1,8 @@
-import json
+import sys
 from collections import Counter
-from datetime import datetime
+
+sys.path.insert(0, 'IA_Tensor')
+from core.data_loader import ler_historico
 
 def calcular_dna(numeros):
     impares = sum(1 for x in numeros if x % 2 != 0)
@@ -10,15 +12,12 @@ def calcular_dna(numeros):
     return impares, primos, moldura, soma
 
 print("Carregando base de dados...")
-with open('IA_Tensor/rodadas.json', 'r') as f:
-    data = json.load(f)
-
-# Sort by round number (rodada) to ensure temporal order
-data.sort(key=lambda x: x['rodada'])
+# Histórico já vem ordenado por rodada (cache binário, sem reparsear o JSON)
+data = ler_historico('IA_Tensor/rodadas.json').to_dict('records')
 
 # Annotate data
 for row in data:
-    dt = datetime.strptime(row['data'], '%Y-%m-%d')
+    dt = row['data']
     row['dt'] = dt
     row['dia'] = dt.day
     row['mes'] = dt.month
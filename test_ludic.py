@@ -1,14 +1,14 @@
 import sqlite3
+import sys
 import pandas as pd
-import json
 from datetime import datetime, timedelta
 
 # Carregar base Lotofácil
-with open('IA_Tensor/rodadas.json', 'r') as f:
-    data = json.load(f)
+sys.path.insert(0, 'IA_Tensor')
+from core.data_loader import ler_historico
 
-df_loto = pd.DataFrame(data)
-df_loto['data_dt'] = pd.to_datetime(df_loto['data'], format='%d/%m/%Y')
+df_loto = ler_historico('IA_Tensor/rodadas.json')
+df_loto['data_dt'] = df_loto['data']
 df_loto['soma'] = df_loto['numeros'].apply(sum)
 
 # Carregar DB Financeiro